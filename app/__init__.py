@@ -5,7 +5,9 @@ Developed by Adeel Zafar (www.adeelzafar.com)
 
 from flask import Flask
 from app.config import config
+from app.json_provider import OrjsonProvider, orjson
 from app.services import CallService, ClaudeService
+from app.services.response_cache import ResponseCache
 import logging
 from logging.handlers import RotatingFileHandler
 import os
@@ -13,6 +15,8 @@ import os
 def create_app(config_name="development"):
     """Create and configure the Flask application."""
     app = Flask(__name__)
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
     
     # Load config
     if isinstance(config_name, str):
@@ -44,6 +48,13 @@ def create_app(config_name="development"):
     # Initialize services
     app.call_service = CallService(app)
     app.claude_service = ClaudeService(app)
+    app.response_cache = ResponseCache(
+        max_entries=app.config.get('RESPONSE_CACHE_SIZE', 256),
+        max_bytes=app.config.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+        min_compress_size=app.config.get('RESPONSE_COMPRESS_MIN_SIZE', 1024)
+    )
+    if app.config.get('CALLS_BACKGROUND_REFRESH'):
+        app.call_service.start_background_refresh()
     
     # Register blueprints
     from app.routes import main as main_blueprint
@@ -52,5 +63,9 @@ def create_app(config_name="development"):
     # Register API routes
     from app.api import api as api_blueprint
     app.register_blueprint(api_blueprint, url_prefix='/api')
+
+    # Register CLI commands
+    from app.cli import register_commands
+    register_commands(app)
     
     return app
@@ -6,4 +6,4 @@ from flask import Blueprint
 api = Blueprint('api', __name__)
 
 # Import routes after creating blueprint to avoid circular imports
-from . import routes
\ No newline at end of file
+from . import routes, analytics
\ No newline at end of file
@@ -1,8 +1,50 @@
-from flask import jsonify, current_app
+from flask import jsonify, current_app, request
+from typing import Dict
 from . import api
 
 @api.route('/analytics/companies')
-def get_companies():
-    """Get list of all unique companies."""
-    companies = current_app.call_service.get_unique_companies()
-    return jsonify(companies) 
\ No newline at end of file
+def get_company_analytics():
+    """Get all unique companies with their call counts."""
+    counts = current_app.call_service.get_company_counts()
+    return jsonify([
+        {'company': company, 'call_count': count}
+        for company, count in counts.items()
+    ])
+
+def _filters() -> Dict[str, str]:
+    """Read the company and inclusive date range filters shared by the analytics endpoints."""
+    return {
+        'company': request.args.get('company', ''),
+        'date_from': request.args.get('date_from', ''),
+        'date_to': request.args.get('date_to', '')
+    }
+
+def _analytics(section: str):
+    try:
+        analytics = current_app.call_service.get_call_analytics(**_filters())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'calls': analytics['calls'], section: analytics[section]})
+
+@api.route('/analytics/volume')
+def get_call_volume():
+    """Get the number of calls per company per week."""
+    try:
+        return jsonify(current_app.call_service.get_weekly_volume(**_filters()))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@api.route('/analytics/durations')
+def get_duration_analytics():
+    """Get the total and average call duration in seconds."""
+    return _analytics('duration')
+
+@api.route('/analytics/keywords')
+def get_keyword_analytics():
+    """Get how many sentences and calls mention each keyword term, most mentioned first."""
+    return _analytics('keywords')
+
+@api.route('/analytics/participants')
+def get_participant_analytics():
+    """Get the total and average number of participants and the calls per participant count."""
+    return _analytics('participants')
@@ -16,7 +16,7 @@ def get_call(call_id):
     try:
         call = current_app.call_service.get_call_by_id(call_id)
         if call:
-            return jsonify(call)
+            return jsonify(call.to_dict())
         return error_response("Call not found", 404)
     except Exception as e:
         return error_response(f"Failed to retrieve call: {str(e)}", 500)
@@ -36,7 +36,7 @@ def search_calls():
             date_from=date_from,
             date_to=date_to
         )
-        return jsonify(calls)
+        return jsonify([call.to_dict() for call in calls])
     except ValueError as e:
         return error_response(f"Invalid search parameters: {str(e)}", 400)
     except Exception as e:
@@ -79,7 +79,7 @@ def ask_question():
         answer = current_app.claude_service.get_response(
             call_id=call_id,
             question=question,
-            transcript=call['transcript']['text']
+            transcript=call.transcript_text
         )
         return jsonify({'answer': answer})
 
@@ -93,8 +93,6 @@ def refresh_calls():
     """Force refresh the calls cache."""
     try:
         current_app.call_service.refresh_cache()
-        # Clear the get_unique_companies cache
-        current_app.call_service.get_unique_companies.cache_clear()
         return jsonify({'message': 'Cache refreshed successfully'})
     except Exception as e:
         return error_response(f"Failed to refresh cache: {str(e)}", 500) 
\ No newline at end of file
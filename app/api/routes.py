@@ -1,43 +1,165 @@
-from flask import jsonify, request, current_app
+import json
+from flask import Response, jsonify, request, current_app, stream_with_context
+from typing import Any, Callable, Dict, List, Optional
 from . import api
+from ..services.admission import AdmissionRejected
+from ..services.call_analytics import day_range
+from ..services.call_record import CallRecord
+from ..services.response_cache import ENCODINGS, IDENTITY
+
+def _conditional(etag: Optional[str], build: Callable[[], Any]) -> Response:
+    """Answer a GET with 304 Not Modified when the client already has etag.
+
+    build makes the full response and is only called when the client's copy
+    is missing or stale. Successful responses and 304s carry the ETag and a
+    Cache-Control header that lets browsers and CDNs reuse them. A response
+    sent with a Content-Encoding gets its own ETag, suffixed with the
+    encoding, as different bytes must not share a strong ETag.
+    """
+    if etag is None:
+        return current_app.make_response(build())
+    variants = [etag] + [f"{etag}-{encoding}" for encoding in ENCODINGS]
+    matched = next((tag for tag in variants if request.if_none_match.contains_weak(tag)), None)
+    if matched is not None:
+        response = Response(status=304)
+        response.set_etag(matched)
+    else:
+        response = current_app.make_response(build())
+        if response.status_code != 200:
+            return response
+        encoding = response.headers.get('Content-Encoding')
+        response.set_etag(f"{etag}-{encoding}" if encoding else etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get('API_CACHE_MAX_AGE', 60)
+    return response
+
+def _accepted_encoding() -> str:
+    """Pick the preferred content encoding that the client accepts."""
+    return request.accept_encodings.best_match(ENCODINGS + (IDENTITY,), default=IDENTITY)
 
 @api.route('/call/<call_id>')
 def get_call(call_id):
-    """Get a specific call by ID."""
-    call = current_app.call_service.get_call_by_id(call_id)
-    if call is None:
-        return jsonify({'error': 'Call not found'}), 404
-    return jsonify(call)
+    """Get a specific call by ID.
+
+    The body is served from the response cache, compressed with the best
+    encoding in Accept-Encoding.
+    """
+    service = current_app.call_service
+    # The body must be the one the ETag names, even if a reload lands mid-request
+    call, etag = service.get_call_with_etag(call_id)
+
+    def build():
+        if call is None:
+            return jsonify({'error': 'Call not found'}), 404
+        body, encoding = current_app.response_cache.body(
+            etag, service.get_generation(), _accepted_encoding(),
+            lambda: jsonify(call.to_dict()).get_data()
+        )
+        response = current_app.response_class(body, mimetype=current_app.json.mimetype)
+        if encoding != IDENTITY:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    response = _conditional(etag, build)
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _int_arg(name: str, default: int, minimum: int, maximum: int = None) -> int:
+    """Read a bounded integer query parameter, raising ValueError if it is invalid."""
+    value = request.args.get(name, '')
+    if value == '':
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if number < minimum or (maximum is not None and number > maximum):
+        limit = f"between {minimum} and {maximum}" if maximum is not None else f"at least {minimum}"
+        raise ValueError(f"{name} must be {limit}")
+    return number
+
+def _project_calls(calls: List[CallRecord], fields: str) -> List[Dict]:
+    """Shape calls for a list response.
+
+    'card' (the default) returns compact call cards, 'full' the complete call
+    records, and a comma-separated list picks those fields from the card or,
+    failing that, the full record.
+    """
+    if fields == 'full':
+        return [call.to_dict() for call in calls]
+    cards = current_app.call_service.get_call_cards(calls)
+    if fields in ('', 'card'):
+        return cards
+
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    projected = []
+    for call, card in zip(calls, cards):
+        projected.append({
+            name: card[name] if name in card else call[name]
+            for name in names
+            if name in card or name in call
+        })
+    return projected
 
 @api.route('/calls/search')
 def search_calls():
-    """Search calls with optional filters."""
+    """Search calls with optional filters.
+
+    Returns one page of results (``limit``/``offset``) in the requested
+    ``sort`` order, projected to ``fields``. The total number of matching
+    calls is sent in the X-Total-Count header.
+    """
+    return _conditional(current_app.call_service.get_generation(), _search_response)
+
+def _search_response():
     query = request.args.get('query', '')
+    match = request.args.get('match', 'word')
     company = request.args.get('company', '')
     date_from = request.args.get('date_from', '')
     date_to = request.args.get('date_to', '')
+    sort = request.args.get('sort', 'newest')
+    fields = request.args.get('fields', 'card')
     
-    calls = current_app.call_service.search_calls(
-        query=query,
-        company=company,
-        date_from=date_from,
-        date_to=date_to
-    )
-    return jsonify(calls)
+    try:
+        limit = _int_arg('limit', current_app.config.get('SEARCH_PAGE_SIZE', 50), 1,
+                         current_app.config.get('SEARCH_MAX_PAGE_SIZE', 500))
+        offset = _int_arg('offset', 0, 0)
+        calls = current_app.call_service.search_calls(
+            query=query,
+            company=company,
+            date_from=date_from,
+            date_to=date_to,
+            match=match,
+            sort=sort
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = jsonify(_project_calls(calls[offset:offset + limit], fields))
+    response.headers['X-Total-Count'] = str(len(calls))
+    return response
 
 @api.route('/call/<call_id>/summary')
 def get_call_summary(call_id):
     """Get summary for a specific call."""
-    summary = current_app.call_service.get_call_summary(call_id)
-    if summary is None:
-        return jsonify({'error': 'Summary not found'}), 404
-    return jsonify(summary)
+    def build():
+        summary = current_app.call_service.get_call_summary(call_id)
+        if summary is None:
+            return jsonify({'error': 'Summary not found'}), 404
+        return jsonify(summary)
+
+    return _conditional(current_app.call_service.get_call_etag(call_id), build)
 
 @api.route('/companies')
 def get_companies():
     """Get list of unique companies."""
-    companies = current_app.call_service.get_unique_companies()
-    return jsonify(companies)
+    return _conditional(current_app.call_service.get_generation(),
+                        lambda: jsonify(current_app.call_service.get_unique_companies()))
+
+@api.route('/calls/status')
+def get_calls_status():
+    """Get the age of the served calls snapshot and the duration of the last refresh."""
+    return jsonify(current_app.call_service.get_cache_status())
 
 @api.route('/ask', methods=['POST'])
 def ask_question():
@@ -58,14 +180,130 @@ def ask_question():
             return jsonify({'error': 'Call not found'}), 404
 
         # Use Claude service to get answer
-        answer = current_app.claude_service.ask_question(question, call)
+        answer, cache = current_app.claude_service.ask_question(question, call)
         
         return jsonify({
             'answer': answer,
             'call_id': call_id,
-            'question': question
+            'question': question,
+            'cache': cache
         })
 
+    except AdmissionRejected as e:
+        response = jsonify({'error': 'Too many questions are being answered. Please try again shortly.'})
+        response.headers['Retry-After'] = str(max(1, round(e.retry_after)))
+        return response, 503
+
     except Exception as e:
         current_app.logger.error(f"Error processing question: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500 
\ No newline at end of file
+        return jsonify({'error': 'Internal server error'}), 500
+
+@api.route('/ask/status')
+def get_ask_status():
+    """Get the average prompt size and latency of questions sent to Claude, per prompt mode."""
+    return jsonify({'prompts': current_app.claude_service.get_prompt_stats()})
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api.route('/ask/stream', methods=['POST'])
+def stream_answer():
+    """Ask a question about a call, streaming the answer as Server-Sent Events.
+
+    Sends a 'cache' event with the cache metadata, a 'token' event for each
+    piece of the answer and a final 'done' event, or an 'error' event if the
+    answer failed. Disconnecting cancels the request to Claude.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'question' not in data or 'call_id' not in data:
+        return jsonify({
+            'error': 'Missing required fields: question and call_id'
+        }), 400
+
+    question = data['question']
+    call_id = data['call_id']
+    call = current_app.call_service.get_call_by_id(call_id)
+    if not call:
+        return jsonify({'error': 'Call not found'}), 404
+
+    events = current_app.claude_service.stream_question(question, call)
+    logger = current_app.logger
+
+    def generate():
+        try:
+            for kind, value in events:
+                if kind == 'cache':
+                    yield _sse('cache', value)
+                else:
+                    yield _sse('token', {'text': value})
+            yield _sse('done', {'call_id': call_id, 'question': question})
+        except AdmissionRejected:
+            yield _sse('error', {'error': 'Too many questions are being answered. Please try again shortly.'})
+        except Exception as e:
+            logger.error(f"Error streaming answer: {str(e)}")
+            yield _sse('error', {'error': str(e)})
+        finally:
+            # Runs when the client disconnects, too
+            events.close()
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+BATCH_FILTERS = ('query', 'match', 'company', 'date_from', 'date_to')
+
+@api.route('/ask/batch', methods=['POST'])
+def ask_batch():
+    """Ask a set of questions about every call matching a search filter.
+
+    The body holds ``questions`` and an optional ``filter`` with the
+    parameters of /calls/search (query, match, company, date_from, date_to).
+    Results are streamed as newline-delimited JSON in the order they finish:
+    one object per call and question, with the answer and cache metadata or
+    an error. The number of results is sent in the X-Total-Count header.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'The request body must be a JSON object'}), 400
+    questions = data.get('questions')
+    if not isinstance(questions, list) or not questions or \
+            not all(isinstance(question, str) and question.strip() for question in questions):
+        return jsonify({'error': 'questions must be a non-empty list of strings'}), 400
+    max_questions = current_app.config.get('BATCH_MAX_QUESTIONS', 20)
+    if len(questions) > max_questions:
+        return jsonify({'error': f'At most {max_questions} questions can be asked at once'}), 400
+
+    filters = data.get('filter') or {}
+    if not isinstance(filters, dict) or not set(filters) <= set(BATCH_FILTERS):
+        return jsonify({'error': f"filter may only contain {', '.join(BATCH_FILTERS)}"}), 400
+    if not all(isinstance(value, str) for value in filters.values()):
+        return jsonify({'error': 'filter values must be strings'}), 400
+    try:
+        # search_calls ignores invalid dates, which here would widen a paid batch
+        day_range(filters.get('date_from', ''), filters.get('date_to', ''))
+        calls = current_app.call_service.search_calls(**filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    max_calls = current_app.config.get('BATCH_MAX_CALLS', 200)
+    if len(calls) > max_calls:
+        return jsonify({
+            'error': f'{len(calls)} calls match the filter; narrow it to at most {max_calls}'
+        }), 400
+
+    results = current_app.claude_service.ask_questions(
+        calls, questions, max_workers=current_app.config.get('BATCH_WORKERS', 4)
+    )
+
+    def generate():
+        try:
+            for result in results:
+                yield json.dumps(result) + '\n'
+        finally:
+            results.close()
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['X-Total-Count'] = str(len(calls) * len(questions))
+    return response
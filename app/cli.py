@@ -0,0 +1,26 @@
+"""
+Flask CLI commands for CalPilot.
+"""
+
+import click
+from flask import current_app
+
+
+def register_commands(app):
+    """Register the CalPilot commands on app.cli."""
+
+    @app.cli.command('build-snapshot')
+    @click.option('--output', '-o', default=None,
+                  help='Snapshot file to write. Defaults to CALLS_SNAPSHOT_FILE.')
+    def build_snapshot(output):
+        """Load and process the calls, then save them as a snapshot file.
+
+        Run this ahead of a deploy so new workers can load the processed
+        calls from the snapshot instead of rebuilding them from the source.
+        """
+        service = current_app.call_service
+        try:
+            snapshot = service.save_snapshot(output)
+        except (ValueError, RuntimeError) as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Saved {len(snapshot)} calls ({snapshot.source_version}) to {output or service.snapshot_file}")
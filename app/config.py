@@ -8,7 +8,80 @@ class Config:
     """Base configuration."""
     CALLS_FILE = "data/calls.json"
     GCS_BUCKET = None
+    # Object holding the calls in GCS_BUCKET; a .jsonl name selects newline-delimited JSON
+    CALLS_BLOB = "calls.json"
+    # Read the calls from every object under this prefix matching CALLS_SHARD_PATTERN
+    # (in name order) instead of CALLS_BLOB
+    CALLS_PREFIX = None
+    CALLS_SHARD_PATTERN = "calls-*.json*"
+    # Calls shards downloaded at once
+    GCS_DOWNLOAD_WORKERS = 4
+    # Bytes fetched per request when streaming CALLS_BLOB
+    GCS_CHUNK_SIZE = 8 * 1024 * 1024
     ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
+    # Model and generation parameters used to answer questions about calls
+    CLAUDE_MODEL = "claude-3-5-haiku-20241022"
+    CLAUDE_MAX_TOKENS = 300
+    CLAUDE_TEMPERATURE = 0
+    # Token budget for the transcript excerpts sent with a question; longer transcripts
+    # are cut to the chunks most relevant to the question. 0 always sends the whole transcript
+    TRANSCRIPT_WINDOW_TOKENS = 0
+    # Approximate tokens per transcript chunk ranked for relevance
+    TRANSCRIPT_CHUNK_TOKENS = 200
+    # Claude requests each process sends at once; more wait in a queue of up to CLAUDE_MAX_QUEUE
+    CLAUDE_MAX_CONCURRENT = 4
+    CLAUDE_MAX_QUEUE = 32
+    # Seconds a question may wait for admission before it is rejected with 503
+    CLAUDE_QUEUE_TIMEOUT = 10
+    # Claude requests started per second by each process, in bursts of up to CLAUDE_BURST; 0 disables it
+    CLAUDE_REQUESTS_PER_SECOND = 0
+    CLAUDE_BURST = 4
+    # Retries after rate-limit and timeout errors, with jittered exponential backoff (seconds)
+    CLAUDE_MAX_RETRIES = 3
+    CLAUDE_RETRY_BASE_DELAY = 0.5
+    CLAUDE_RETRY_MAX_DELAY = 8
+    # Questions answered at once for one /api/ask/batch request
+    BATCH_WORKERS = 4
+    # Largest batch accepted: calls matching the filter, and questions asked about each
+    BATCH_MAX_CALLS = 200
+    BATCH_MAX_QUESTIONS = 20
+    # Answers kept in each process; 0 disables the in-process answer cache
+    ANSWER_CACHE_SIZE = 1024
+    # Seconds a cached answer stays valid
+    ANSWER_CACHE_TTL = 7 * 24 * 3600
+    # SQLite file sharing cached answers between processes and restarts; unset disables it
+    ANSWER_CACHE_DB = os.getenv('ANSWER_CACHE_DB')
+    # Answers kept in ANSWER_CACHE_DB; the least recently used are removed first
+    ANSWER_CACHE_DB_MAX_ENTRIES = 100_000
+    # Worker processes used to process calls during load_calls; 0 or 1 processes serially
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '0'))
+    # Number of calls sent to a worker process at a time
+    INGEST_CHUNK_SIZE = 500
+    # Seconds between checks of the calls source for changes
+    CALLS_REFRESH_INTERVAL = 300
+    # Random extra delay (seconds) added to each background refresh so workers do not reload in lockstep
+    CALLS_REFRESH_JITTER = 0
+    # Reload calls from a background thread instead of inside requests
+    CALLS_BACKGROUND_REFRESH = False
+    # Number of calls rendered with the dashboard page; more are loaded on demand
+    DASHBOARD_PAGE_SIZE = 50
+    # Seconds browsers and CDNs may reuse call data responses before revalidating their ETag
+    API_CACHE_MAX_AGE = 60
+    # Serialized and compressed /api/call/<id> bodies kept in memory, by count and total bytes
+    RESPONSE_CACHE_SIZE = 256
+    RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    # Response bodies smaller than this many bytes are sent uncompressed
+    RESPONSE_COMPRESS_MIN_SIZE = 1024
+    # Default and maximum number of calls returned per search request
+    SEARCH_PAGE_SIZE = 50
+    SEARCH_MAX_PAGE_SIZE = 500
+    # Processed calls saved by `flask build-snapshot` and loaded at startup; unset disables it
+    CALLS_SNAPSHOT_FILE = os.getenv('CALLS_SNAPSHOT_FILE')
+    # Directory for memory-mapped transcript segments; unset keeps transcripts in memory
+    TRANSCRIPT_STORE_DIR = os.getenv('TRANSCRIPT_STORE_DIR')
+    # Terms whose sentences are extracted as call keywords;
+    # None uses DEFAULT_KEYWORD_TERMS from app.services.keyword_extractor
+    KEYWORD_TERMS = None
     TESTING = False
     DEBUG = False
 
@@ -25,6 +98,9 @@ class TestingConfig(Config):
     WTF_CSRF_ENABLED = False
     # Use memory storage for testing
     GCS_BUCKET = None
+    CALLS_SNAPSHOT_FILE = None
+    TRANSCRIPT_STORE_DIR = None
+    ANSWER_CACHE_DB = None
     # Test API key
     ANTHROPIC_API_KEY = 'test-key'
 
@@ -32,6 +108,8 @@ class ProductionConfig(Config):
     """Production configuration."""
     ENV = 'production'
     GCS_BUCKET = "calpilot-data"
+    CALLS_BACKGROUND_REFRESH = True
+    CALLS_REFRESH_JITTER = 30
 
 # Map environment names to config objects
 config = {
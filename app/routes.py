@@ -9,7 +9,14 @@ def splash():
 
 @main.route('/dashboard')
 def dashboard():
-    """Main dashboard showing call list and search interface."""
-    calls = current_app.call_service.load_calls()
-    companies = current_app.call_service.get_unique_companies()
-    return render_template('index.html', calls=calls, companies=companies)
+    """Main dashboard showing the first page of calls and the search interface.
+
+    Later pages are fetched by the browser from /api/calls/search.
+    """
+    call_service = current_app.call_service
+    calls = call_service.search_calls()
+    page_size = current_app.config.get('DASHBOARD_PAGE_SIZE', 50)
+    cards = call_service.get_call_cards(calls[:page_size])
+    companies = call_service.get_unique_companies()
+    return render_template('index.html', calls=cards, total_calls=len(calls),
+                           page_size=page_size, companies=companies)
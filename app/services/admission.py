@@ -0,0 +1,168 @@
+"""
+Flow control for requests to an upstream service.
+
+- SingleFlight lets concurrent callers with the same key share one call.
+- AdmissionController limits the calls in progress at once and, optionally,
+  the rate at which they start. Callers over the limits wait in a bounded
+  queue and are rejected with AdmissionRejected if the queue is full or
+  their turn does not come in time.
+- backoff_delay gives jittered exponential delays for retries.
+
+All limits are per process.
+"""
+
+from contextlib import contextmanager
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted before its deadline."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'abandoned')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.abandoned = False
+
+    def outcome(self) -> Any:
+        """Return the result of a finished flight, or raise its error."""
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def join(self, key: Hashable) -> Tuple[_Flight, bool]:
+        """Lead the flight for key, or wait for the one in progress to finish.
+
+        Returns the flight and whether the caller leads it. A leader must end
+        the flight with finish or abandon. If the flight waited for is
+        abandoned, the caller tries again and may become the leader.
+        """
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                    return flight, True
+            flight.done.wait()
+            if not flight.abandoned:
+                return flight, False
+
+    def finish(self, key: Hashable, flight: _Flight, result: Any = None,
+               error: Optional[BaseException] = None) -> None:
+        """End a flight, handing its result or error to every caller waiting for it."""
+        flight.result, flight.error = result, error
+        self._end(key, flight)
+
+    def abandon(self, key: Hashable, flight: _Flight) -> None:
+        """End a flight without a result, so that the callers waiting for it try again."""
+        flight.abandoned = True
+        self._end(key, flight)
+
+    def _end(self, key: Hashable, flight: _Flight) -> None:
+        with self._lock:
+            del self._flights[key]
+        flight.done.set()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Call fn, or wait for the call already in progress for key.
+
+        Returns the result and whether it was shared with an earlier caller.
+        An exception raised by fn is raised to every caller sharing it.
+        """
+        flight, leader = self.join(key)
+        if not leader:
+            return flight.outcome(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result)
+        return result, False
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 32, queue_timeout: float = 10,
+                 rate: float = 0, burst: int = 1):
+        """
+        Args:
+            max_concurrent: Calls allowed in progress at once.
+            max_queue: Callers allowed to wait for admission; more are rejected at once.
+            queue_timeout: Seconds a caller may wait for admission.
+            rate: Calls started per second on average; 0 disables the rate limit.
+            burst: Calls that may start at once before the rate applies.
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+
+    def _reserve_token(self, deadline: float) -> float:
+        """Take a token from the bucket, returning when it becomes usable.
+
+        Tokens may be borrowed ahead of the refill, which is how waiting
+        callers queue up behind each other. Must be called with _lock held.
+        """
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        ready_at = now if self._tokens >= 1 else now + (1 - self._tokens) / self.rate
+        if ready_at > deadline:
+            raise AdmissionRejected("Request rate limit reached", retry_after=ready_at - now)
+        self._tokens -= 1
+        return ready_at
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        """Hold one of the concurrent slots for the duration of the block."""
+        deadline = time.monotonic() + self.queue_timeout
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                raise AdmissionRejected("Too many requests waiting", retry_after=self.queue_timeout)
+            self._waiting += 1
+        try:
+            if self.rate > 0:
+                with self._lock:
+                    ready_at = self._reserve_token(deadline)
+                delay = ready_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            if not self._slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                raise AdmissionRejected("Timed out waiting for a free slot", retry_after=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Delay before retry number attempt (0-based): a random time up to base_delay * 2 ** attempt."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
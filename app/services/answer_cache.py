@@ -0,0 +1,164 @@
+"""
+AnswerCache: Cache for answers to questions about calls.
+
+Answers are cached under a key made from the call ID, a hash of the call's
+content (the content hash of its record, which covers the transcript), the
+normalized question, the model name and the generation parameters. A
+changed transcript therefore never serves an old answer, and "What was the
+budget?" and "what was the budget" share one entry.
+
+There are two layers:
+
+- an in-process LRU of up to ``max_entries`` answers
+- an optional SQLite database shared by all processes that point at the same
+  file (gunicorn workers on one instance), which also survives restarts
+
+Entries older than ``ttl`` seconds are treated as missing in both layers. The
+database is trimmed to ``max_db_entries`` least recently used answers, and
+saving an answer for a call drops the call's answers for older versions of it.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# Database maintenance (expiry and size trimming) runs once per this many writes
+PRUNE_EVERY = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    call_id TEXT NOT NULL,
+    transcript_hash TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_call_id ON answers (call_id);
+CREATE INDEX IF NOT EXISTS answers_accessed_at ON answers (accessed_at);
+"""
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase a question, collapse its whitespace and drop trailing punctuation."""
+    return ' '.join(question.lower().split()).rstrip('?.! ')
+
+
+def transcript_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def answer_cache_key(call_id: str, transcript_digest: str, question: str, model: str,
+                     params: Dict[str, Any]) -> str:
+    """Build the cache key for a question about a call."""
+    payload = json.dumps(
+        [call_id, transcript_digest, normalize_question(question), model, params],
+        sort_keys=True, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 7 * 24 * 3600,
+                 db_path: Optional[str] = None, max_db_entries: int = 100_000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_db_entries = max_db_entries
+        # key -> (answer, created_at), least recently used first
+        self._entries: 'OrderedDict[str, Tuple[str, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # Process that opened _db; a forked child opens its own connection
+        self._db_pid: Optional[int] = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database for this process. Must be called with _db_lock held."""
+        if self._db is None or self._db_pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(_SCHEMA)
+            self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """Return (answer, layer) for a cached answer, where layer is 'memory' or 'sqlite'."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    return entry[0], 'memory'
+                del self._entries[key]
+
+        if not self.db_path:
+            return None
+        with self._db_lock:
+            db = self._connection()
+            row = db.execute(
+                'SELECT answer, created_at FROM answers WHERE key = ? AND created_at >= ?',
+                (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute('UPDATE answers SET accessed_at = ? WHERE key = ?', (now, key))
+        self._remember(key, row[0], row[1])
+        return row[0], 'sqlite'
+
+    def put(self, key: str, answer: str, call_id: str, transcript_digest: str) -> None:
+        """Cache an answer about a call, replacing answers about older transcripts of it."""
+        now = time.time()
+        self._remember(key, answer, now)
+
+        if not self.db_path:
+            return
+        with self._db_lock:
+            db = self._connection()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.execute('DELETE FROM answers WHERE call_id = ? AND transcript_hash != ?',
+                           (call_id, transcript_digest))
+                db.execute('INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)',
+                           (key, call_id, transcript_digest, answer, now, now))
+                self._writes += 1
+                if self._writes % PRUNE_EVERY == 0:
+                    self._prune(db, now)
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+
+    def _remember(self, key: str, answer: str, created_at: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (answer, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _prune(self, db: sqlite3.Connection, now: float) -> None:
+        db.execute('DELETE FROM answers WHERE created_at < ?', (now - self.ttl,))
+        db.execute(
+            'DELETE FROM answers WHERE key IN '
+            '(SELECT key FROM answers ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_db_entries,)
+        )
+
+    def clear(self) -> None:
+        """Drop every cached answer from both layers."""
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            with self._db_lock:
+                self._connection().execute('DELETE FROM answers')
@@ -0,0 +1,186 @@
+"""
+CallAnalytics: Call totals per company and day, maintained as calls change.
+
+Every call adds to the totals of the UTC day it was created on, once for
+each of its companies and once under ALL_CALLS. The totals are the number of
+calls, their summed duration and participants, how many calls had each
+number of participants, and how many sentences and calls mention each
+keyword term.
+
+Reloads update a copy of the previous snapshot's analytics with only the
+calls that were added, changed or removed, like SearchIndex. Day totals are
+never modified in place; updating a day replaces its DayTotals, and the
+per-company maps are copied on first write, so a copy shares everything it
+has not changed with the analytics it was made from.
+
+Queries add up day totals, so they cost time proportional to the number of
+days (and companies) in the result rather than the number of calls.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .call_record import CallRecord
+
+# Key of the totals over all calls, regardless of company
+ALL_CALLS = None
+
+SECONDS_PER_DAY = 86400
+EPOCH = date(1970, 1, 1)
+
+
+def day_number(timestamp: float) -> int:
+    """Number of the UTC day containing timestamp, counted from 1970-01-01."""
+    return int(timestamp // SECONDS_PER_DAY)
+
+
+def week_start(day: int) -> int:
+    """Number of the Monday starting the week of day (1970-01-01 was a Thursday)."""
+    return day - (day + 3) % 7
+
+
+def day_date(day: int) -> date:
+    return EPOCH + timedelta(days=day)
+
+
+def day_range(date_from: str, date_to: str) -> Tuple[Optional[int], Optional[int]]:
+    """Convert a date filter to the first and last day it includes, raising ValueError if a date is invalid.
+
+    Both dates name whole UTC days (any time of day is ignored), so date_to
+    includes the calls created on that day. Empty dates leave the range open.
+    """
+    days = []
+    for value in (date_from, date_to):
+        if not value:
+            days.append(None)
+            continue
+        try:
+            timestamp = datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            raise ValueError(f"Invalid date: {value}")
+        days.append(day_number(timestamp))
+    return days[0], days[1]
+
+
+class DayTotals:
+    __slots__ = ('calls', 'duration', 'participants', 'participant_counts', 'keyword_mentions', 'keyword_calls')
+
+    def __init__(self, calls: int = 0, duration: float = 0, participants: int = 0,
+                 participant_counts: Optional[Counter] = None, keyword_mentions: Optional[Counter] = None,
+                 keyword_calls: Optional[Counter] = None):
+        self.calls = calls
+        self.duration = duration
+        self.participants = participants
+        self.participant_counts = participant_counts if participant_counts is not None else Counter()
+        self.keyword_mentions = keyword_mentions if keyword_mentions is not None else Counter()
+        self.keyword_calls = keyword_calls if keyword_calls is not None else Counter()
+
+    def with_call(self, call: CallRecord, sign: int) -> 'DayTotals':
+        """Return new totals with call added (sign 1) or removed (sign -1)."""
+        participant_counts = self.participant_counts.copy()
+        participant_counts[call.participant_count] += sign
+        keyword_mentions = self.keyword_mentions.copy()
+        keyword_calls = self.keyword_calls.copy()
+        for term, mentions in call.keyword_counts.items():
+            keyword_mentions[term] += sign * mentions
+            keyword_calls[term] += sign
+        # Drop counts that fell to zero
+        return DayTotals(
+            self.calls + sign,
+            self.duration + sign * call.duration,
+            self.participants + sign * call.participant_count,
+            +participant_counts, +keyword_mentions, +keyword_calls
+        )
+
+    def update(self, other: 'DayTotals') -> None:
+        """Add other to these totals; only used on totals owned by a query."""
+        self.calls += other.calls
+        self.duration += other.duration
+        self.participants += other.participants
+        self.participant_counts.update(other.participant_counts)
+        self.keyword_mentions.update(other.keyword_mentions)
+        self.keyword_calls.update(other.keyword_calls)
+
+
+class CallAnalytics:
+    def __init__(self):
+        # company (or ALL_CALLS) -> day -> totals
+        self._totals: Dict[Optional[str], Dict[int, DayTotals]] = {}
+        # company (or ALL_CALLS) -> sorted days that have totals
+        self._days: Dict[Optional[str], List[int]] = {}
+        # Companies whose maps belong to this instance rather than being shared with the original of a copy
+        self._owned: Set[Optional[str]] = set()
+
+    @classmethod
+    def from_calls(cls, calls: Iterable[CallRecord]) -> 'CallAnalytics':
+        analytics = cls()
+        for call in calls:
+            analytics.add(call)
+        return analytics
+
+    def copy(self) -> 'CallAnalytics':
+        """Return a clone that can be modified without affecting these analytics."""
+        clone = CallAnalytics()
+        clone._totals = dict(self._totals)
+        clone._days = dict(self._days)
+        return clone
+
+    def add(self, call: CallRecord) -> None:
+        self._apply(call, 1)
+
+    def remove(self, call: CallRecord) -> None:
+        self._apply(call, -1)
+
+    def _apply(self, call: CallRecord, sign: int) -> None:
+        day = day_number(call.created_at_ts)
+        for key in (ALL_CALLS,) + call.companies:
+            if key not in self._owned:
+                self._totals[key] = dict(self._totals.get(key, {}))
+                self._days[key] = list(self._days.get(key, []))
+                self._owned.add(key)
+            totals, days = self._totals[key], self._days[key]
+
+            current = totals.get(day)
+            if current is None:
+                current = DayTotals()
+                insort(days, day)
+            updated = current.with_call(call, sign)
+            if updated.calls > 0:
+                totals[day] = updated
+                continue
+            totals.pop(day, None)
+            del days[bisect_left(days, day)]
+            if not days:
+                del self._totals[key], self._days[key]
+                self._owned.discard(key)
+
+    @property
+    def companies(self) -> List[str]:
+        return sorted(key for key in self._totals if key is not ALL_CALLS)
+
+    def _day_range(self, key: Optional[str], start_day: Optional[int],
+                   end_day: Optional[int]) -> Iterable[Tuple[int, DayTotals]]:
+        days = self._days.get(key, [])
+        lo = bisect_left(days, start_day) if start_day is not None else 0
+        hi = bisect_right(days, end_day) if end_day is not None else len(days)
+        totals = self._totals[key] if days else {}
+        return ((day, totals[day]) for day in days[lo:hi])
+
+    def totals(self, company: Optional[str] = ALL_CALLS, start_day: Optional[int] = None,
+               end_day: Optional[int] = None) -> DayTotals:
+        """Sum the totals of company (or all calls) over the days from start_day to end_day, inclusive."""
+        result = DayTotals()
+        for _, totals in self._day_range(company, start_day, end_day):
+            result.update(totals)
+        return result
+
+    def weekly_calls(self, company: Optional[str] = ALL_CALLS, start_day: Optional[int] = None,
+                     end_day: Optional[int] = None) -> Dict[int, int]:
+        """Count the calls of company (or all calls) per week, keyed by the week's first day."""
+        weeks: Dict[int, int] = {}
+        for day, totals in self._day_range(company, start_day, end_day):
+            week = week_start(day)
+            weeks[week] = weeks.get(week, 0) + totals.calls
+        return weeks
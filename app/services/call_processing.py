@@ -0,0 +1,159 @@
+"""
+Call record processing for CallService.load_calls.
+
+process_call turns a raw record from calls.json into the CallRecord the rest
+of the app serves. It is a plain module-level function so the same code runs
+in the serial ingest loop and in the worker processes used by
+process_calls_parallel.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+import hashlib
+from itertools import islice
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .call_record import CallRecord
+from .keyword_extractor import KeywordExtractor
+
+# (call_id, processed record or None, error message or None)
+ProcessResult = Tuple[str, Optional[CallRecord], Optional[str]]
+
+REQUIRED_FIELDS = ['id', 'created_at_utc', 'call_metadata', 'transcript']
+
+# Fields of the compact representation used by call lists
+CARD_FIELDS = [
+    'id', 'title', 'created_at_utc', 'formatted_date', 'duration_mins',
+    'participant_count', 'companies'
+]
+
+
+@lru_cache(maxsize=128)
+def format_duration(seconds: float) -> str:
+    """Format duration in a human-readable way (hours, minutes, seconds)."""
+    hours = int(seconds // 3600)
+    remaining = seconds % 3600
+    minutes = int(remaining // 60)
+    remaining_seconds = int(remaining % 60)
+
+    if hours > 0:
+        if minutes == 0:
+            return f"{hours}h"  # Return just hours if no minutes
+        if remaining_seconds == 0:
+            return f"{hours}h {minutes}m"
+        return f"{hours}h {minutes}m {remaining_seconds}s"
+    elif minutes > 0:
+        if remaining_seconds == 0:
+            return f"{minutes}m"
+        return f"{minutes}m {remaining_seconds}s"
+    return f"{remaining_seconds}s"
+
+
+def content_hash(call: Dict) -> str:
+    """Hash the content of a raw call record, independent of key order."""
+    canonical = json.dumps(call, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def process_call(call: Dict, keyword_extractor: KeywordExtractor) -> CallRecord:
+    """Process a single call record."""
+    try:
+        # Validate required fields
+        missing_fields = [field for field in REQUIRED_FIELDS if field not in call]
+        if missing_fields:
+            raise ValueError(f"Missing required fields: {', '.join(missing_fields)}")
+
+        created_at = datetime.fromisoformat(call['created_at_utc'].replace('Z', '+00:00'))
+
+        # Format duration in a readable way
+        call_metadata = call['call_metadata']
+        duration_mins = format_duration(call_metadata['duration'])
+
+        # Extract companies from email domains
+        companies = sorted(set(
+            party['email'].split('@')[1].split('.')[0]
+            for party in call_metadata['parties']
+            if party.get('email')
+        ))
+
+        # Extract keywords from transcript. Sentences are kept as offsets into
+        # the transcript unless lowercasing changed its length.
+        transcript_extra = dict(call['transcript'])
+        text = transcript_extra.pop('text')
+        if text and len(text.lower()) != len(text):
+            keywords = keyword_extractor.extract(text)
+        else:
+            keywords = CallRecord.pack_keyword_spans(keyword_extractor.extract_spans(text))
+
+        extra = {key: value for key, value in call.items() if key not in REQUIRED_FIELDS}
+
+        return CallRecord(
+            call['id'], call['created_at_utc'], created_at.timestamp(),
+            created_at.strftime('%B %d, %Y'), duration_mins, call_metadata, companies,
+            text, transcript_extra, keywords, extra
+        )
+    except Exception as e:
+        raise ValueError(f"Error processing call: {str(e)}")
+
+
+def call_card(call: CallRecord) -> Dict:
+    """Build the compact card shown for a processed call in call lists."""
+    return {
+        'id': call.id,
+        'title': call.title,
+        'created_at_utc': call.created_at_utc,
+        'formatted_date': call.formatted_date,
+        'duration_mins': call.duration_mins,
+        'participant_count': call.participant_count,
+        'companies': list(call.companies)
+    }
+
+
+def _call_id(call) -> str:
+    return call.get('id', 'unknown') if isinstance(call, dict) else 'unknown'
+
+
+# Keyword extractor of the current pool worker, built once by _init_worker
+_worker_extractor: Optional[KeywordExtractor] = None
+
+
+def _init_worker(keyword_terms: List[str]) -> None:
+    global _worker_extractor
+    _worker_extractor = KeywordExtractor(keyword_terms)
+
+
+def _process_chunk(chunk: List[Dict]) -> List[Tuple[Optional[CallRecord], Optional[str]]]:
+    results = []
+    for call in chunk:
+        try:
+            results.append((process_call(call, _worker_extractor), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+def process_calls_parallel(calls: Iterable[Dict], keyword_terms: List[str],
+                           workers: int, chunk_size: int) -> Iterator[ProcessResult]:
+    """Process calls in chunks across a pool of worker processes.
+
+    Results are yielded in input order. At most two chunks per worker are in
+    flight at once, so a streamed input is never read far ahead of processing.
+    """
+    records = iter(calls)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(list(keyword_terms),)) as executor:
+        pending = deque()
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if chunk:
+                call_ids = [_call_id(call) for call in chunk]
+                pending.append((call_ids, executor.submit(_process_chunk, chunk)))
+            if pending and (not chunk or len(pending) >= workers * 2):
+                call_ids, future = pending.popleft()
+                for call_id, (processed_call, error) in zip(call_ids, future.result()):
+                    yield call_id, processed_call, error
+            if not chunk and not pending:
+                return
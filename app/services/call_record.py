@@ -0,0 +1,188 @@
+"""
+CallRecord: Compact in-memory representation of a processed call.
+
+Records use ``__slots__`` instead of a per-instance dict, share interned
+company names, and keep keyword context as (start, end) offsets into the
+transcript instead of copies of each sentence. The transcript itself can be
+moved out of the heap into a TranscriptStore with ``attach_transcript``, after
+which it is read from the store whenever it is needed.
+
+``to_dict`` produces the same JSON shape that the API has always served, and
+read-only item access (``call['call_metadata']``) is supported for code
+written against that shape.
+"""
+
+from array import array
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from .transcript_store import TranscriptRef
+
+# Keyword context: either (term, flat array of start/end offsets) pairs into
+# the transcript, or the sentences themselves when offsets cannot be used
+KeywordData = Union[Tuple[Tuple[str, array], ...], Dict[str, List[str]]]
+
+
+class CallRecord:
+    __slots__ = (
+        'id', 'created_at_utc', 'created_at_ts', 'formatted_date', 'duration_mins',
+        'call_metadata', 'companies', '_transcript_text', '_transcript_extra',
+        '_keywords', 'extra'
+    )
+
+    # Keys of the serialized record that are computed rather than stored as-is
+    COMPUTED_KEYS = ('created_at_ts', 'formatted_date', 'duration_mins', 'companies', 'keywords')
+
+    def __init__(self, call_id: str, created_at_utc: str, created_at_ts: float, formatted_date: str,
+                 duration_mins: str, call_metadata: Dict, companies: Tuple[str, ...],
+                 transcript_text: Union[str, TranscriptRef], transcript_extra: Optional[Dict] = None,
+                 keywords: KeywordData = (), extra: Optional[Dict] = None):
+        self.id = call_id
+        self.created_at_utc = created_at_utc
+        self.created_at_ts = created_at_ts
+        self.formatted_date = formatted_date
+        self.duration_mins = duration_mins
+        self.call_metadata = call_metadata
+        self.companies = tuple(sys.intern(company) for company in companies)
+        self._transcript_text = transcript_text
+        self._transcript_extra = transcript_extra or None
+        self._keywords = keywords
+        self.extra = extra or None
+
+    @staticmethod
+    def pack_keyword_spans(spans: Dict[str, List[Tuple[int, int]]]) -> Tuple[Tuple[str, array], ...]:
+        """Pack extractor spans into the compact form stored on a record."""
+        return tuple(
+            (term, array('I', [offset for span in term_spans for offset in span]))
+            for term, term_spans in spans.items()
+        )
+
+    @property
+    def title(self) -> str:
+        return self.call_metadata.get('title', '')
+
+    @property
+    def duration(self) -> float:
+        return self.call_metadata['duration']
+
+    @property
+    def participant_count(self) -> int:
+        return len(self.call_metadata.get('parties', []))
+
+    @property
+    def transcript_text(self) -> str:
+        text = self._transcript_text
+        return text if isinstance(text, str) else text.text()
+
+    @property
+    def transcript_ref(self) -> Optional[TranscriptRef]:
+        """The stored location of the transcript, or None if it is held in memory."""
+        text = self._transcript_text
+        return None if isinstance(text, str) else text
+
+    def attach_transcript(self, ref: TranscriptRef) -> None:
+        """Read the transcript from a store instead of keeping it in memory.
+
+        ref must hold the same text; records shared with a published snapshot
+        can be switched safely because the swap is a single assignment.
+        """
+        self._transcript_text = ref
+
+    @property
+    def transcript(self) -> Dict:
+        transcript = {'text': self.transcript_text}
+        if self._transcript_extra:
+            transcript.update(self._transcript_extra)
+        return transcript
+
+    @property
+    def inference_results(self) -> Dict:
+        return self.extra.get('inference_results', {}) if self.extra else {}
+
+    @property
+    def keywords(self) -> Dict[str, List[str]]:
+        """Map each keyword term to the lowercased sentences that mention it."""
+        if isinstance(self._keywords, dict):
+            return self._keywords
+        text = self.transcript_text
+        return {
+            term: [text[offsets[i]:offsets[i + 1]].lower() for i in range(0, len(offsets), 2)]
+            for term, offsets in self._keywords
+        }
+
+    @property
+    def keyword_terms(self) -> List[str]:
+        """List the keyword terms found in the transcript without building their context."""
+        if isinstance(self._keywords, dict):
+            return list(self._keywords)
+        return [term for term, _ in self._keywords]
+
+    @property
+    def keyword_counts(self) -> Dict[str, int]:
+        """Map each keyword term found in the transcript to the number of sentences mentioning it."""
+        if isinstance(self._keywords, dict):
+            return {term: len(sentences) for term, sentences in self._keywords.items()}
+        return {term: len(offsets) // 2 for term, offsets in self._keywords}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize to the JSON shape of a processed call."""
+        call = {
+            'id': self.id,
+            'created_at_utc': self.created_at_utc,
+            'call_metadata': self.call_metadata,
+            'transcript': self.transcript
+        }
+        if self.extra:
+            call.update(self.extra)
+        call.update({
+            'created_at_ts': self.created_at_ts,
+            'formatted_date': self.formatted_date,
+            'duration_mins': self.duration_mins,
+            'companies': list(self.companies),
+            'keywords': self.keywords
+        })
+        return call
+
+    def __getstate__(self) -> Tuple:
+        # A stored transcript is pickled as a ref to its segment file
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: Tuple) -> None:
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def keys(self) -> List[str]:
+        return ['id', 'created_at_utc', 'call_metadata', 'transcript'] + \
+            list(self.extra or ()) + list(self.COMPUTED_KEYS)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in ('id', 'created_at_utc', 'call_metadata', 'transcript', 'created_at_ts',
+                   'formatted_date', 'duration_mins', 'keywords'):
+            return getattr(self, key)
+        if key == 'companies':
+            return list(self.companies)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CallRecord):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"CallRecord(id={self.id!r}, title={self.title!r})"
@@ -3,202 +3,680 @@ CallService: Core service for managing and processing call data.
 Developed by Adeel Zafar (www.adeelzafar.com)
 """
 
-from datetime import datetime, timezone
+from collections import Counter, deque
+from contextlib import closing, contextmanager, nullcontext
+from datetime import datetime
+import hashlib
 import json
-import re
-from collections import defaultdict
-from typing import List, Dict, Optional
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, TextIO, Tuple
 import os
-from functools import lru_cache
-from google.cloud import storage
+import random
+import threading
+import time
+
+from google.api_core.exceptions import PreconditionFailed
+
+from .call_analytics import ALL_CALLS, SECONDS_PER_DAY, CallAnalytics, day_date, day_range
+from .call_processing import (
+    ProcessResult, call_card, content_hash, format_duration, process_call, process_calls_parallel
+)
+from .call_record import CallRecord
+from .call_snapshot import CallSnapshot
+from .call_stream import is_json_lines, iter_json_array, iter_json_lines
+from .gcs_source import GcsCallsSource
+from .keyword_extractor import KeywordExtractor, DEFAULT_KEYWORD_TERMS
+from .search_index import SearchIndex, SEARCH_MODES
+from .snapshot_file import load_snapshot, read_snapshot_header, save_snapshot, snapshot_lock
+from .transcript_store import TranscriptStore
+
+SORT_ORDERS = ('newest', 'oldest', 'longest', 'shortest', 'title')
+
+# Stored transcripts are rewritten into a single segment once they are spread
+# over more segments than this, or once most stored bytes are no longer used
+MAX_TRANSCRIPT_SEGMENTS = 16
+
+# Version of the JSON shape of call data responses (records, cards, summaries,
+# field projection); bump it with any change so cached responses revalidate
+RESPONSE_FORMAT = 1
+
+# Times a reload starts over when the calls on GCS change while they are read
+SOURCE_CHANGE_RETRIES = 2
 
 class CallService:
     def __init__(self, app):
         self.logger = app.logger
         self.calls_file = app.config['CALLS_FILE']
         self.bucket_name = app.config.get('GCS_BUCKET')
+        self.blob_name = app.config.get('CALLS_BLOB', 'calls.json')
+        # Reused across reloads so the storage client and its connections are set up once
+        self.gcs = GcsCallsSource(
+            self.bucket_name,
+            self.blob_name,
+            prefix=app.config.get('CALLS_PREFIX'),
+            shard_pattern=app.config.get('CALLS_SHARD_PATTERN', 'calls-*.json*'),
+            download_workers=app.config.get('GCS_DOWNLOAD_WORKERS', 4),
+            chunk_size=app.config.get('GCS_CHUNK_SIZE', 8 * 1024 * 1024)
+        ) if self.bucket_name else None
+        self.keyword_extractor = KeywordExtractor(
+            app.config.get('KEYWORD_TERMS') or DEFAULT_KEYWORD_TERMS
+        )
+        # Responses depend on the response format, the keyword terms the calls
+        # were processed with and the search page size, as well as the raw records
+        self._etag_salt = json.dumps([
+            RESPONSE_FORMAT,
+            self.keyword_extractor.terms,
+            app.config.get('SEARCH_PAGE_SIZE', 50),
+            app.config.get('SEARCH_MAX_PAGE_SIZE', 500)
+        ])
+        self.ingest_workers = app.config.get('INGEST_WORKERS', 0)
+        self.ingest_chunk_size = app.config.get('INGEST_CHUNK_SIZE', 500)
+        self.refresh_interval = app.config.get('CALLS_REFRESH_INTERVAL', 300)
+        self.refresh_jitter = app.config.get('CALLS_REFRESH_JITTER', 0)
+        store_dir = app.config.get('TRANSCRIPT_STORE_DIR')
+        self.transcript_store = TranscriptStore(store_dir) if store_dir else None
+        self.snapshot_file = app.config.get('CALLS_SNAPSHOT_FILE')
+        # Current CallSnapshot; replaced as a whole on every reload
         self._calls_cache = None
-        self._calls_cache_timestamp = None
+        # Snapshot file built from an older source version; the first reload
+        # reuses its unchanged calls instead of processing everything
+        self._seed_snapshot = None
+        # When the source version was last compared with the snapshot
+        self._calls_checked_at = 0.0
+        # Held by whichever thread is reloading, so only one reload runs at a time
+        self._reload_lock = threading.Lock()
+        self._last_refresh_duration = None
+        self._refresher = None
+        self._stop_refresher = threading.Event()
+        # Set in forked workers whose parent process keeps the calls fresh
+        self._parent_refreshes = False
+        # Called with every snapshot published by a reload
+        self._reload_listeners: List[Callable[[CallSnapshot], None]] = []
 
         # Check local file in development
         if not self.bucket_name and not os.path.exists(self.calls_file):
             self.logger.error(f"Calls file not found: {self.calls_file}")
             raise FileNotFoundError(f"Calls file not found: {self.calls_file}")
 
-    def _load_from_gcs(self) -> str:
-        """Load calls data from Google Cloud Storage if configured, else from local file."""
+        if self.snapshot_file:
+            self._load_snapshot_file()
+        elif self.transcript_store is not None:
+            # Without a snapshot file no other process can need segments left behind earlier
+            self.transcript_store.remove_unused()
+
+    def _open_calls_stream(self, source_version: str) -> TextIO:
+        """Open a text stream over calls data from Google Cloud Storage if configured, else from local file.
+
+        A GCS stream reads the object at source_version only.
+        """
         if not self.bucket_name:
             self.logger.debug("Using local file storage")
-            with open(self.calls_file, 'r') as f:
-                return f.read()
+            return open(self.calls_file, 'r', encoding='utf-8')
         
         try:
-            self.logger.debug(f"Loading from GCS bucket: {self.bucket_name}")
-            storage_client = storage.Client()
-            bucket = storage_client.bucket(self.bucket_name)
-            blob = bucket.blob('calls.json')
-            return blob.download_as_text()
+            self.logger.debug(f"Streaming {self.blob_name} from GCS bucket: {self.bucket_name}")
+            return self.gcs.open_blob(source_version)
         except Exception as e:
             self.logger.error(f"Error loading from GCS: {str(e)}")
             raise
 
+    def _iter_raw_calls(self, stream: TextIO) -> Iterator[Dict]:
+        """Yield raw call records one at a time from a calls.json or calls.jsonl stream."""
+        source_name = self.blob_name if self.bucket_name else self.calls_file
+        if is_json_lines(source_name):
+            return iter_json_lines(stream)
+        return iter_json_array(stream)
+
+    @contextmanager
+    def _raw_calls(self, source_version: str) -> Iterator[Iterator[Dict]]:
+        """Open the calls source and yield an iterator over its raw call records.
+
+        Data on GCS is read at source_version; reading raises
+        PreconditionFailed if it has changed since.
+        """
+        if self.gcs is not None and self.gcs.prefix:
+            self.logger.debug(f"Downloading calls shards from {self.gcs.name}")
+            with closing(self.gcs.iter_shard_calls(source_version)) as calls:
+                yield calls
+            return
+        with self._open_calls_stream(source_version) as stream:
+            yield self._iter_raw_calls(stream)
+
+    def _source_version(self, known: Optional[str] = None) -> str:
+        """Identify the current version of the calls data without downloading it.
+
+        known is the version already loaded, which lets GCS answer a check
+        for an unchanged object with Not Modified.
+        """
+        if self.gcs is not None:
+            return self.gcs.version(known)
+
+        stat = os.stat(self.calls_file)
+        return f"file:{stat.st_mtime_ns}:{stat.st_size}"
+
     def _should_reload_cache(self) -> bool:
-        """Check if we need to reload the cache based on environment."""
-        if self._calls_cache is None or self._calls_cache_timestamp is None:
+        """Check if the calls source has changed since the cache was built."""
+        if self._calls_cache is None:
             return True
             
         try:
-            if self.bucket_name:
-                # In production, refresh cache every 5 minutes
-                cache_age = datetime.now().timestamp() - self._calls_cache_timestamp
-                return cache_age > 300
-            else:
-                # In development, check file modification time
-                current_mtime = os.path.getmtime(self.calls_file)
-                return current_mtime > self._calls_cache_timestamp
-        except OSError:
+            now = datetime.now().timestamp()
+            if self.bucket_name and now - self._calls_checked_at <= self.refresh_interval:
+                # In production, only look at the blob generation once per refresh interval
+                return False
+            self._calls_checked_at = now
+            current_version = self._calls_cache.source_version
+            return self._source_version(current_version) != current_version
+        except Exception as e:
+            self.logger.warning(f"Could not check calls source version: {str(e)}")
             return True
 
     def load_calls(self) -> List[Dict]:
         """Load and process calls from file with caching."""
-        if not self._should_reload_cache():
-            self.logger.debug("Using cached calls data")
-            return self._calls_cache
+        snapshot = self._get_snapshot()
+        return snapshot.calls if snapshot is not None else []
 
+    def _get_snapshot(self, force: bool = False) -> Optional[CallSnapshot]:
+        """Return the current snapshot, rebuilding it first if the cache is stale.
+
+        Only one thread reloads at a time. While it does, other requests are
+        served from the current snapshot; they only wait when there is no
+        snapshot yet or a refresh was forced. With the background refresher
+        running, in this process or in the parent of a forked worker, requests
+        never check the source themselves.
+        """
+        snapshot = self._calls_cache
+        if snapshot is not None and not force:
+            if self._refresher is not None or self._parent_refreshes or not self._should_reload_cache():
+                self.logger.debug("Using cached calls data")
+                return snapshot
+            if not self._reload_lock.acquire(blocking=False):
+                self.logger.debug("Reload in progress, using cached calls data")
+                return snapshot
+            try:
+                return self._reload()
+            finally:
+                self._reload_lock.release()
+
+        with self._reload_lock:
+            # Another thread may have loaded the calls while this one waited
+            if not force and self._calls_cache is not None:
+                return self._calls_cache
+            return self._reload()
+
+    def _reload(self) -> Optional[CallSnapshot]:
+        """Build a new snapshot and publish it. Must be called with _reload_lock held."""
         try:
             self.logger.info(f"Loading calls from {self.calls_file}")
-            data = self._load_from_gcs()
-            calls = json.loads(data)
+            started = time.perf_counter()
+            snapshot = self._build_current_snapshot()
+
+            # Publish the calls and their indexes together
+            self._calls_cache = snapshot
+            self._seed_snapshot = None
+            self._calls_checked_at = snapshot.loaded_at
+            self._last_refresh_duration = time.perf_counter() - started
             
-            processed_calls = []
-            for call in calls:
+            self.logger.info(f"Successfully loaded {len(snapshot)} calls in {self._last_refresh_duration:.2f}s")
+            for listener in self._reload_listeners:
                 try:
-                    processed_call = self._process_call(call)
-                    processed_calls.append(processed_call)
+                    listener(snapshot)
                 except Exception as e:
-                    self.logger.error(f"Error processing call {call.get('id', 'unknown')}: {str(e)}")
-                    continue
-            
-            # Update cache
-            self._calls_cache = processed_calls
-            self._calls_cache_timestamp = datetime.now().timestamp()
-            
-            self.logger.info(f"Successfully loaded {len(processed_calls)} calls")
-            return processed_calls
+                    self.logger.error(f"Reload listener failed: {str(e)}")
+            return snapshot
         except json.JSONDecodeError as e:
             self.logger.error(f"Invalid JSON in calls file: {str(e)}")
-            return []
         except Exception as e:
             self.logger.error(f"Error loading calls: {str(e)}")
-            return []
+        # Keep serving the last complete snapshot, if any
+        return self._calls_cache
 
-    def refresh_cache(self) -> None:
-        """Force refresh the calls cache."""
-        self._calls_cache = None
-        self._calls_cache_timestamp = None
-        self.load_calls()
+    def _build_current_snapshot(self) -> CallSnapshot:
+        """Build the snapshot of the current source version.
+
+        If the source changes while it is being read, the partial read is
+        discarded and the new version is loaded instead, up to
+        SOURCE_CHANGE_RETRIES times.
+        """
+        for attempt in range(SOURCE_CHANGE_RETRIES + 1):
+            source_version = self._source_version()
+            try:
+                if self.snapshot_file:
+                    return self._build_shared_snapshot(source_version)
+                return self._build_snapshot(source_version)
+            except PreconditionFailed as e:
+                if attempt == SOURCE_CHANGE_RETRIES:
+                    raise
+                self.logger.warning(f"Calls changed while loading {source_version}, loading again: {str(e)}")
 
     @staticmethod
-    @lru_cache(maxsize=128)
-    def format_duration(seconds: float) -> str:
-        """Format duration in a human-readable way (hours, minutes, seconds)."""
-        hours = int(seconds // 3600)
-        remaining = seconds % 3600
-        minutes = int(remaining // 60)
-        remaining_seconds = int(remaining % 60)
-        
-        if hours > 0:
-            if minutes == 0:
-                return f"{hours}h"  # Return just hours if no minutes
-            if remaining_seconds == 0:
-                return f"{hours}h {minutes}m"
-            return f"{hours}h {minutes}m {remaining_seconds}s"
-        elif minutes > 0:
-            if remaining_seconds == 0:
-                return f"{minutes}m"
-            return f"{minutes}m {remaining_seconds}s"
-        return f"{remaining_seconds}s"
-
-    def _process_call(self, call: Dict) -> Dict:
-        """Process a single call record."""
+    def _search_fields(call: CallRecord) -> Tuple[str, str]:
+        """Return the text fields of a call that are indexed for search."""
+        return call.title, call.transcript_text
+
+    def _build_snapshot(self, source_version: str) -> CallSnapshot:
+        """Read the calls source and build a snapshot from it.
+
+        Records whose content hash matches the current snapshot are reused as
+        they are; only added and changed records are processed. The search
+        index is a copy of the current one, updated for the calls that were
+        added, changed or removed. With a transcript store configured, the
+        transcripts of processed calls are written to a new segment and the
+        records only keep references to them.
+        """
+        previous = self._calls_cache or self._seed_snapshot
+        search_index = previous.search_index.copy() if previous is not None else SearchIndex()
+        analytics = previous.analytics.copy() if previous is not None else CallAnalytics()
+        # Calls in input order; None marks a record still being processed or one that failed
+        entries: List[Optional[CallRecord]] = []
+        pending = deque()
+        content_hashes: Dict[str, str] = {}
+        replaced_ids = set()
+        counts = Counter()
+
+        def changed_calls(raw_calls: Iterable[Dict]) -> Iterator[Dict]:
+            for call in raw_calls:
+                digest = content_hash(call)
+                call_id = call.get('id') if isinstance(call, dict) else None
+                if previous is not None and previous.content_hashes.get(call_id) == digest:
+                    entries.append(previous.get(call_id))
+                    content_hashes[call_id] = digest
+                    counts['unchanged'] += 1
+                    continue
+                pending.append((len(entries), digest))
+                entries.append(None)
+                yield call
+
+        with self._raw_calls(source_version) as raw_calls, self._transcript_writer() as writer:
+            results = self._process_calls(changed_calls(raw_calls))
+            for call_id, processed_call, error in results:
+                slot, digest = pending.popleft()
+                if error:
+                    self.logger.error(f"Error processing call {call_id}: {error}")
+                    continue
+                try:
+                    old_call = previous.get(call_id) if previous is not None else None
+                    if old_call is not None and call_id not in replaced_ids:
+                        search_index.remove(call_id, *self._search_fields(old_call))
+                        analytics.remove(old_call)
+                        replaced_ids.add(call_id)
+                    search_index.add(call_id, *self._search_fields(processed_call))
+                    if writer is not None:
+                        processed_call.attach_transcript(writer.add(processed_call.transcript_text))
+                    analytics.add(processed_call)
+                    entries[slot] = processed_call
+                    content_hashes[call_id] = digest
+                    counts['changed' if old_call is not None else 'added'] += 1
+                except Exception as e:
+                    self.logger.error(f"Error processing call {call_id}: {str(e)}")
+                    continue
+
+        if previous is not None:
+            for call_id, old_call in previous.by_id.items():
+                if call_id not in content_hashes and call_id not in replaced_ids:
+                    search_index.remove(call_id, *self._search_fields(old_call))
+                    analytics.remove(old_call)
+                    counts['removed'] += 1
+
+        self.logger.info(
+            f"Calls reloaded: {counts['added']} added, {counts['changed']} changed, "
+            f"{counts['removed']} removed, {counts['unchanged']} unchanged"
+        )
+        calls = [call for call in entries if call is not None]
+        if self.transcript_store is not None:
+            self._compact_transcripts(calls)
+        return CallSnapshot(calls, search_index, content_hashes, source_version, analytics=analytics)
+
+    def _transcript_writer(self):
+        """Return a writer for the transcripts of a reload, or a no-op context without a store."""
+        if self.transcript_store is None:
+            return nullcontext()
+        return self.transcript_store.writer()
+
+    def _compact_transcripts(self, calls: List[CallRecord]) -> None:
+        """Rewrite the stored transcripts of calls into one segment if the store is fragmented.
+
+        Old segments are released once no snapshot references them any more.
+        """
+        segments = {}
+        live_bytes = 0
+        for call in calls:
+            ref = call.transcript_ref
+            if ref is not None:
+                segments[id(ref.segment)] = ref.segment
+                live_bytes += ref.segment.length(ref.index)
+        stored_bytes = sum(segment.size for segment in segments.values())
+        if len(segments) <= MAX_TRANSCRIPT_SEGMENTS and live_bytes * 2 >= stored_bytes:
+            return
+
+        self.logger.info(
+            f"Compacting {len(segments)} transcript segments ({live_bytes} of {stored_bytes} bytes in use)"
+        )
+        self._store_transcripts(calls)
+
+    def _store_transcripts(self, calls: List[CallRecord]) -> None:
+        """Write the transcripts of calls to one new segment and point the records at it."""
+        with self.transcript_store.writer() as writer:
+            refs = [
+                (call, writer.add(call.transcript_text) if call.transcript_ref is None
+                 else writer.add_bytes(call.transcript_ref.view()))
+                for call in calls
+            ]
+        for call, ref in refs:
+            call.attach_transcript(ref)
+
+    def _build_shared_snapshot(self, source_version: str) -> CallSnapshot:
+        """Get the snapshot for source_version, building it in one process at a time.
+
+        Processes sharing CALLS_SNAPSHOT_FILE take turns holding its lock. The
+        first one to need a new source version builds the snapshot and saves
+        it; the others wait for the lock and then load the saved file instead
+        of processing the calls again.
+        """
+        with snapshot_lock(self.snapshot_file):
+            try:
+                header = read_snapshot_header(self.snapshot_file)
+                if header['source_version'] == source_version:
+                    snapshot = self._read_snapshot_file()
+                    self.logger.info(f"Loaded calls for {source_version} from {self.snapshot_file}")
+                    return snapshot
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                self.logger.warning(f"Rebuilding calls snapshot {self.snapshot_file}: {str(e)}")
+
+            snapshot = self._build_snapshot(source_version)
+            try:
+                self._save_snapshot_file(snapshot, self.snapshot_file)
+            except Exception as e:
+                self.logger.error(f"Could not save calls snapshot {self.snapshot_file}: {str(e)}")
+            return snapshot
+
+    def _read_snapshot_file(self) -> CallSnapshot:
+        """Load CALLS_SNAPSHOT_FILE, moving transcripts saved as text into the transcript store."""
+        snapshot = load_snapshot(self.snapshot_file, self.keyword_extractor.terms)
+        if self.transcript_store is not None:
+            self._store_transcripts([call for call in snapshot.calls if call.transcript_ref is None])
+        return snapshot
+
+    def _save_snapshot_file(self, snapshot: CallSnapshot, path: str) -> None:
+        segment_paths = save_snapshot(snapshot, path, self.keyword_extractor.terms)
+        if self.transcript_store is not None and path == self.snapshot_file:
+            # Segments only older snapshot files referred to are no longer needed
+            self.transcript_store.remove_unused(segment_paths)
+        self.logger.info(f"Saved {len(snapshot)} calls ({snapshot.source_version}) to {path}")
+
+    def _load_snapshot_file(self) -> None:
+        """Start from the snapshot saved in CALLS_SNAPSHOT_FILE, if it can be used.
+
+        A snapshot of the current source version is served right away. One
+        built from an older version is not served, but the first reload only
+        processes the calls that changed since it was saved.
+        """
+        if not os.path.exists(self.snapshot_file):
+            self.logger.info(f"No calls snapshot at {self.snapshot_file}, calls will be loaded from source")
+            return
+
         try:
-            # Validate required fields
-            required_fields = ['id', 'created_at_utc', 'call_metadata', 'transcript']
-            missing_fields = [field for field in required_fields if field not in call]
-            if missing_fields:
-                raise ValueError(f"Missing required fields: {', '.join(missing_fields)}")
-
-            call['formatted_date'] = datetime.fromisoformat(
-                call['created_at_utc'].replace('Z', '+00:00')
-            ).strftime('%B %d, %Y')
-            
-            # Format duration in a readable way
-            duration_seconds = call['call_metadata']['duration']
-            call['duration_mins'] = self.format_duration(duration_seconds)
-            
-            # Extract companies from email domains
-            call['companies'] = list(set([
-                party['email'].split('@')[1].split('.')[0] 
-                for party in call['call_metadata']['parties'] 
-                if party.get('email')
-            ]))
-            
-            # Extract keywords from transcript
-            call['keywords'] = self._extract_keywords(call['transcript']['text'])
-            
-            return call
+            started = time.perf_counter()
+            snapshot = self._read_snapshot_file()
+            current_version = self._source_version()
         except Exception as e:
-            raise ValueError(f"Error processing call: {str(e)}")
+            self.logger.warning(f"Ignoring calls snapshot {self.snapshot_file}: {str(e)}")
+            return
+
+        if snapshot.source_version != current_version:
+            self.logger.info(
+                f"Calls snapshot is for {snapshot.source_version}, source is at {current_version}; "
+                "reusing unchanged calls on the next reload"
+            )
+            self._seed_snapshot = snapshot
+            return
+
+        self._calls_cache = snapshot
+        self._calls_checked_at = datetime.now().timestamp()
+        self.logger.info(
+            f"Loaded {len(snapshot)} calls from snapshot {self.snapshot_file} "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+    def save_snapshot(self, path: Optional[str] = None) -> CallSnapshot:
+        """Save the current calls, loading them first if needed, to a snapshot file.
+
+        Defaults to CALLS_SNAPSHOT_FILE. Returns the snapshot that was saved.
+        """
+        path = path or self.snapshot_file
+        if not path:
+            raise ValueError("No snapshot path given and CALLS_SNAPSHOT_FILE is not set")
+        snapshot = self._get_snapshot()
+        if snapshot is None:
+            raise RuntimeError("Calls could not be loaded")
+        self._save_snapshot_file(snapshot, path)
+        return snapshot
+
+    def add_reload_listener(self, listener: Callable[[CallSnapshot], None]) -> None:
+        """Call listener with each new snapshot, from the thread that reloaded it."""
+        self._reload_listeners.append(listener)
+
+    def after_fork(self, parent_refreshes: bool = False) -> None:
+        """Reset the reload state of a freshly forked worker process.
+
+        Locks and threads do not survive a fork in a usable state, so a
+        worker gets its own and starts without a refresher or listeners; the
+        snapshot inherited from the parent process is kept. With
+        parent_refreshes the parent keeps the calls fresh and replaces its
+        workers to publish new ones, so this worker never reloads by itself.
+        """
+        self._reload_lock = threading.Lock()
+        self._refresher = None
+        self._stop_refresher = threading.Event()
+        self._reload_listeners = []
+        self._parent_refreshes = parent_refreshes
+
+    def refresh_cache(self) -> None:
+        """Force refresh the calls cache."""
+        self._get_snapshot(force=True)
+
+    def start_background_refresh(self) -> None:
+        """Load the calls now and keep them fresh from a background thread.
+
+        Every CALLS_REFRESH_INTERVAL seconds, plus a random delay of up to
+        CALLS_REFRESH_JITTER seconds, the thread checks the source version and
+        reloads if it changed.
+        """
+        if self._refresher is not None:
+            return
+        self._stop_refresher.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name='calls-refresher', daemon=True)
+        self._refresher.start()
+        self.logger.info(f"Background calls refresh every {self.refresh_interval}s (+{self.refresh_jitter}s jitter)")
+
+    def stop_background_refresh(self) -> None:
+        """Stop the background refresher and wait for it to exit."""
+        refresher = self._refresher
+        if refresher is None:
+            return
+        self._stop_refresher.set()
+        refresher.join()
+        self._refresher = None
+
+    def _refresh_loop(self) -> None:
+        if self._calls_cache is None:
+            self._get_snapshot()
 
-    def get_call_by_id(self, call_id: str) -> Optional[Dict]:
+        while True:
+            delay = self.refresh_interval + random.uniform(0, self.refresh_jitter)
+            if self._stop_refresher.wait(delay):
+                return
+            try:
+                if self._should_reload_cache():
+                    with self._reload_lock:
+                        self._reload()
+            except Exception as e:
+                self.logger.error(f"Background calls refresh failed: {str(e)}")
+
+    def get_cache_status(self) -> Dict[str, Any]:
+        """Describe the snapshot currently being served and the last refresh."""
+        snapshot = self._calls_cache
+        return {
+            'calls': len(snapshot) if snapshot is not None else 0,
+            'source_version': snapshot.source_version if snapshot is not None else None,
+            'snapshot_age_seconds': (
+                round(datetime.now().timestamp() - snapshot.loaded_at, 3) if snapshot is not None else None
+            ),
+            'last_refresh_duration_seconds': (
+                round(self._last_refresh_duration, 3) if self._last_refresh_duration is not None else None
+            ),
+            'refreshing': self._reload_lock.locked(),
+            'background_refresh': self._refresher is not None
+        }
+
+    format_duration = staticmethod(format_duration)
+
+    def _process_call(self, call: Dict) -> CallRecord:
+        """Process a single call record."""
+        return process_call(call, self.keyword_extractor)
+
+    def _process_calls(self, calls: Iterable[Dict]) -> Iterator[ProcessResult]:
+        """Process raw calls in input order, serially or across the ingest worker pool."""
+        if self.ingest_workers > 1:
+            self.logger.info(f"Processing calls with {self.ingest_workers} workers")
+            yield from process_calls_parallel(
+                calls, self.keyword_extractor.terms, self.ingest_workers, self.ingest_chunk_size
+            )
+            return
+
+        for call in calls:
+            call_id = call.get('id', 'unknown') if isinstance(call, dict) else 'unknown'
+            try:
+                yield call_id, self._process_call(call), None
+            except Exception as e:
+                yield call_id, None, str(e)
+
+    def get_call_by_id(self, call_id: str) -> Optional[CallRecord]:
         """Get a specific call by ID."""
         if not call_id:
             self.logger.error("Call ID cannot be empty")
             return None
             
         self.logger.debug(f"Fetching call with ID: {call_id}")
-        calls = self.load_calls()
-        call = next((c for c in calls if c['id'] == call_id), None)
+        snapshot = self._get_snapshot()
+        call = snapshot.get(call_id) if snapshot is not None else None
         
         if call is None:
             self.logger.info(f"Call not found with ID: {call_id}")
         return call
 
-    def search_calls(self, query: str = '', company: str = '', date_from: str = '', date_to: str = '') -> List[Dict]:
-        """Search calls with optional filters."""
-        self.logger.info(f"Searching calls with query='{query}', company='{company}', date_from='{date_from}', date_to='{date_to}'")
-        calls = self.load_calls()
+    def _etag(self, *parts: str) -> str:
+        key = '\0'.join((self._etag_salt,) + parts)
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+    def get_generation(self) -> Optional[str]:
+        """Get an ETag for responses built from the loaded calls as a whole.
+
+        It changes whenever any call is added, changed or removed, and is the
+        same in every process that loaded the same calls. None if no calls
+        are loaded.
+        """
+        snapshot = self._get_snapshot()
+        if snapshot is None:
+            return None
+        return self._etag('generation', snapshot.generation)
+
+    def get_call_etag(self, call_id: str) -> Optional[str]:
+        """Get an ETag for responses built from one call, or None if there is no such call.
+
+        It only changes when that call's record does, so it survives reloads
+        that change other calls.
+        """
+        return self.get_call_with_etag(call_id)[1]
+
+    def get_call_with_etag(self, call_id: str) -> Tuple[Optional[CallRecord], Optional[str]]:
+        """Get a call and its ETag (see get_call_etag) from the same loaded calls.
+
+        Both are None if there is no such call. Looking them up separately
+        could pair a call with the ETag of another version of it when a
+        reload lands in between.
+        """
+        snapshot = self._get_snapshot()
+        call = snapshot.get(call_id) if snapshot is not None and call_id else None
+        if call is None:
+            return None, None
+        return call, self._etag('call', call_id, snapshot.content_hashes[call_id])
+
+    def get_content_hash(self, call: CallRecord) -> Optional[str]:
+        """Get the content hash of a call's raw record, as of the loaded calls.
+
+        None if the call is not the one in the loaded calls, e.g. because a
+        reload has replaced it since it was looked up.
+        """
+        snapshot = self._get_snapshot()
+        if snapshot is None or snapshot.get(call.id) is not call:
+            return None
+        return snapshot.content_hashes.get(call.id)
+
+    def get_call_cards(self, calls: List[CallRecord]) -> List[Dict]:
+        """Get the precomputed list cards for the given calls."""
+        snapshot = self._calls_cache
+        cards = snapshot.cards if snapshot is not None else {}
+        # A call from a snapshot that has since been replaced may have no card here
+        return [cards.get(call.id) or call_card(call) for call in calls]
+
+    def search_calls(self, query: str = '', company: str = '', date_from: str = '', date_to: str = '',
+                     match: str = 'word', sort: str = 'newest') -> List[CallRecord]:
+        """Search calls with optional filters.
+
+        Results are returned newest first unless ``sort`` asks for 'oldest',
+        'longest', 'shortest' or 'title' order. A date range is taken as a slice of
+        the time-sorted snapshot and the other filters are applied to that slice.
+        Dates name whole UTC days and both ends are included, as in the
+        analytics queries. The text query is answered from the inverted index
+        built in load_calls.
+        ``match`` selects how query tokens are compared against words in the
+        title and transcript: 'word' (whole words and phrases), 'prefix' (last
+        token may be a partial word) or 'substring' (see SearchIndex).
+        """
+        if match not in SEARCH_MODES:
+            raise ValueError(f"Invalid match mode: {match}")
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"Invalid sort order: {sort}")
+
+        self.logger.info(f"Searching calls with query='{query}', match='{match}', company='{company}', date_from='{date_from}', date_to='{date_to}'")
+        snapshot = self._get_snapshot()
+        if snapshot is None:
+            return []
+        calls = snapshot.calls
         
         try:
-            if query:
-                query = query.lower()
-                calls = [
-                    call for call in calls 
-                    if query in call['call_metadata']['title'].lower() or
-                       query in call['transcript']['text'].lower()
-                ]
-            
-            if company:
-                calls = [
-                    call for call in calls 
-                    if company in call['companies']
-                ]
-            
             if date_from or date_to:
                 try:
-                    if date_from:
-                        date_from = datetime.fromisoformat(date_from).replace(tzinfo=timezone.utc)
-                    if date_to:
-                        date_to = datetime.fromisoformat(date_to).replace(tzinfo=timezone.utc)
-
-                    calls = [
-                        call for call in calls
-                        if (not date_from or datetime.fromisoformat(call['created_at_utc'].replace('Z', '+00:00')) >= date_from)
-                        and (not date_to or datetime.fromisoformat(call['created_at_utc'].replace('Z', '+00:00')) <= date_to)
-                    ]
+                    first_day, last_day = day_range(date_from, date_to)
+                    calls = snapshot.between(
+                        first_day * SECONDS_PER_DAY if first_day is not None else None,
+                        (last_day + 1) * SECONDS_PER_DAY if last_day is not None else None
+                    )
                 except ValueError as e:
                     self.logger.error(f"Invalid date format: {str(e)}")
+
+            if company:
+                company_ids = snapshot.company_postings.get(company, [])
+                if calls is snapshot.calls:
+                    calls = [snapshot.by_id[call_id] for call_id in company_ids]
+                else:
+                    company_ids = set(company_ids)
+                    calls = [call for call in calls if call.id in company_ids]
+
+            if query:
+                matching_ids = snapshot.search_index.search(query, mode=match)
+                calls = [call for call in calls if call.id in matching_ids]
             
+            if sort == 'oldest':
+                calls = calls[::-1]
+            elif sort in ('longest', 'shortest'):
+                calls = sorted(calls, key=lambda call: call.duration,
+                               reverse=sort == 'longest')
+            elif sort == 'title':
+                calls = sorted(calls, key=lambda call: call.title.lower())
+
             self.logger.info(f"Found {len(calls)} matching calls")
             return calls
             
@@ -220,33 +698,77 @@ class CallService:
 
         try:
             summary = {
-                'duration_mins': call['duration_mins'],
-                'participant_count': len(call['call_metadata']['parties']),
-                'companies': call['companies'],
-                'keywords': call['keywords'],
-                'summary': call['inference_results'].get('call_summary', '')
+                'duration_mins': call.duration_mins,
+                'participant_count': call.participant_count,
+                'companies': list(call.companies),
+                'keywords': call.keywords,
+                'summary': call.inference_results.get('call_summary', '')
             }
             return summary
         except Exception as e:
             self.logger.error(f"Error generating summary for call {call_id}: {str(e)}")
             return None
 
-    @lru_cache(maxsize=1)
     def get_unique_companies(self) -> List[str]:
-        """Get a sorted list of all unique companies with caching."""
+        """Get a sorted list of all unique companies from the company index."""
         self.logger.debug("Fetching unique companies list")
-        try:
-            calls = self.load_calls()
-            companies = sorted(list(set(
-                company 
-                for call in calls 
-                for company in call['companies']
-            )))
-            self.logger.info(f"Found {len(companies)} unique companies")
-            return companies
-        except Exception as e:
-            self.logger.error(f"Error fetching unique companies: {str(e)}")
+        snapshot = self._get_snapshot()
+        if snapshot is None:
+            return []
+        self.logger.info(f"Found {len(snapshot.companies)} unique companies")
+        return snapshot.companies
+
+    def get_company_counts(self) -> Dict[str, int]:
+        """Get the number of calls per company, keyed by company in sorted order."""
+        self.logger.debug("Fetching company call counts")
+        snapshot = self._get_snapshot()
+        return snapshot.company_counts if snapshot is not None else {}
+
+    def get_weekly_volume(self, company: str = '', date_from: str = '', date_to: str = '') -> List[Dict]:
+        """Count calls per company per week (weeks start on Monday), oldest week first.
+
+        Dates are inclusive. Raises ValueError for an invalid date.
+        """
+        start, end = day_range(date_from, date_to)
+        snapshot = self._get_snapshot()
+        if snapshot is None:
             return []
+        analytics = snapshot.analytics
+        rows = []
+        for name in ([company] if company else analytics.companies):
+            for week, calls in analytics.weekly_calls(name, start, end).items():
+                rows.append({'week': day_date(week).isoformat(), 'company': name, 'calls': calls})
+        rows.sort(key=lambda row: (row['week'], row['company']))
+        return rows
+
+    def get_call_analytics(self, company: str = '', date_from: str = '', date_to: str = '') -> Dict[str, Any]:
+        """Get call, duration, participant and keyword totals for a company (or all calls).
+
+        Dates are inclusive. Raises ValueError for an invalid date.
+        """
+        start, end = day_range(date_from, date_to)
+        snapshot = self._get_snapshot()
+        analytics = snapshot.analytics if snapshot is not None else CallAnalytics()
+        totals = analytics.totals(company or ALL_CALLS, start, end)
+        calls = totals.calls
+        return {
+            'calls': calls,
+            'duration': {
+                'total': totals.duration,
+                'average': totals.duration / calls if calls else 0
+            },
+            'participants': {
+                'total': totals.participants,
+                'average': totals.participants / calls if calls else 0,
+                'calls_by_count': {
+                    str(count): totals.participant_counts[count] for count in sorted(totals.participant_counts)
+                }
+            },
+            'keywords': [
+                {'term': term, 'mentions': mentions, 'calls': totals.keyword_calls[term]}
+                for term, mentions in sorted(totals.keyword_mentions.items(), key=lambda item: (-item[1], item[0]))
+            ]
+        }
 
     def _extract_keywords(self, text: str) -> Dict[str, List[str]]:
         """Extract important keywords and their context from text."""
@@ -254,19 +776,7 @@ class CallService:
             return {}
             
         try:
-            important_terms = [
-                'pricing', 'budget', 'timeline', 'implementation', 'integration',
-                'decision', 'approval', 'concerns', 'requirements', 'next steps',
-                'follow up', 'demo', 'trial', 'features', 'competition'
-            ]
-            
-            keywords = defaultdict(list)
-            for term in important_terms:
-                matches = re.finditer(f"[^.]*{term}[^.]*\\.", text.lower())
-                for match in matches:
-                    keywords[term].append(match.group().strip())
-                    
-            return dict(keywords)
+            return self.keyword_extractor.extract(text)
         except Exception as e:
             self.logger.error(f"Error extracting keywords: {str(e)}")
             return {} 
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+CallSnapshot: A consistent view of the loaded calls and their indexes.
+
+A snapshot is built in full by CallService.load_calls and then published with
+a single attribute assignment, so a request always sees a calls list and
+indexes that belong to the same load.
+
+Calls are kept sorted newest-first by their pre-parsed ``created_at_ts`` so a
+date range can be answered with two bisections instead of a full scan. The
+company facet (company -> call IDs, newest first) is derived in the same pass,
+so facet lists and counts always match the calls they were built from, as
+are the compact call cards that list views render instead of full records.
+
+The snapshot also carries the CallAnalytics aggregates of its calls, which
+reloads update incrementally along with the search index.
+
+Each snapshot also records the version of the source it was loaded from and
+the content hash of every raw call record, which lets the next reload skip
+unchanged sources and reuse unchanged calls. The content hashes together
+make up the snapshot's generation, which is the same for every snapshot of
+the same calls, in any process, and is used to build response ETags.
+"""
+
+from bisect import bisect_right
+from datetime import datetime
+import hashlib
+from typing import Dict, List, Optional
+
+from .call_analytics import CallAnalytics
+from .call_processing import call_card
+from .call_record import CallRecord
+from .search_index import SearchIndex
+
+
+class CallSnapshot:
+    def __init__(self, calls: List[CallRecord], search_index: SearchIndex,
+                 content_hashes: Optional[Dict[str, str]] = None,
+                 source_version: Optional[str] = None, loaded_at: Optional[float] = None,
+                 analytics: Optional[CallAnalytics] = None):
+        self.calls = sorted(calls, key=lambda call: call.created_at_ts, reverse=True)
+        # Negated timestamps ascend along self.calls, which is what bisect needs
+        self._sort_keys = [-call.created_at_ts for call in self.calls]
+        self.by_id: Dict[str, CallRecord] = {call.id: call for call in calls}
+        self.cards: Dict[str, Dict] = {call.id: call_card(call) for call in self.calls}
+        self.search_index = search_index
+        self.analytics = analytics if analytics is not None else CallAnalytics.from_calls(self.calls)
+        self.content_hashes = content_hashes or {}
+        self.source_version = source_version
+        self.generation = self._generation()
+
+        self.company_postings: Dict[str, List[str]] = {}
+        for call in self.calls:
+            for company in call.companies:
+                self.company_postings.setdefault(company, []).append(call.id)
+        self.companies = sorted(self.company_postings)
+        self.company_counts = {
+            company: len(self.company_postings[company]) for company in self.companies
+        }
+        self.loaded_at = loaded_at if loaded_at is not None else datetime.now().timestamp()
+
+    def _generation(self) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for call_id in sorted(self.content_hashes):
+            digest.update(f"{call_id}\0{self.content_hashes[call_id]}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+    def get(self, call_id: str) -> Optional[CallRecord]:
+        """Look up a call by ID."""
+        return self.by_id.get(call_id)
+
+    def between(self, start: Optional[float] = None, end: Optional[float] = None) -> List[CallRecord]:
+        """Return calls created within [start, end) (epoch seconds), newest first."""
+        lo = bisect_right(self._sort_keys, -end) if end is not None else 0
+        hi = bisect_right(self._sort_keys, -start) if start is not None else len(self._sort_keys)
+        return self.calls[lo:hi]
@@ -0,0 +1,113 @@
+"""
+Streaming readers for call data files.
+
+Both readers take a text stream and yield one call record at a time, so the
+memory needed to ingest a file grows with the largest record rather than
+with the size of the file. Two formats are supported:
+
+- a JSON document whose top level is an array of call objects (calls.json)
+- newline-delimited JSON with one call object per line (calls.jsonl)
+"""
+
+import json
+from typing import Dict, Iterator, TextIO
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+JSON_LINES_SUFFIXES = ('.jsonl', '.ndjson')
+
+_WHITESPACE = ' \t\n\r'
+
+
+def is_json_lines(name: str) -> bool:
+    """Check whether a file or blob name uses the newline-delimited format."""
+    return name.lower().endswith(JSON_LINES_SUFFIXES)
+
+
+def iter_json_lines(stream: TextIO) -> Iterator[Dict]:
+    """Yield one record per non-empty line of newline-delimited JSON."""
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise json.JSONDecodeError(f"Line {line_number}: {e.msg}", e.doc, e.pos) from e
+
+
+def iter_json_array(stream: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict]:
+    """Yield the elements of a top-level JSON array without reading the whole document.
+
+    The stream is read in chunks and each element is decoded as soon as it is
+    complete. Consumed text is dropped from the buffer as parsing advances.
+    Anything but whitespace after the closing bracket raises JSONDecodeError,
+    so concatenated or corrupted files are not loaded as if they were valid.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def read_more(min_size: int) -> bool:
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = stream.read(max(chunk_size, min_size))
+        if not chunk:
+            eof = True
+            return False
+        # Drop consumed text before growing the buffer
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def next_char() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not read_more(chunk_size):
+                return ''
+
+    def expect_end() -> None:
+        nonlocal pos
+        pos += 1
+        if next_char():
+            raise json.JSONDecodeError("Unexpected data after calls array", buffer, pos)
+
+    if next_char() != '[':
+        raise json.JSONDecodeError("Expected '[' at start of calls array", buffer, pos)
+    pos += 1
+
+    if next_char() == ']':
+        expect_end()
+        return
+
+    while True:
+        if not next_char():
+            raise json.JSONDecodeError("Unterminated calls array", buffer, pos)
+
+        while True:
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+                # A value that ends exactly at the end of the buffer might be cut off
+                if end < len(buffer) or eof:
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            # Grow geometrically so very large records are not re-parsed too often
+            read_more(len(buffer) - pos)
+        pos = end
+        yield record
+
+        separator = next_char()
+        if separator == ']':
+            expect_end()
+            return
+        if separator != ',':
+            raise json.JSONDecodeError("Expected ',' or ']' after call record", buffer, pos)
+        pos += 1
@@ -1,8 +1,37 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import threading
+import time
 import anthropic
 from anthropic import APIError, APITimeoutError, APIConnectionError, RateLimitError
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from flask import current_app
 
+from .admission import AdmissionController, AdmissionRejected, SingleFlight, backoff_delay
+from .answer_cache import AnswerCache, answer_cache_key, transcript_hash
+from .call_record import CallRecord
+from .transcript_window import GAP_MARKER, estimate_tokens, window_transcript
+
+# Increase whenever the prompt changes, so answers cached for the old prompt are not served
+PROMPT_VERSION = 1
+
+SYSTEM_PROMPT = "You are a helpful AI assistant analyzing sales call transcripts. Provide concise, focused answers based only on the information in the transcript."
+
+TEST_RESPONSE = "This is a test response from Claude"
+
+def _build_prompt(transcript: str, question: str, excerpts: bool = False) -> str:
+    if excerpts:
+        source = f"Given these excerpts from a sales call transcript ({GAP_MARKER} marks omitted parts):"
+    else:
+        source = "Given this sales call transcript:"
+    return f"""{source}
+
+{transcript}
+
+Please answer this question about the call: {question}
+
+Keep your answer concise and focused on the specific question asked.
+If you can't find a clear answer in the transcript, please say so."""
+
 class ClaudeService:
     def __init__(self, app):
         self.logger = app.logger
@@ -12,15 +41,114 @@ class ClaudeService:
             raise ValueError("ANTHROPIC_API_KEY not configured")
         
         try:
-            self.client = anthropic.Client(api_key=self.api_key)
+            # Retries are made by _create_message, which paces them through admission control
+            self.client = anthropic.Client(api_key=self.api_key, max_retries=0)
             self.logger.info("Claude API client initialized successfully")
         except Exception as e:
             self.logger.error(f"Failed to initialize Claude API client: {str(e)}")
             raise
 
-    def get_response(self, call_id: str, question: str, transcript: str) -> Optional[str]:
-        """Get AI response for a question about a call transcript."""
-        # Input validation
+        self.model = app.config.get('CLAUDE_MODEL', 'claude-3-5-haiku-20241022')
+        self.generation_params = {
+            'max_tokens': app.config.get('CLAUDE_MAX_TOKENS', 300),
+            'temperature': app.config.get('CLAUDE_TEMPERATURE', 0),
+            'prompt_version': PROMPT_VERSION,
+            'transcript_window_tokens': app.config.get('TRANSCRIPT_WINDOW_TOKENS', 0),
+            'transcript_chunk_tokens': app.config.get('TRANSCRIPT_CHUNK_TOKENS', 200)
+        }
+        # Prompt sizes and latencies per prompt mode ('full' or 'window')
+        self._prompt_stats: Dict[str, Dict[str, float]] = {}
+        self._prompt_stats_lock = threading.Lock()
+        self.answer_cache = None
+        if app.config.get('ANSWER_CACHE_SIZE', 1024) > 0 or app.config.get('ANSWER_CACHE_DB'):
+            self.answer_cache = AnswerCache(
+                max_entries=app.config.get('ANSWER_CACHE_SIZE', 1024),
+                ttl=app.config.get('ANSWER_CACHE_TTL', 7 * 24 * 3600),
+                db_path=app.config.get('ANSWER_CACHE_DB'),
+                max_db_entries=app.config.get('ANSWER_CACHE_DB_MAX_ENTRIES', 100_000)
+            )
+
+        # Identical questions asked while one is being answered wait for that answer
+        self._in_flight = SingleFlight()
+        self.admission = AdmissionController(
+            max_concurrent=app.config.get('CLAUDE_MAX_CONCURRENT', 4),
+            max_queue=app.config.get('CLAUDE_MAX_QUEUE', 32),
+            queue_timeout=app.config.get('CLAUDE_QUEUE_TIMEOUT', 10),
+            rate=app.config.get('CLAUDE_REQUESTS_PER_SECOND', 0),
+            burst=app.config.get('CLAUDE_BURST', 4)
+        )
+        self.max_retries = app.config.get('CLAUDE_MAX_RETRIES', 3)
+        self.retry_base_delay = app.config.get('CLAUDE_RETRY_BASE_DELAY', 0.5)
+        self.retry_max_delay = app.config.get('CLAUDE_RETRY_MAX_DELAY', 8)
+
+    def _request_params(self, prompt: str) -> Dict[str, Any]:
+        return {
+            'model': self.model,
+            'max_tokens': self.generation_params['max_tokens'],
+            'temperature': self.generation_params['temperature'],
+            'system': SYSTEM_PROMPT,
+            'messages': [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
+
+    def _retry_delay(self, call_id: str, attempt: int, error: Exception) -> float:
+        """Log a retryable error and return how long to wait before retrying.
+
+        The delay is jittered and grows exponentially, or is the server's
+        Retry-After if that is longer.
+        """
+        delay = backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
+        if isinstance(error, RateLimitError):
+            try:
+                retry_after = float(error.response.headers.get('retry-after', 0))
+            except ValueError:
+                retry_after = 0
+            delay = max(delay, min(retry_after, self.retry_max_delay))
+        self.logger.warning(
+            f"{type(error).__name__} for call {call_id}, retry {attempt + 1} of {self.max_retries} in {delay:.2f}s"
+        )
+        return delay
+
+    def _create_message(self, call_id: str, prompt: str):
+        """Send a request to Claude once admitted, retrying rate-limit and timeout errors.
+
+        Retries wait without holding an admission slot.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.admission.admit():
+                    return self.client.messages.create(**self._request_params(prompt))
+            except (RateLimitError, APITimeoutError) as e:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(call_id, attempt, e))
+
+    def _stream_message(self, call_id: str, prompt: str) -> Iterator[str]:
+        """Stream the text of Claude's answer once admitted.
+
+        Errors before the first text are retried like in _create_message. The
+        admission slot is held until the stream ends; closing this generator
+        closes the upstream stream.
+        """
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                with self.admission.admit():
+                    with self.client.messages.stream(**self._request_params(prompt)) as stream:
+                        for text in stream.text_stream:
+                            started = True
+                            yield text
+                return
+            except (RateLimitError, APITimeoutError) as e:
+                if started or attempt == self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(call_id, attempt, e))
+
+    def _check_parameters(self, call_id: str, question: str, transcript: str) -> None:
         if not all([call_id, question, transcript]):
             missing = []
             if not call_id: missing.append("call_id")
@@ -30,67 +158,266 @@ class ClaudeService:
             self.logger.error(error_msg)
             raise ValueError(error_msg)
 
-        self.logger.info(f"Processing question for call {call_id}: {question[:100]}...")
-            
-        try:
-            system_prompt = "You are a helpful AI assistant analyzing sales call transcripts. Provide concise, focused answers based only on the information in the transcript."
-            
-            prompt = f"""Given this sales call transcript:
+    def _service_error(self, call_id: str, error: Exception) -> Exception:
+        """Log an error from the Claude API and return the exception to show users instead."""
+        if isinstance(error, RateLimitError):
+            self.logger.error(f"Rate limit exceeded for call {call_id}: {str(error)}")
+            return Exception("Too many requests. Please try again later.")
+        if isinstance(error, APITimeoutError):
+            self.logger.error(f"API timeout for call {call_id}: {str(error)}")
+            return Exception("Request timed out. Please try again.")
+        if isinstance(error, APIConnectionError):
+            self.logger.error(f"Connection error for call {call_id}: {str(error)}")
+            return Exception("Unable to connect to AI service. Please try again later.")
+        if isinstance(error, APIError):
+            self.logger.error(f"API error for call {call_id}: {str(error)}")
+            return Exception("AI service error. Please try again later.")
+        self.logger.error(f"Unexpected error processing question for call {call_id}: {str(error)}")
+        return Exception("An unexpected error occurred. Please try again later.")
 
-{transcript}
+    def _prompt(self, question: str, transcript: str) -> Tuple[str, str]:
+        """Build the prompt for a question, returning it with its mode.
 
-Please answer this question about the call: {question}
+        With TRANSCRIPT_WINDOW_TOKENS set, long transcripts are cut down to
+        the excerpts most relevant to the question ('window' mode); otherwise,
+        or when nothing in the transcript matches, the whole transcript is
+        sent ('full' mode).
+        """
+        budget = self.generation_params['transcript_window_tokens']
+        if budget > 0:
+            excerpts = window_transcript(
+                transcript, question, budget, self.generation_params['transcript_chunk_tokens']
+            )
+            if excerpts is not None:
+                return _build_prompt(excerpts, question, excerpts=True), 'window'
+        return _build_prompt(transcript, question), 'full'
 
-Keep your answer concise and focused on the specific question asked.
-If you can't find a clear answer in the transcript, please say so."""
+    def _record_prompt(self, call_id: str, mode: str, prompt: str, latency: float,
+                       input_tokens: Optional[int] = None, first_token: Optional[float] = None) -> None:
+        prompt_tokens = estimate_tokens(prompt)
+        self.logger.info(
+            f"Prompt for call {call_id}: mode={mode}, ~{prompt_tokens} tokens"
+            + (f" ({input_tokens} input tokens)" if input_tokens is not None else "")
+            + (f", first token after {first_token:.2f}s" if first_token is not None else "")
+            + f", answered in {latency:.2f}s"
+        )
+        with self._prompt_stats_lock:
+            stats = self._prompt_stats.setdefault(mode, {
+                'requests': 0, 'prompt_tokens': 0, 'latency': 0.0,
+                'input_tokens': 0, 'input_token_requests': 0
+            })
+            stats['requests'] += 1
+            stats['prompt_tokens'] += prompt_tokens
+            stats['latency'] += latency
+            if input_tokens is not None:
+                stats['input_tokens'] += input_tokens
+                stats['input_token_requests'] += 1
+
+    def get_prompt_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Average prompt size and latency of the questions sent to Claude, per prompt mode."""
+        with self._prompt_stats_lock:
+            return {
+                mode: {
+                    'requests': stats['requests'],
+                    'avg_prompt_tokens': round(stats['prompt_tokens'] / stats['requests']),
+                    'avg_input_tokens': (round(stats['input_tokens'] / stats['input_token_requests'])
+                                         if stats['input_token_requests'] else None),
+                    'avg_latency_ms': round(stats['latency'] / stats['requests'] * 1000)
+                }
+                for mode, stats in self._prompt_stats.items()
+            }
 
+    def get_response(self, call_id: str, question: str, transcript: str) -> Optional[str]:
+        """Get AI response for a question about a call transcript."""
+        self._check_parameters(call_id, question, transcript)
+        self.logger.info(f"Processing question for call {call_id}: {question[:100]}...")
+            
+        try:
             self.logger.debug(f"Sending request to Claude API for call {call_id}")
-            message = self.client.messages.create(
-                model="claude-3-5-haiku-20241022",
-                max_tokens=300,
-                temperature=0,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
+            prompt, mode = self._prompt(question, transcript)
+            started = time.perf_counter()
+            message = self._create_message(call_id, prompt)
+            usage = getattr(message, 'usage', None)
+            self._record_prompt(call_id, mode, prompt, time.perf_counter() - started,
+                                input_tokens=getattr(usage, 'input_tokens', None))
             
             response = message.content[0].text
             self.logger.info(f"Successfully got response for call {call_id}")
             self.logger.debug(f"Response length: {len(response)} characters")
             return response
 
-        except RateLimitError as e:
-            self.logger.error(f"Rate limit exceeded for call {call_id}: {str(e)}")
-            raise Exception("Too many requests. Please try again later.") from e
-            
-        except APITimeoutError as e:
-            self.logger.error(f"API timeout for call {call_id}: {str(e)}")
-            raise Exception("Request timed out. Please try again.") from e
-            
-        except APIConnectionError as e:
-            self.logger.error(f"Connection error for call {call_id}: {str(e)}")
-            raise Exception("Unable to connect to AI service. Please try again later.") from e
-            
-        except APIError as e:
-            self.logger.error(f"API error for call {call_id}: {str(e)}")
-            raise Exception("AI service error. Please try again later.") from e
-            
+        except AdmissionRejected as e:
+            self.logger.warning(f"Question for call {call_id} not admitted: {str(e)}")
+            raise
+
         except Exception as e:
-            self.logger.error(f"Unexpected error processing question for call {call_id}: {str(e)}")
-            raise Exception("An unexpected error occurred. Please try again later.") from e 
+            raise self._service_error(call_id, e) from e
 
-    def ask_question(self, question: str, call: dict) -> str:
-        """Ask a question about a specific call."""
-        if current_app.config.get('TESTING'):
-            return "This is a test response from Claude"
-            
-        # Use the existing get_response method
-        return self.get_response(
-            call_id=call['id'],
-            question=question,
-            transcript=call['transcript']['text']
-        ) 
\ No newline at end of file
+    def stream_response(self, call_id: str, question: str, transcript: str) -> Iterator[str]:
+        """Like get_response, but yields the answer in pieces as Claude generates it."""
+        self._check_parameters(call_id, question, transcript)
+        self.logger.info(f"Streaming answer for call {call_id}: {question[:100]}...")
+
+        length = 0
+        first_token = None
+        try:
+            prompt, mode = self._prompt(question, transcript)
+            started = time.perf_counter()
+            for text in self._stream_message(call_id, prompt):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                length += len(text)
+                yield text
+            self._record_prompt(call_id, mode, prompt, time.perf_counter() - started, first_token=first_token)
+        except AdmissionRejected as e:
+            self.logger.warning(f"Question for call {call_id} not admitted: {str(e)}")
+            raise
+        except Exception as e:
+            raise self._service_error(call_id, e) from e
+        self.logger.info(f"Successfully streamed response for call {call_id}")
+        self.logger.debug(f"Response length: {length} characters")
+
+    def _cache_key(self, question: str, call: CallRecord) -> Tuple[str, str]:
+        # The snapshot already hashed the call's record; only a call replaced
+        # by a reload since it was looked up needs its transcript hashed here
+        digest = current_app.call_service.get_content_hash(call) or transcript_hash(call.transcript_text)
+        return answer_cache_key(call.id, digest, question, self.model, self.generation_params), digest
+
+    def _cached_answer(self, key: str, call_id: str) -> Optional[Tuple[str, str]]:
+        if self.answer_cache is None:
+            return None
+        try:
+            return self.answer_cache.get(key)
+        except Exception as e:
+            self.logger.warning(f"Answer cache lookup failed for call {call_id}: {str(e)}")
+            return None
+
+    def _cache_answer(self, key: str, answer: str, call_id: str, digest: str) -> None:
+        if self.answer_cache is None:
+            return
+        try:
+            self.answer_cache.put(key, answer, call_id, digest)
+        except Exception as e:
+            self.logger.warning(f"Failed to cache answer for call {call_id}: {str(e)}")
+
+    def ask_question(self, question: str, call: CallRecord) -> Tuple[str, Dict[str, Any]]:
+        """Ask a question about a specific call.
+
+        Returns the answer and cache metadata: whether it was a cache hit and
+        the layer ('memory' or 'sqlite') that served it. A question asked while
+        the same one is being answered shares that answer, reported as a hit
+        on the 'in-flight' layer.
+        """
+        key, digest = self._cache_key(question, call)
+        cached = self._cached_answer(key, call.id)
+        if cached is not None:
+            answer, layer = cached
+            return answer, {'hit': True, 'layer': layer}
+
+        def answer_question() -> str:
+            if current_app.config.get('TESTING'):
+                answer = TEST_RESPONSE
+            else:
+                # Use the existing get_response method
+                answer = self.get_response(
+                    call_id=call.id,
+                    question=question,
+                    transcript=call.transcript_text
+                )
+            self._cache_answer(key, answer, call.id, digest)
+            return answer
+
+        answer, shared = self._in_flight.do(key, answer_question)
+        if shared:
+            return answer, {'hit': True, 'layer': 'in-flight'}
+        return answer, {'hit': False, 'layer': None}
+
+    def stream_question(self, question: str, call: CallRecord) -> Iterator[Tuple[str, Any]]:
+        """Ask a question about a specific call, streaming the answer.
+
+        Yields ('cache', metadata) as in ask_question, followed by one or more
+        ('text', piece) events; answers that were not generated by this call
+        come as a single piece. Closing the generator before the end cancels
+        the request to Claude, and anyone waiting for the same answer asks
+        again themselves.
+        """
+        key, digest = self._cache_key(question, call)
+        cached = self._cached_answer(key, call.id)
+        if cached is not None:
+            answer, layer = cached
+            yield 'cache', {'hit': True, 'layer': layer}
+            yield 'text', answer
+            return
+
+        flight, leader = self._in_flight.join(key)
+        if not leader:
+            answer = flight.outcome()
+            yield 'cache', {'hit': True, 'layer': 'in-flight'}
+            yield 'text', answer
+            return
+
+        pieces = []
+        texts = None
+        try:
+            if current_app.config.get('TESTING'):
+                words = TEST_RESPONSE.split(' ')
+                texts = iter([words[0]] + [f' {word}' for word in words[1:]])
+            else:
+                texts = self.stream_response(call.id, question, call.transcript_text)
+            yield 'cache', {'hit': False, 'layer': None}
+            for text in texts:
+                pieces.append(text)
+                yield 'text', text
+        except GeneratorExit:
+            self.logger.info(f"Answer for call {call.id} cancelled after {len(pieces)} pieces")
+            if hasattr(texts, 'close'):
+                # Stops the upstream stream
+                texts.close()
+            self._in_flight.abandon(key, flight)
+            raise
+        except BaseException as e:
+            self._in_flight.finish(key, flight, error=e)
+            raise
+
+        answer = ''.join(pieces)
+        self._cache_answer(key, answer, call.id, digest)
+        self._in_flight.finish(key, flight, answer)
+
+    def ask_questions(self, calls: List[CallRecord], questions: List[str],
+                      max_workers: int = 4) -> Iterator[Dict[str, Any]]:
+        """Ask every question about every call, yielding results as they finish.
+
+        Up to max_workers questions are answered at once, each through
+        ask_question, so cached answers are reused. A result holds the call_id
+        and question with either the answer and cache metadata or an error.
+        Closing the generator cancels the questions that have not started.
+        """
+        app = current_app._get_current_object()
+        items = ((call, question) for call in calls for question in questions)
+
+        def answer(call: CallRecord, question: str) -> Dict[str, Any]:
+            result = {'call_id': call.id, 'question': question}
+            with app.app_context():
+                try:
+                    result['answer'], result['cache'] = self.ask_question(question, call)
+                except Exception as e:
+                    result['error'] = str(e)
+            return result
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch-question')
+        pending = set()
+        try:
+            while True:
+                # Only queue a few items ahead, so a closed stream leaves little to cancel
+                while len(pending) < 2 * max_workers:
+                    item = next(items, None)
+                    if item is None:
+                        break
+                    pending.add(executor.submit(answer, *item))
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
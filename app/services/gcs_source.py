@@ -0,0 +1,167 @@
+"""
+GcsCallsSource: Calls data read from Google Cloud Storage.
+
+One storage client and bucket handle are kept for the life of the source,
+so credential discovery and the HTTP connection pool are set up once rather
+than on every reload. A process forked after the client was created (a
+gunicorn worker) creates its own, since connection pools cannot be shared
+across processes.
+
+The calls are either a single object (``blob_name``), or shards: every
+object under ``prefix`` whose name matches ``shard_pattern``, read in name
+order. The single object is streamed in ``chunk_size`` ranged reads straight
+into the JSON parser. Shards are downloaded whole by ``download_workers``
+threads, a few shards ahead of the parser, so memory stays bounded by the
+size of that many shards.
+
+The version of the data is the object generation, or a digest of the shard
+names and generations. Checking an unchanged object is a conditional request
+(if-generation-not-match) that the server answers with 304 Not Modified.
+
+Reads are pinned to a version: every chunk of the single object, and every
+shard, is requested with if-generation-match for the generation that
+version() saw. An upload that lands during a read makes the read fail with
+PreconditionFailed instead of mixing data from two generations.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+import hashlib
+import io
+import json
+import os
+import posixpath
+import threading
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from google.api_core.exceptions import NotModified, PreconditionFailed
+from google.cloud import storage
+
+from .call_stream import is_json_lines, iter_json_array, iter_json_lines
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class GcsCallsSource:
+    def __init__(self, bucket_name: str, blob_name: str = 'calls.json', prefix: Optional[str] = None,
+                 shard_pattern: str = 'calls-*.json*', download_workers: int = 4,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.bucket_name = bucket_name
+        self.blob_name = blob_name
+        self.prefix = prefix
+        self.shard_pattern = shard_pattern
+        self.download_workers = max(download_workers, 1)
+        self.chunk_size = chunk_size
+        self._client = None
+        self._bucket = None
+        # Process that created the client
+        self._client_pid: Optional[int] = None
+        # The last shards version computed, with the generation of each shard by name
+        self._shards: Optional[Tuple[str, Dict[str, int]]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        """The gs:// location of the calls, for messages."""
+        target = f"{self.prefix}{self.shard_pattern}" if self.prefix else self.blob_name
+        return f"gs://{self.bucket_name}/{target}"
+
+    @property
+    def bucket(self) -> storage.Bucket:
+        with self._lock:
+            if self._bucket is None or self._client_pid != os.getpid():
+                self._client = storage.Client()
+                self._bucket = self._client.bucket(self.bucket_name)
+                self._client_pid = os.getpid()
+            return self._bucket
+
+    @staticmethod
+    def _generation(version: Optional[str]) -> Optional[int]:
+        """The object generation in a single object version, if it is one."""
+        if version and version.startswith('gcs:') and version[4:].isdigit():
+            return int(version[4:])
+        return None
+
+    def version(self, known: Optional[str] = None) -> str:
+        """Identify the current version of the calls without downloading them.
+
+        known is the version already loaded, if any; for a single object it
+        lets the server skip sending metadata when nothing has changed.
+        """
+        if self.prefix:
+            version, generations = self._shard_listing()
+            with self._lock:
+                self._shards = (version, generations)
+            return version
+
+        try:
+            blob = self.bucket.get_blob(self.blob_name, if_generation_not_match=self._generation(known))
+        except NotModified:
+            return known
+        if blob is None:
+            raise FileNotFoundError(f"Blob not found: {self.name}")
+        return f"gcs:{blob.generation}"
+
+    def _shard_listing(self) -> Tuple[str, Dict[str, int]]:
+        shards = self.list_shards()
+        if not shards:
+            raise FileNotFoundError(f"No calls shards found at {self.name}")
+        listing = json.dumps([[blob.name, blob.generation] for blob in shards])
+        version = f"gcs-shards:{len(shards)}:{hashlib.blake2b(listing.encode(), digest_size=8).hexdigest()}"
+        return version, {blob.name: blob.generation for blob in shards}
+
+    def open_blob(self, version: str) -> TextIO:
+        """Open a text stream over the calls object at version, fetched in chunk_size pieces.
+
+        Reading raises PreconditionFailed once the object no longer has the
+        generation of version.
+        """
+        generation = self._generation(version)
+        if generation is None:
+            raise ValueError(f"Not a calls object version: {version}")
+        return self.bucket.blob(self.blob_name).open(
+            'rt', encoding='utf-8', chunk_size=self.chunk_size, if_generation_match=generation
+        )
+
+    def list_shards(self) -> List[storage.Blob]:
+        blobs = self.bucket.list_blobs(prefix=self.prefix)
+        shards = [blob for blob in blobs if fnmatch(posixpath.basename(blob.name), self.shard_pattern)]
+        return sorted(shards, key=lambda blob: blob.name)
+
+    def iter_shard_calls(self, version: str) -> Iterator[Dict]:
+        """Yield the raw call records of every shard at version, in shard name order.
+
+        Raises PreconditionFailed if the shards no longer match version.
+        Closing the iterator cancels the downloads that have not started.
+        """
+        with self._lock:
+            shards = self._shards
+        if shards is None or shards[0] != version:
+            # Another check has listed the shards since; list them again
+            shards = self._shard_listing()
+            if shards[0] != version:
+                raise PreconditionFailed(f"Calls shards at {self.name} changed since {version}")
+        generations = shards[1]
+
+        executor = ThreadPoolExecutor(max_workers=self.download_workers, thread_name_prefix='gcs-download')
+        downloads = deque()
+        try:
+            for name in sorted(generations):
+                blob = self.bucket.blob(name)
+                downloads.append((name, executor.submit(blob.download_as_bytes,
+                                                        if_generation_match=generations[name])))
+                if len(downloads) < self.download_workers:
+                    continue
+                yield from self._parse_shard(*downloads.popleft())
+            while downloads:
+                yield from self._parse_shard(*downloads.popleft())
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _parse_shard(name: str, download) -> Iterator[Dict]:
+        stream = io.StringIO(download.result().decode('utf-8'))
+        if is_json_lines(name):
+            return iter_json_lines(stream)
+        return iter_json_array(stream)
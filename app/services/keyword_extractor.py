@@ -0,0 +1,120 @@
+"""
+KeywordExtractor: Single-pass multi-term keyword matching over transcripts.
+
+All terms are compiled once into an Aho-Corasick automaton. Extraction then
+walks the lowercased transcript a single time, tracking sentence boundaries,
+and records every sentence in which each term occurs. The result matches what
+``re.finditer(f"[^.]*{term}[^.]*\\.", text.lower())`` produced per term: the
+stripped, lowercased sentence including its closing period, once per sentence,
+with trailing text that has no closing period ignored.
+
+extract_spans returns the same sentences as (start, end) offsets into the
+lowercased text, which lets callers keep keyword context without copying it.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+DEFAULT_KEYWORD_TERMS = [
+    'pricing', 'budget', 'timeline', 'implementation', 'integration',
+    'decision', 'approval', 'concerns', 'requirements', 'next steps',
+    'follow up', 'demo', 'trial', 'features', 'competition'
+]
+
+
+class KeywordExtractor:
+    def __init__(self, terms: Iterable[str] = DEFAULT_KEYWORD_TERMS):
+        self.terms = list(dict.fromkeys(term.lower() for term in terms if term))
+        for term in self.terms:
+            if '.' in term:
+                raise ValueError(f"Keyword term cannot contain a period: '{term}'")
+
+        # Automaton states: goto transitions, failure links and the indexes of
+        # the terms that end in each state (including via failure links)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        for index, term in enumerate(self.terms):
+            self._add_term(index, term)
+        self._build_failure_links()
+
+    def _add_term(self, index: int, term: str) -> None:
+        state = 0
+        for char in term:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(index)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def extract(self, text: str) -> Dict[str, List[str]]:
+        """Map each term found in text to the sentences that mention it."""
+        if not text:
+            return {}
+        lowered = text.lower()
+        return {
+            term: [lowered[start:end] for start, end in spans]
+            for term, spans in self._spans(lowered).items()
+        }
+
+    def extract_spans(self, text: str) -> Dict[str, List[Tuple[int, int]]]:
+        """Map each term found in text to the (start, end) offsets of its sentences.
+
+        Offsets index into ``text.lower()``, which for most text (and all
+        ASCII text) has the same length as ``text`` itself.
+        """
+        if not text:
+            return {}
+        return self._spans(text.lower())
+
+    def _spans(self, lowered: str) -> Dict[str, List[Tuple[int, int]]]:
+        if not self.terms:
+            return {}
+
+        goto, fail, output = self._goto, self._fail, self._output
+        spans: List[List[Tuple[int, int]]] = [[] for _ in self.terms]
+
+        state = 0
+        sentence_start = 0
+        sentence_terms = set()
+        for position, char in enumerate(lowered):
+            if char == '.':
+                if sentence_terms:
+                    # Strip surrounding whitespace without copying the sentence
+                    start, end = sentence_start, position + 1
+                    while lowered[start].isspace():
+                        start += 1
+                    for index in sentence_terms:
+                        spans[index].append((start, end))
+                    sentence_terms = set()
+                sentence_start = position + 1
+                state = 0
+                continue
+
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                sentence_terms.update(output[state])
+
+        return {
+            term: spans[index]
+            for index, term in enumerate(self.terms)
+            if spans[index]
+        }
@@ -0,0 +1,115 @@
+"""
+ResponseCache: Serialized and compressed response bodies, reused across requests.
+
+Serializing a call record, transcript and all, is most of the work of
+/api/call/<id>, and compressing the result costs about as much again. The
+cache keeps the bytes of each response under its ETag, with every content
+encoding compressed the first time a client asks for it, so a hot call is
+serialized and compressed once per version rather than once per request.
+
+Bodies are kept for one dataset generation: the first request after a
+reload clears the cache. It is bounded by entry count and total bytes,
+evicting the least recently used entries. Bodies smaller than
+``min_compress_size`` are always sent uncompressed.
+
+gzip is always available; brotli is used when the brotli package is
+installed.
+"""
+
+from collections import OrderedDict
+import gzip
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IDENTITY = 'identity'
+# Supported content encodings, most preferred first
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+GZIP_LEVEL = 6
+# Brotli's higher qualities compress a little better at many times the cost
+BROTLI_QUALITY = 5
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        # A fixed mtime keeps the output identical for identical bodies
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024,
+                 min_compress_size: int = 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.min_compress_size = min_compress_size
+        # etag -> bodies by content encoding, least recently used first
+        self._entries: 'OrderedDict[str, Dict[str, bytes]]' = OrderedDict()
+        self._size = 0
+        self._generation: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def body(self, etag: str, generation: Optional[str], encoding: str,
+             serialize: Callable[[], bytes]) -> Tuple[bytes, str]:
+        """Get the response body for etag in encoding, building it on a miss.
+
+        serialize returns the uncompressed body and is only called when no
+        encoding of it is cached. generation identifies the loaded calls; a
+        new one clears the cache. Returns the body and the encoding it is in,
+        which is IDENTITY when the body is too small to compress.
+        """
+        with self._lock:
+            if generation != self._generation:
+                self._entries.clear()
+                self._size = 0
+                self._generation = generation
+            bodies = self._entries.get(etag)
+            if bodies is not None:
+                self._entries.move_to_end(etag)
+                identity = bodies[IDENTITY]
+                if encoding in bodies:
+                    return bodies[encoding], encoding
+                if len(identity) < self.min_compress_size:
+                    return identity, IDENTITY
+
+        # Serialize and compress outside the lock; concurrent misses may do it twice
+        if bodies is None:
+            identity = serialize()
+        if encoding == IDENTITY or len(identity) < self.min_compress_size:
+            encoding = IDENTITY
+            body = identity
+        else:
+            body = compress(identity, encoding)
+
+        with self._lock:
+            if generation == self._generation:
+                self._store(etag, identity, encoding, body)
+        return body, encoding
+
+    def _store(self, etag: str, identity: bytes, encoding: str, body: bytes) -> None:
+        bodies = self._entries.get(etag)
+        if bodies is None:
+            bodies = self._entries[etag] = {IDENTITY: identity}
+            self._size += len(identity)
+        if encoding not in bodies:
+            bodies[encoding] = body
+            self._size += len(body)
+        self._entries.move_to_end(etag)
+        while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= sum(len(data) for data in evicted.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,213 @@
+"""
+SearchIndex: Token-level inverted index over call titles and transcripts.
+
+Every call is tokenized once at load time into lowercase word tokens. For each
+term the index keeps a postings map of call ID -> token positions, which is
+enough to answer single-word lookups, phrase queries and prefix/substring
+queries without touching the transcript text again.
+
+Match modes:
+
+- ``word`` (default): every query token must match a whole word and multi-word
+  queries must appear as a phrase. For whole-word queries this returns the same
+  calls as a case-insensitive substring scan, except that punctuation between
+  the words of a phrase is ignored.
+- ``prefix``: like ``word``, but the last query token only has to be the start
+  of a word. Intended for search-as-you-type.
+- ``substring``: mirrors ``query in text``. A single token may appear anywhere
+  inside a word; in a phrase the first token may be a word suffix, the last a
+  word prefix and the ones in between must be whole words. This mode scans the
+  vocabulary (not the transcripts) and is the slowest of the three.
+
+An index can be cloned with ``copy`` and the clone updated with ``add`` and
+``remove``. The clone shares postings with the original until a term is
+modified, so updating it for a handful of changed calls is cheap and never
+alters the index that in-flight requests are reading.
+"""
+
+from array import array
+from bisect import bisect_left
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+SEARCH_MODES = ('word', 'prefix', 'substring')
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class SearchIndex:
+    def __init__(self):
+        # term -> {call_id: positions}
+        self._postings: Dict[str, Dict[str, array]] = {}
+        # Terms whose postings map belongs to this index rather than being
+        # shared with the index it was copied from
+        self._owned_terms: Set[str] = set()
+        self._sorted_terms: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self._postings)
+
+    def copy(self) -> 'SearchIndex':
+        """Return a clone that can be modified without affecting this index."""
+        clone = SearchIndex()
+        clone._postings = dict(self._postings)
+        clone._sorted_terms = self._sorted_terms
+        return clone
+
+    def __getstate__(self) -> Dict[str, Tuple[List[str], array, array]]:
+        # Pickle each postings map as its call IDs plus two flat arrays rather
+        # than one array per call, which saved snapshots load much faster
+        packed = {}
+        for term, postings in self._postings.items():
+            positions = array('I')
+            for call_positions in postings.values():
+                positions.extend(call_positions)
+            packed[term] = (list(postings), array('I', map(len, postings.values())), positions)
+        return packed
+
+    def __setstate__(self, packed: Dict[str, Tuple[List[str], array, array]]) -> None:
+        self._postings = {}
+        for term, (call_ids, lengths, positions) in packed.items():
+            postings = {}
+            offset = 0
+            for call_id, length in zip(call_ids, lengths):
+                end = offset + length
+                postings[call_id] = positions[offset:end]
+                offset = end
+            self._postings[term] = postings
+        self._owned_terms = set(self._postings)
+        self._sorted_terms = None
+
+    def _owned_postings(self, term: str) -> Dict[str, array]:
+        """Return the postings map of term, copying it first if it is shared."""
+        if term not in self._owned_terms:
+            self._postings[term] = dict(self._postings.get(term, {}))
+            self._owned_terms.add(term)
+        return self._postings[term]
+
+    def add(self, call_id: str, *fields: str) -> None:
+        """Index the given text fields of a call.
+
+        Fields are laid out one after the other with a one-position gap, so a
+        phrase can never match across the end of one field and the start of
+        the next.
+        """
+        terms: Dict[str, array] = {}
+        position = 0
+        for field in fields:
+            for token in tokenize(field or ''):
+                positions = terms.get(token)
+                if positions is None:
+                    positions = terms[token] = array('I')
+                positions.append(position)
+                position += 1
+            position += 1
+
+        added_terms = False
+        for term, positions in terms.items():
+            added_terms = added_terms or term not in self._postings
+            self._owned_postings(term)[call_id] = positions
+        if added_terms:
+            self._sorted_terms = None
+
+    def remove(self, call_id: str, *fields: str) -> None:
+        """Remove a call, given the same text fields it was indexed with."""
+        removed_terms = False
+        for term in set(tokenize(' '.join(field or '' for field in fields))):
+            if call_id not in self._postings.get(term, ()):
+                continue
+            postings = self._owned_postings(term)
+            del postings[call_id]
+            if not postings:
+                del self._postings[term]
+                self._owned_terms.discard(term)
+                removed_terms = True
+        if removed_terms:
+            self._sorted_terms = None
+
+    def search(self, query: str, mode: str = 'word') -> Set[str]:
+        """Return the IDs of all calls matching the query."""
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}', expected one of: {', '.join(SEARCH_MODES)}")
+
+        tokens = tokenize(query)
+        if not tokens:
+            return set()
+
+        term_groups = [
+            self._expand(token, mode, index, len(tokens))
+            for index, token in enumerate(tokens)
+        ]
+        if not all(term_groups):
+            return set()
+
+        if len(term_groups) == 1:
+            return {
+                call_id
+                for term in term_groups[0]
+                for call_id in self._postings[term]
+            }
+
+        # Only calls that contain every token can contain the phrase
+        candidates = None
+        for terms in term_groups:
+            call_ids = {call_id for term in terms for call_id in self._postings[term]}
+            candidates = call_ids if candidates is None else candidates & call_ids
+            if not candidates:
+                return set()
+
+        return {
+            call_id for call_id in candidates
+            if self._contains_phrase(call_id, term_groups)
+        }
+
+    def _expand(self, token: str, mode: str, index: int, count: int) -> List[str]:
+        """Return the indexed terms that a query token matches in the given mode."""
+        is_first = index == 0
+        is_last = index == count - 1
+
+        if mode == 'substring' and (is_first or is_last):
+            if is_first and is_last:
+                return [term for term in self._postings if token in term]
+            if is_first:
+                return [term for term in self._postings if term.endswith(token)]
+            return self._terms_with_prefix(token)
+
+        if mode == 'prefix' and is_last:
+            return self._terms_with_prefix(token)
+
+        return [token] if token in self._postings else []
+
+    def _terms_with_prefix(self, prefix: str) -> List[str]:
+        """Return all indexed terms starting with prefix using the sorted vocabulary."""
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        terms = self._sorted_terms
+
+        matches = []
+        for i in range(bisect_left(terms, prefix), len(terms)):
+            if not terms[i].startswith(prefix):
+                break
+            matches.append(terms[i])
+        return matches
+
+    def _positions(self, call_id: str, terms: Iterable[str]) -> Set[int]:
+        positions = set()
+        for term in terms:
+            positions.update(self._postings[term].get(call_id, ()))
+        return positions
+
+    def _contains_phrase(self, call_id: str, term_groups: List[List[str]]) -> bool:
+        """Check whether the call has the term groups at consecutive positions."""
+        starts = self._positions(call_id, term_groups[0])
+        for offset, terms in enumerate(term_groups[1:], start=1):
+            positions = self._positions(call_id, terms)
+            starts = {start for start in starts if start + offset in positions}
+            if not starts:
+                return False
+        return True
@@ -0,0 +1,128 @@
+"""
+Snapshot files: processed calls and their indexes saved to disk.
+
+A new worker normally has to fetch the calls source and process every record
+before it can serve its first request. Loading a snapshot file instead only
+deserializes the CallSnapshot built by an earlier load, including its search
+index, cards and company facets.
+
+A file starts with MAGIC and a small pickled header, followed by the pickled
+snapshot. The header records the file format, the source version the snapshot
+was built from and the keyword terms used to process it, so a reader can
+reject an incompatible file without deserializing the snapshot itself.
+
+Calls whose transcripts live in a TranscriptStore are saved with references
+to their segment files rather than the text. Those segments are persisted, so
+they stay on disk for as long as the snapshot file may be loaded.
+
+Processes that share a snapshot file use ``snapshot_lock`` so that only one
+of them builds a new snapshot while the others wait to load it.
+
+Snapshot files are pickles and must only be loaded from trusted locations.
+SNAPSHOT_FORMAT has to be increased whenever CallRecord, CallSnapshot,
+SearchIndex or CallAnalytics change their attributes.
+"""
+
+from contextlib import contextmanager
+import gc
+import os
+import pickle
+import tempfile
+from typing import Any, BinaryIO, Dict, Iterator, List, Set
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+from .call_snapshot import CallSnapshot
+
+MAGIC = b'CPSNAP\n'
+SNAPSHOT_FORMAT = 3
+
+
+def save_snapshot(snapshot: CallSnapshot, path: str, keyword_terms: List[str]) -> Set[str]:
+    """Write snapshot to path, replacing any existing file atomically.
+
+    Returns the paths of the transcript segments the file refers to.
+    """
+    segments = {
+        call.transcript_ref.segment for call in snapshot.calls if call.transcript_ref is not None
+    }
+    for segment in segments:
+        segment.persist()
+
+    header = {
+        'format': SNAPSHOT_FORMAT,
+        'source_version': snapshot.source_version,
+        'keyword_terms': list(keyword_terms),
+        'calls': len(snapshot)
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.snapshot-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return {segment.path for segment in segments}
+
+
+@contextmanager
+def snapshot_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock for the snapshot file at path across processes.
+
+    Blocks until the lock is free. Without fcntl (Windows) this only yields.
+    """
+    if fcntl is None:
+        yield
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(f'{path}.lock', 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _read_header(f: BinaryIO) -> Dict[str, Any]:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a calls snapshot file")
+    header = pickle.load(f)
+    if header.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"Snapshot format {header.get('format')} is not supported (expected {SNAPSHOT_FORMAT})")
+    return header
+
+
+def read_snapshot_header(path: str) -> Dict[str, Any]:
+    """Read the header of a snapshot file without loading the snapshot."""
+    with open(path, 'rb') as f:
+        return _read_header(f)
+
+
+def load_snapshot(path: str, keyword_terms: List[str]) -> CallSnapshot:
+    """Load a snapshot file, raising ValueError if it cannot be used with these keyword terms."""
+    with open(path, 'rb') as f:
+        header = _read_header(f)
+        if header.get('keyword_terms') != list(keyword_terms):
+            raise ValueError("Snapshot was built with different keyword terms")
+
+        # Unpickling allocates millions of objects; collecting in between only slows it down
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            snapshot = pickle.load(f)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    if not isinstance(snapshot, CallSnapshot):
+        raise ValueError("Snapshot file does not contain a CallSnapshot")
+    return snapshot
@@ -0,0 +1,221 @@
+"""
+TranscriptStore: Memory-mapped on-disk storage for call transcripts.
+
+Transcripts are the bulk of each call but are only read to serve a full call,
+answer a question or rebuild keyword context. The store writes them as UTF-8
+into segment files and maps each segment with ``mmap``; a call record keeps a
+small TranscriptRef instead of the text, and the text is decoded from the
+mapped pages on demand. Pages are owned by the OS page cache, so they do not
+count towards the Python heap and are shared between processes that map the
+same file (or inherit the mapping across fork).
+
+Segment layout::
+
+    text 0 | text 1 | ... | offsets (count + 1 x uint64) | count (uint64) | MAGIC
+
+Offsets are stored in native byte order and read back through a memoryview of
+the mapping, so the offset table is not copied into the heap either.
+
+CallService writes one segment per reload for the calls that were added or
+changed. A segment's file is deleted once no record in the process that wrote
+it references it any more, which keeps snapshots that in-flight requests still
+hold readable. Deleting a file never affects processes that have it mapped.
+
+A saved snapshot file refers to its segments by path, so other processes can
+map the same pages. Saving persists those segments: they are no longer deleted
+on release, and ``remove_unused`` deletes them once a newer snapshot file no
+longer needs them.
+"""
+
+from array import array
+import mmap
+import os
+import struct
+import tempfile
+import weakref
+from typing import BinaryIO, Iterable, Optional, Union
+
+MAGIC = b'CPTRNS01'
+SEGMENT_PREFIX = 'transcripts-'
+SEGMENT_SUFFIX = '.seg'
+
+_TRAILER = struct.Struct('=Q8s')
+
+# Segments mapped by this process, by path, so every load of a snapshot file
+# that refers to a segment shares one mapping
+_open_segments: 'weakref.WeakValueDictionary[str, Segment]' = weakref.WeakValueDictionary()
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class Segment:
+    """A read-only, memory-mapped segment file of transcripts."""
+
+    def __init__(self, path: str, delete_on_release: bool = True):
+        self.path = os.path.abspath(path)
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _TRAILER.size:
+                raise ValueError(f"Transcript segment is truncated: {path}")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        count, magic = _TRAILER.unpack_from(self._mmap, size - _TRAILER.size)
+        table_start = size - _TRAILER.size - 8 * (count + 1)
+        if magic != MAGIC or table_start < 0:
+            raise ValueError(f"Not a transcript segment: {path}")
+        self._offsets = memoryview(self._mmap)[table_start:size - _TRAILER.size].cast('Q')
+        self.count = count
+        self.size = table_start
+
+        self._finalizer = None
+        if delete_on_release:
+            # The mapping stays valid after the file is removed. Files left
+            # behind at exit are cleaned up by remove_unused.
+            self._finalizer = weakref.finalize(self, _remove_file, self.path)
+            self._finalizer.atexit = False
+        _open_segments[self.path] = self
+
+    def __reduce__(self):
+        return open_segment, (self.path,)
+
+    def persist(self) -> None:
+        """Keep the segment file when this process releases it, e.g. because a snapshot file refers to it."""
+        if self._finalizer is not None:
+            self._finalizer.detach()
+            self._finalizer = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def view(self, index: int) -> memoryview:
+        """Return the UTF-8 bytes of a transcript without copying them."""
+        return memoryview(self._mmap)[self._offsets[index]:self._offsets[index + 1]]
+
+    def text(self, index: int) -> str:
+        return str(self.view(index), 'utf-8')
+
+    def length(self, index: int) -> int:
+        """Return the size in bytes of a transcript."""
+        return self._offsets[index + 1] - self._offsets[index]
+
+
+def open_segment(path: str) -> Segment:
+    """Map a segment file written by any process, reusing this process's mapping if it has one."""
+    segment = _open_segments.get(os.path.abspath(path))
+    if segment is None:
+        segment = Segment(path, delete_on_release=False)
+    return segment
+
+
+class TranscriptRef:
+    """Reference to one transcript in a segment."""
+
+    __slots__ = ('segment', 'index')
+
+    def __init__(self, segment: Segment, index: int):
+        self.segment = segment
+        self.index = index
+
+    def text(self) -> str:
+        return self.segment.text(self.index)
+
+    def view(self) -> memoryview:
+        return self.segment.view(self.index)
+
+
+class SegmentWriter:
+    """Append transcripts to a new segment file.
+
+    ``add`` returns a TranscriptRef right away, but the ref can only be read
+    once ``close`` has mapped the finished segment. A writer that gets no
+    transcripts leaves no file behind.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.segment: Optional[Segment] = None
+        self._file: Optional[BinaryIO] = None
+        self._path: Optional[str] = None
+        self._offsets = array('Q', [0])
+        self._refs = []
+
+    def __enter__(self) -> 'SegmentWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def add(self, text: str) -> TranscriptRef:
+        return self.add_bytes(text.encode('utf-8'))
+
+    def add_bytes(self, data: Union[bytes, memoryview]) -> TranscriptRef:
+        """Add a transcript that is already UTF-8 encoded, e.g. a view from another segment."""
+        if self._file is None:
+            fd, self._path = tempfile.mkstemp(prefix=SEGMENT_PREFIX, suffix=SEGMENT_SUFFIX,
+                                              dir=self.directory)
+            self._file = os.fdopen(fd, 'wb')
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        ref = TranscriptRef(None, len(self._refs))
+        self._refs.append(ref)
+        return ref
+
+    def close(self) -> Optional[Segment]:
+        """Finish the segment, map it and point the refs handed out by add at it."""
+        if self._file is None:
+            return None
+        try:
+            self._file.write(self._offsets.tobytes())
+            self._file.write(_TRAILER.pack(len(self._refs), MAGIC))
+            self._file.close()
+            self.segment = Segment(self._path)
+        except Exception:
+            self.discard()
+            raise
+        for ref in self._refs:
+            ref.segment = self.segment
+        self._file = None
+        self._refs = []
+        return self.segment
+
+    def discard(self) -> None:
+        """Drop the segment being written."""
+        if self._file is not None:
+            self._file.close()
+            _remove_file(self._path)
+        self._file = None
+        self._refs = []
+
+
+class TranscriptStore:
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def writer(self) -> SegmentWriter:
+        """Start a new segment."""
+        return SegmentWriter(self.directory)
+
+    def remove_unused(self, keep: Iterable[str] = ()) -> int:
+        """Delete the segment files in the store directory except those in keep.
+
+        Processes that have a removed segment mapped can still read it, so
+        this is safe as long as no snapshot file that will be loaded later
+        refers to a removed segment. Returns the number of files removed.
+        """
+        keep = {os.path.abspath(path) for path in keep}
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.abspath(os.path.join(self.directory, name))
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX) and path not in keep:
+                _remove_file(path)
+                removed += 1
+        return removed
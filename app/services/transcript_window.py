@@ -0,0 +1,137 @@
+"""
+Transcript windowing: the parts of a transcript most relevant to a question.
+
+A long transcript is split into sentences at periods (as KeywordExtractor
+does), and consecutive sentences are grouped into chunks of about
+``chunk_tokens`` tokens. The chunks are ranked against the question with
+BM25 over the word tokens used by SearchIndex, and the best chunks that fit
+in ``token_budget`` are returned in transcript order, with gap markers
+between them. A transcript that already fits the budget is used whole.
+
+Token counts are estimated at CHARS_PER_TOKEN characters per token, which is
+close enough for budgeting without a tokenizer.
+"""
+
+from collections import Counter
+from functools import lru_cache
+import math
+from typing import List, Optional
+
+from .search_index import tokenize
+
+CHARS_PER_TOKEN = 4
+GAP_MARKER = '[...]'
+
+# BM25 term frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Chunks scoring below this fraction of the best chunk are left out even if
+# they fit the budget; they usually only share common words with the question
+MIN_RELATIVE_SCORE = 0.25
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text after each period; trailing text without one is the last sentence."""
+    sentences = []
+    start = 0
+    while True:
+        end = text.find('.', start)
+        if end == -1:
+            break
+        sentence = text[start:end + 1].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = end + 1
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+class TranscriptChunks:
+    """A transcript split into chunks, with the term statistics needed to rank them."""
+
+    def __init__(self, text: str, chunk_tokens: int):
+        self.chunks: List[str] = []
+        current: List[str] = []
+        current_tokens = 0
+        for sentence in split_sentences(text):
+            tokens = estimate_tokens(sentence) + 1
+            if current and current_tokens + tokens > chunk_tokens:
+                self.chunks.append(' '.join(current))
+                current, current_tokens = [], 0
+            current.append(sentence)
+            current_tokens += tokens
+        if current:
+            self.chunks.append(' '.join(current))
+
+        self.term_counts = [Counter(tokenize(chunk)) for chunk in self.chunks]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0
+        self.document_frequency = Counter(term for counts in self.term_counts for term in counts)
+
+    def scores(self, question: str) -> List[float]:
+        """BM25 score of every chunk for the words of question."""
+        scores = [0.0] * len(self.chunks)
+        count = len(self.chunks)
+        for term in set(tokenize(question)):
+            frequency = self.document_frequency.get(term)
+            if not frequency:
+                continue
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for index, counts in enumerate(self.term_counts):
+                occurrences = counts.get(term)
+                if occurrences:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[index] / self.average_length)
+                    scores[index] += idf * occurrences * (BM25_K1 + 1) / (occurrences + norm)
+        return scores
+
+
+@lru_cache(maxsize=32)
+def _chunk_transcript(text: str, chunk_tokens: int) -> TranscriptChunks:
+    # Questions about one call usually come in groups (batches, follow-ups)
+    return TranscriptChunks(text, chunk_tokens)
+
+
+def window_transcript(text: str, question: str, token_budget: int, chunk_tokens: int = 200) -> Optional[str]:
+    """Return the excerpts of text most relevant to question within token_budget.
+
+    Returns None when the whole transcript should be used instead: when it
+    fits the budget, or when no part of it shares a word with the question.
+    """
+    if estimate_tokens(text) <= token_budget:
+        return None
+    chunks = _chunk_transcript(text, chunk_tokens)
+    scores = chunks.scores(question)
+    best = max(scores, default=0)
+    if best <= 0:
+        return None
+    ranked = sorted(
+        (index for index, score in enumerate(scores) if score >= best * MIN_RELATIVE_SCORE),
+        key=lambda index: -scores[index]
+    )
+
+    selected = []
+    used = 0
+    for index in ranked:
+        tokens = estimate_tokens(chunks.chunks[index]) + 1
+        if used + tokens <= token_budget:
+            selected.append(index)
+            used += tokens
+    if not selected:
+        return None
+
+    parts = []
+    previous = -1
+    for index in sorted(selected):
+        if index != previous + 1:
+            parts.append(GAP_MARKER)
+        parts.append(chunks.chunks[index])
+        previous = index
+    if previous != len(chunks.chunks) - 1:
+        parts.append(GAP_MARKER)
+    return '\n'.join(parts)
@@ -1,7 +1,9 @@
 let selectedCallId = null;
 
 function attachCallItemListeners() {
-    document.querySelectorAll('.call-item').forEach(item => {
+    // Skip items that already have a listener, e.g. when a page is appended
+    document.querySelectorAll('.call-item:not([data-listening])').forEach(item => {
+        item.dataset.listening = 'true';
         item.addEventListener('click', async () => {
             // Update selection
             document.querySelectorAll('.call-item').forEach(i => 
@@ -1,3 +1,30 @@
+// Read a Server-Sent Events response, calling onEvent(event, data) for each event
+async function readEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let end;
+        while ((end = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, end);
+            buffer = buffer.slice(end + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
 document.addEventListener('DOMContentLoaded', () => {
     // Question template handling
     document.getElementById('question-template').addEventListener('change', function() {
@@ -5,17 +32,26 @@ document.addEventListener('DOMContentLoaded', () => {
         questionInput.value = this.value;
     });
 
+    // Request streaming the current answer; aborting it also stops the answer on the server
+    let currentRequest = null;
+
     // Question asking functionality
     document.getElementById('ask-button').addEventListener('click', async () => {
+        const button = document.getElementById('ask-button');
+        if (currentRequest) {
+            currentRequest.abort();
+            return;
+        }
+
         const question = document.getElementById('question').value;
         if (!question) return;
 
-        const button = document.getElementById('ask-button');
         const answerDiv = document.getElementById('answer');
-        
-        // Show loading state
-        button.disabled = true;
-        button.innerHTML = '<i class="fas fa-spinner fa-spin mr-2"></i>Loading...';
+        const controller = new AbortController();
+        currentRequest = controller;
+
+        // Show loading state; the button stops the answer until it is complete
+        button.innerHTML = '<i class="fas fa-stop-circle mr-2"></i>Stop';
         answerDiv.innerHTML = `
             <div class="flex items-center space-x-2">
                 <i class="fas fa-spinner fa-spin"></i>
@@ -25,7 +61,7 @@ document.addEventListener('DOMContentLoaded', () => {
         answerDiv.classList.remove('hidden');
 
         try {
-            const response = await fetch('/api/ask', {
+            const response = await fetch('/api/ask/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -33,33 +69,47 @@ document.addEventListener('DOMContentLoaded', () => {
                 body: JSON.stringify({
                     call_id: selectedCallId,
                     question: question
-                })
+                }),
+                signal: controller.signal
             });
+            if (!response.ok) {
+                throw new Error(`Request failed with status ${response.status}`);
+            }
 
-            const data = await response.json();
-            
-            // Format answer with icons
+            // Format answer with icons; the text fills in as it arrives
             answerDiv.innerHTML = `
                 <div class="space-y-2">
                     <div class="flex items-start space-x-2">
                         <i class="fas fa-question-circle text-blue-500 mt-1"></i>
-                        <p class="text-gray-600">${question}</p>
+                        <p class="question-text text-gray-600"></p>
                     </div>
                     <div class="flex items-start space-x-2">
                         <i class="fas fa-comment-dots text-green-500 mt-1"></i>
-                        <p>${data.answer}</p>
+                        <p class="answer-text"></p>
                     </div>
                 </div>
             `;
+            answerDiv.querySelector('.question-text').textContent = question;
+            const answerText = answerDiv.querySelector('.answer-text');
+
+            await readEvents(response, (event, data) => {
+                if (event === 'token') {
+                    answerText.textContent += data.text;
+                } else if (event === 'error') {
+                    throw new Error(data.error);
+                }
+            });
         } catch (error) {
-            answerDiv.innerHTML = `
-                <div class="flex items-center space-x-2 text-red-500">
-                    <i class="fas fa-exclamation-circle"></i>
-                    <span>Error getting answer. Please try again.</span>
-                </div>
-            `;
+            if (error.name !== 'AbortError') {
+                answerDiv.innerHTML = `
+                    <div class="flex items-center space-x-2 text-red-500">
+                        <i class="fas fa-exclamation-circle"></i>
+                        <span>Error getting answer. Please try again.</span>
+                    </div>
+                `;
+            }
         } finally {
-            button.disabled = false;
+            currentRequest = null;
             button.innerHTML = '<i class="fas fa-question-circle mr-2"></i>Ask Question';
         }
     });
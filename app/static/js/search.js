@@ -11,45 +11,69 @@ function debounce(func, wait) {
     };
 }
 
-function updateCallsList() {
+function renderCallCard(call) {
+    return `
+        <div class="border rounded-lg p-4 hover:bg-indigo-50 cursor-pointer call-item transition-all"
+             data-call-id="${call.id}">
+            <div class="flex justify-between items-start">
+                <div>
+                    <h3 class="font-semibold text-gray-800">${call.title}</h3>
+                    <p class="text-sm text-gray-600">
+                        <i class="far fa-calendar-alt mr-1"></i>${call.formatted_date}
+                        <span class="mx-2">•</span>
+                        <i class="far fa-clock mr-1"></i>${call.duration_mins}
+                    </p>
+                </div>
+                <div class="text-sm bg-indigo-100 text-indigo-800 px-2 py-1 rounded-full">
+                    <i class="fas fa-users mr-1"></i>${call.participant_count}
+                </div>
+            </div>
+            <div class="text-sm text-gray-500 mt-2 flex items-center gap-2">
+                <i class="fas fa-building mr-1"></i>
+                ${call.companies.map(company => `
+                    <span class="inline-block bg-gray-100 rounded-full px-3 py-1 text-xs hover:bg-gray-200 transition-all">
+                        ${company.charAt(0).toUpperCase() + company.slice(1)}
+                    </span>
+                `).join(' ')}
+            </div>
+        </div>
+    `;
+}
+
+function updateLoadMoreButton(offset, total) {
+    const button = document.getElementById('load-more');
+    button.dataset.offset = offset;
+    button.dataset.total = total;
+    button.classList.toggle('hidden', offset >= total);
+}
+
+// Fetch one page of calls for the current filters; append it or replace the list
+function fetchCalls(offset, append) {
     const search = document.getElementById('search').value;
     const company = document.getElementById('company-filter').value;
     const dateFrom = document.getElementById('date-from').value;
     const dateTo = document.getElementById('date-to').value;
+    const pageSize = document.getElementById('load-more').dataset.pageSize;
     
-    const url = `/api/calls/search?query=${search}&company=${company}&date_from=${dateFrom}&date_to=${dateTo}`;
+    const url = `/api/calls/search?query=${search}&match=prefix&company=${company}&date_from=${dateFrom}&date_to=${dateTo}&limit=${pageSize}&offset=${offset}`;
     
     // Show loading state
-    document.getElementById('calls-list').classList.add('animate-pulse');
+    const callsList = document.getElementById('calls-list');
+    callsList.classList.add('animate-pulse');
     
     fetch(url)
-        .then(response => response.json())
-        .then(calls => {
-            const callsList = document.getElementById('calls-list');
-            callsList.innerHTML = calls.map(call => `
-                <div class="border rounded p-4 hover:bg-gray-50 cursor-pointer call-item" 
-                     data-call-id="${call.id}">
-                    <div class="flex justify-between items-start">
-                        <div>
-                            <h3 class="font-semibold">${call.call_metadata.title}</h3>
-                            <p class="text-sm text-gray-600">
-                                ${call.formatted_date} • ${call.duration_mins} minutes
-                            </p>
-                        </div>
-                        <div class="text-sm text-gray-500">
-                            <i class="fas fa-users"></i> ${call.call_metadata.parties.length}
-                        </div>
-                    </div>
-                    <p class="text-sm text-gray-500 mt-2">
-                        Companies: 
-                        ${call.companies.map(company => `
-                            <span class="inline-block bg-gray-100 rounded px-2 py-1 text-xs">
-                                ${company.charAt(0).toUpperCase() + company.slice(1)}
-                            </span>
-                        `).join(' ')}
-                    </p>
-                </div>
-            `).join('');
+        .then(response => {
+            const total = parseInt(response.headers.get('X-Total-Count'), 10);
+            return response.json().then(calls => ({calls, total}));
+        })
+        .then(({calls, total}) => {
+            const html = calls.map(renderCallCard).join('');
+            if (append) {
+                callsList.insertAdjacentHTML('beforeend', html);
+            } else {
+                callsList.innerHTML = html;
+            }
+            updateLoadMoreButton(offset + calls.length, total);
             
             // Remove loading state
             callsList.classList.remove('animate-pulse');
@@ -59,10 +83,18 @@ function updateCallsList() {
         })
         .catch(error => {
             console.error('Error fetching calls:', error);
-            document.getElementById('calls-list').classList.remove('animate-pulse');
+            callsList.classList.remove('animate-pulse');
         });
 }
 
+function updateCallsList() {
+    fetchCalls(0, false);
+}
+
+function loadMoreCalls() {
+    fetchCalls(parseInt(document.getElementById('load-more').dataset.offset, 10), true);
+}
+
 // Attach event listeners
 document.addEventListener('DOMContentLoaded', () => {
     document.getElementById('search').addEventListener('input', 
@@ -73,4 +105,6 @@ document.addEventListener('DOMContentLoaded', () => {
         updateCallsList);
     document.getElementById('date-to').addEventListener('change', 
         updateCallsList);
+    document.getElementById('load-more').addEventListener('click', 
+        loadMoreCalls);
 });
@@ -0,0 +1,12 @@
+"""
+Performance benchmarks for CalPilot.
+
+Each benchmark is a standalone script that runs offline against synthetic
+data, e.g.:
+
+    python -m benchmarks.bench_lookup
+
+benchmarks.suite times the main operations together on one corpus from
+benchmarks.corpus and saves machine-readable results, which
+benchmarks.compare checks for regressions between commits.
+"""
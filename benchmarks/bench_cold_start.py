@@ -0,0 +1,46 @@
+"""
+Benchmark how long a new worker takes to get its calls ready.
+
+For each corpus size the calls are built from the calls file once (the cold
+start without a snapshot file), saved with CallService.save_snapshot, and then
+loaded by a new app through CALLS_SNAPSHOT_FILE.
+
+    python -m benchmarks.bench_cold_start [sizes...]
+"""
+
+import logging
+import os
+import sys
+import time
+
+from .common import make_app, make_calls
+
+DEFAULT_SIZES = [10_000, 50_000]
+SENTENCES = 20
+
+
+def main(sizes):
+    print(f"{'calls':>8} {'build from source (s)':>22} {'load snapshot (s)':>18} {'snapshot (MB)':>14}")
+    for size in sizes:
+        app = make_app(make_calls(size, transcript_sentences=SENTENCES))
+        app.logger.setLevel(logging.WARNING)
+        service = app.call_service
+
+        start = time.perf_counter()
+        service.load_calls()
+        build = time.perf_counter() - start
+
+        snapshot_file = os.path.join(os.path.dirname(service.calls_file), 'calls.snapshot')
+        service.save_snapshot(snapshot_file)
+
+        start = time.perf_counter()
+        warm_app = make_app(CALLS_FILE=service.calls_file, CALLS_SNAPSHOT_FILE=snapshot_file)
+        load = time.perf_counter() - start
+        assert warm_app.call_service.get_cache_status()['calls'] == size
+
+        size_mb = os.path.getsize(snapshot_file) / 2 ** 20
+        print(f'{size:>8} {build:>22.2f} {load:>18.2f} {size_mb:>14.1f}')
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,41 @@
+"""
+Benchmark rendering of the /dashboard page as the corpus grows.
+
+Calls are loaded once per corpus size, then the page is requested several
+times; the median render time and the response size are reported.
+
+    python -m benchmarks.bench_dashboard [sizes...]
+"""
+
+import logging
+import statistics
+import sys
+import time
+
+from .common import make_app, make_calls
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+SENTENCES = 20
+REQUESTS = 5
+
+
+def main(sizes):
+    print(f"{'calls':>8} {'median render (ms)':>19} {'response (KB)':>14}")
+    for size in sizes:
+        app = make_app(make_calls(size, transcript_sentences=SENTENCES))
+        app.logger.setLevel(logging.WARNING)
+        client = app.test_client()
+        client.get('/dashboard')
+
+        timings = []
+        for _ in range(REQUESTS):
+            start = time.perf_counter()
+            response = client.get('/dashboard')
+            timings.append(time.perf_counter() - start)
+        assert response.status_code == 200
+
+        print(f'{size:>8} {statistics.median(timings) * 1000:>19.1f} {len(response.data) / 1024:>14.1f}')
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
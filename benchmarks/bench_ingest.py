@@ -0,0 +1,44 @@
+"""
+Benchmark CallService.load_calls with serial and parallel processing.
+
+Each run does a cold load of the same calls file, once serially and once per
+worker count using the INGEST_WORKERS process pool.
+
+    python -m benchmarks.bench_ingest [calls] [sentences per transcript] [worker counts...]
+"""
+
+import logging
+import os
+import sys
+import time
+
+from .common import make_app, make_calls
+
+DEFAULT_CALLS = 20_000
+DEFAULT_SENTENCES = 60
+DEFAULT_WORKERS = [0, 2, 4]
+
+
+def main(count, sentences, worker_counts):
+    calls = make_calls(count, transcript_sentences=sentences)
+    print(f'{count} calls, {sentences} sentences per transcript, {os.cpu_count()} CPUs')
+    print(f"{'workers':>8} {'load_calls (s)':>15} {'calls/s':>10}")
+
+    for workers in worker_counts:
+        app = make_app(calls, INGEST_WORKERS=workers)
+        app.logger.setLevel(logging.WARNING)
+        with app.app_context():
+            start = time.perf_counter()
+            loaded = app.call_service.load_calls()
+            elapsed = time.perf_counter() - start
+        assert len(loaded) == count
+        print(f'{workers:>8} {elapsed:>15.2f} {count / elapsed:>10.0f}')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(
+        args[0] if len(args) > 0 else DEFAULT_CALLS,
+        args[1] if len(args) > 1 else DEFAULT_SENTENCES,
+        args[2:] or DEFAULT_WORKERS
+    )
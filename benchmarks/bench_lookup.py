@@ -0,0 +1,51 @@
+"""
+Benchmark CallService.get_call_by_id as the corpus grows.
+
+The lookup goes through the snapshot's ID map, so its latency should stay
+flat from 1k to 1M calls. A linear scan over the same list is timed for
+comparison on the smaller corpora.
+
+    python -m benchmarks.bench_lookup [sizes...]
+"""
+
+import logging
+import random
+import sys
+
+from .common import install_snapshot, make_app, make_calls, time_per_call
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+LOOKUPS = 10_000
+SCAN_LOOKUPS = 100
+SCAN_MAX_SIZE = 100_000
+
+
+def main(sizes):
+    app = make_app()
+    app.logger.setLevel(logging.WARNING)
+    service = app.call_service
+
+    print(f"{'calls':>10} {'get_call_by_id (us)':>20} {'linear scan (us)':>18}")
+    for size in sizes:
+        calls = make_calls(size)
+        install_snapshot(service, calls)
+
+        rng = random.Random(size)
+        ids = [f'call-{rng.randrange(size)}' for _ in range(LOOKUPS)]
+        with app.app_context():
+            lookup = time_per_call(service.get_call_by_id, ids)
+
+        scan = ''
+        if size <= SCAN_MAX_SIZE:
+            scan_us = time_per_call(
+                lambda call_id: next((c for c in calls if c['id'] == call_id), None),
+                ids[:SCAN_LOOKUPS],
+                repeat=1
+            )
+            scan = f'{scan_us:.1f}'
+
+        print(f'{size:>10} {lookup:>20.2f} {scan:>18}')
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,82 @@
+"""
+Benchmark the memory held by loaded calls.
+
+Every measurement runs in a fresh interpreter. Two numbers are reported per
+10k calls, both covering everything CallService.load_calls keeps (records,
+search index and precomputed cards):
+
+- resident memory (RSS) added by loading the calls
+- Python heap traced by tracemalloc after loading the calls
+
+Pass --transcript-store to keep transcripts in a memory-mapped
+TranscriptStore instead of the heap. Mapped pages only become resident when
+a transcript is read, so they are not counted here.
+
+    python -m benchmarks.bench_memory [--transcript-store] [sizes...]
+"""
+
+import gc
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+from .common import make_app, make_calls
+
+DEFAULT_SIZES = [10_000, 50_000]
+SENTENCES = 20
+
+
+def resident_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # Peak rather than current RSS, but good enough where /proc is missing
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure(size: int, metric: str, transcript_store: bool) -> int:
+    config = {'TRANSCRIPT_STORE_DIR': tempfile.mkdtemp(prefix='calpilot-bench-')} if transcript_store else {}
+    app = make_app(make_calls(size, transcript_sentences=SENTENCES), **config)
+    app.logger.setLevel(logging.WARNING)
+    service = app.call_service
+
+    gc.collect()
+    if metric == 'heap':
+        tracemalloc.start()
+    before = resident_bytes()
+    service.load_calls()
+    gc.collect()
+    if metric == 'heap':
+        traced, _ = tracemalloc.get_traced_memory()
+        return traced
+    return resident_bytes() - before
+
+
+def main(sizes, transcript_store):
+    print(f"{'calls':>8} {'RSS per 10k (MB)':>17} {'heap per 10k (MB)':>18}")
+    for size in sizes:
+        results = {}
+        for metric in ('rss', 'heap'):
+            command = [sys.executable, '-m', 'benchmarks.bench_memory', '--child', str(size), metric]
+            if transcript_store:
+                command.append('--transcript-store')
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            results[metric] = json.loads(output.strip().splitlines()[-1])
+        scale = 10_000 / size / 2 ** 20
+        print(f"{size:>8} {results['rss'] * scale:>17.1f} {results['heap'] * scale:>18.1f}")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    transcript_store = '--transcript-store' in args
+    args = [arg for arg in args if arg != '--transcript-store']
+    if args[:1] == ['--child']:
+        print(json.dumps(measure(int(args[1]), args[2], transcript_store)))
+    else:
+        main([int(size) for size in args] or DEFAULT_SIZES, transcript_store)
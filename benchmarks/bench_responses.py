@@ -0,0 +1,70 @@
+"""
+Benchmark /api/call/<id> latency and bytes sent for long transcripts.
+
+Each transcript length is served with the stdlib JSON provider and no
+response cache (the behaviour before orjson and the cache), then with
+orjson, and then from the response cache in every supported content
+encoding. p50/p99 request latency and the response size are reported.
+
+    python -m benchmarks.bench_responses [transcript sentences...]
+"""
+
+import logging
+import statistics
+import sys
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+from app.json_provider import OrjsonProvider, orjson
+from app.services.response_cache import ENCODINGS, IDENTITY, ResponseCache
+
+from .common import make_app, make_calls
+
+DEFAULT_SENTENCES = [200, 2_000, 20_000]
+CALLS = 20
+REQUESTS = 400
+
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(client, encoding):
+    headers = {'Accept-Encoding': encoding}
+    timings = []
+    size = 0
+    for i in range(REQUESTS):
+        start = time.perf_counter()
+        response = client.get(f'/api/call/call-{i % CALLS}', headers=headers)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200
+        size = len(response.data)
+    return statistics.median(timings) * 1000, percentile(timings, 0.99) * 1000, size
+
+
+def main(sentence_counts):
+    configurations = [('json', False, IDENTITY)]
+    if orjson is not None:
+        configurations.append(('orjson', False, IDENTITY))
+    provider = 'orjson' if orjson is not None else 'json'
+    configurations += [(provider, True, encoding) for encoding in (IDENTITY,) + ENCODINGS]
+
+    print(f"{'sentences':>9} {'provider':>8} {'cache':>6} {'encoding':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'response (KB)':>14}")
+    for sentences in sentence_counts:
+        app = make_app(make_calls(CALLS, transcript_sentences=sentences))
+        app.logger.setLevel(logging.WARNING)
+        client = app.test_client()
+        for name, cached, encoding in configurations:
+            app.json = OrjsonProvider(app) if name == 'orjson' else DefaultJSONProvider(app)
+            # A cache without room for an entry serializes every request
+            app.response_cache = ResponseCache(max_entries=CALLS if cached else 0)
+            p50, p99, size = measure(client, encoding)
+            print(f'{sentences:>9} {name:>8} {"on" if cached else "off":>6} {encoding:>9} {p50:>9.2f} {p99:>9.2f} '
+                  f'{size / 1024:>14.1f}')
+
+
+if __name__ == '__main__':
+    main([int(count) for count in sys.argv[1:]] or DEFAULT_SENTENCES)
@@ -0,0 +1,158 @@
+"""
+Benchmark memory per gunicorn worker as the worker count grows.
+
+For each worker count, gunicorn is started with gunicorn.conf.py on a
+generated calls file, and the resident (RSS), proportional (PSS) and private
+memory of every worker is read from /proc once the workers are serving. The
+calls file is then changed to check that only the master rebuilds the
+snapshot and that its replacement workers share the new calls; their memory
+is read again after the reload. Linux only.
+
+    python -m benchmarks.bench_workers [calls] [worker counts...]
+"""
+
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from app import create_app
+from app.config import TestingConfig
+from .common import make_calls
+
+DEFAULT_CALLS = 20_000
+DEFAULT_WORKERS = [1, 2, 4]
+SENTENCES = 20
+
+
+def create_benchmark_app():
+    """App factory used by the gunicorn workers, configured through environment variables."""
+    config = type('WorkerBenchmarkConfig', (TestingConfig,), {
+        'CALLS_FILE': os.environ['BENCH_CALLS_FILE'],
+        'CALLS_SNAPSHOT_FILE': os.environ['BENCH_SNAPSHOT_FILE'],
+        'TRANSCRIPT_STORE_DIR': os.environ['BENCH_TRANSCRIPT_DIR'],
+        'CALLS_BACKGROUND_REFRESH': True,
+        'CALLS_REFRESH_INTERVAL': 1,
+        'CALLS_REFRESH_JITTER': 1
+    })
+    return create_app(config)
+
+
+def memory_kb(pid: int) -> dict:
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        fields = dict(re.findall(r'^(\w+):\s+(\d+) kB', f.read(), re.MULTILINE))
+    private = int(fields['Private_Clean']) + int(fields['Private_Dirty'])
+    return {'rss': int(fields['Rss']), 'pss': int(fields['Pss']), 'private': private}
+
+
+def worker_pids(master_pid: int) -> list:
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(predicate, timeout: float = 300) -> None:
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise TimeoutError('Timed out waiting for gunicorn')
+        time.sleep(0.5)
+
+
+def run(calls, worker_count: int) -> dict:
+    directory = tempfile.mkdtemp(prefix='calpilot-bench-')
+    calls_file = os.path.join(directory, 'calls.json')
+    with open(calls_file, 'w') as f:
+        json.dump(calls, f)
+    log_file = os.path.join(directory, 'gunicorn.log')
+    port = free_port()
+    env = dict(
+        os.environ, PORT=str(port), WEB_CONCURRENCY=str(worker_count),
+        GUNICORN_APP='benchmarks.bench_workers:create_benchmark_app()',
+        BENCH_CALLS_FILE=calls_file,
+        BENCH_SNAPSHOT_FILE=os.path.join(directory, 'calls.snapshot'),
+        BENCH_TRANSCRIPT_DIR=os.path.join(directory, 'transcripts')
+    )
+
+    with open(log_file, 'w') as log:
+        master = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py'],
+            env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+    try:
+        url = f'http://127.0.0.1:{port}/api/calls/status'
+
+        def serving() -> bool:
+            try:
+                return json.load(urllib.request.urlopen(url))['calls'] == len(calls)
+            except OSError:
+                return False
+
+        wait_for(serving)
+        wait_for(lambda: len(worker_pids(master.pid)) == worker_count)
+        time.sleep(2)
+        first_pids = set(worker_pids(master.pid))
+        workers = [memory_kb(pid) for pid in first_pids]
+
+        # Change one call in a single step, so workers never see a half-written
+        # version, and wait until every worker serves the new version
+        calls[0]['call_metadata']['title'] = 'Changed title'
+        with open(f'{calls_file}.new', 'w') as f:
+            json.dump(calls, f)
+        os.utime(f'{calls_file}.new', (time.time() + 10, time.time() + 10))
+        os.replace(f'{calls_file}.new', calls_file)
+
+        def reloaded() -> bool:
+            # The master reloads and then replaces all of its workers
+            pids = set(worker_pids(master.pid))
+            if len(pids) != worker_count or pids & first_pids:
+                return False
+            call = json.load(urllib.request.urlopen(f'http://127.0.0.1:{port}/api/call/{calls[0]["id"]}'))
+            return call['call_metadata']['title'] == 'Changed title'
+
+        wait_for(reloaded)
+        time.sleep(2)
+        reloaded_workers = [memory_kb(pid) for pid in worker_pids(master.pid)]
+        with open(log_file) as f:
+            log_text = f.read()
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait()
+
+    return {
+        'workers': worker_count,
+        'rss_mb': sum(w['rss'] for w in workers) / len(workers) / 1024,
+        'pss_mb': sum(w['pss'] for w in workers) / len(workers) / 1024,
+        'private_mb': sum(w['private'] for w in workers) / len(workers) / 1024,
+        'reloaded_private_mb': sum(w['private'] for w in reloaded_workers) / len(reloaded_workers) / 1024,
+        'builds': log_text.count('Calls reloaded:') - 1,
+        'loads': log_text.count('Loaded calls for file:')
+    }
+
+
+def main(count, worker_counts):
+    calls = make_calls(count, transcript_sentences=SENTENCES)
+    print(f'{count} calls, {SENTENCES} sentences per transcript; memory is the mean per worker')
+    print(f"{'workers':>8} {'RSS (MB)':>9} {'PSS (MB)':>9} {'private (MB)':>13} "
+          f"{'private after reload (MB)':>26} {'reload builds':>14} {'reload loads':>13}")
+    for worker_count in worker_counts:
+        result = run(json.loads(json.dumps(calls)), worker_count)
+        print(f"{result['workers']:>8} {result['rss_mb']:>9.1f} {result['pss_mb']:>9.1f} "
+              f"{result['private_mb']:>13.1f} {result['reloaded_private_mb']:>26.1f} "
+              f"{result['builds']:>14} {result['loads']:>13}")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else DEFAULT_CALLS, args[1:] or DEFAULT_WORKERS)
@@ -0,0 +1,58 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+
+import os
+import tempfile
+import time
+from typing import Callable, Dict, Iterable, List
+
+from app import create_app
+from app.config import TestingConfig
+from app.services.call_processing import process_call
+from app.services.call_snapshot import CallSnapshot
+from app.services.keyword_extractor import KeywordExtractor
+from app.services.search_index import SearchIndex
+
+from .corpus import generate_calls, write_calls
+
+
+def make_calls(count: int, seed: int = 42, transcript_sentences: int = 1) -> List[Dict]:
+    """Generate raw call records in the calls.json format (see corpus.generate_calls)."""
+    return list(generate_calls(count, seed=seed, sentences=transcript_sentences, companies=8))
+
+
+def make_app(calls: Iterable[Dict] = None, **config):
+    """Create an app whose calls file lives in a temporary directory.
+
+    calls may be a generator, which is written to the file without being
+    held in memory.
+    """
+    directory = tempfile.mkdtemp(prefix='calpilot-bench-')
+    calls_file = os.path.join(directory, 'calls.json')
+    write_calls(calls_file, calls if calls is not None else [])
+
+    config_class = type('BenchmarkConfig', (TestingConfig,), {'CALLS_FILE': calls_file, **config})
+    return create_app(config_class)
+
+
+def install_snapshot(service, calls: List[Dict]) -> None:
+    """Publish call records on a CallService without reading a file or indexing transcripts.
+
+    Records are processed without keyword extraction, which keeps setup of
+    very large corpora fast.
+    """
+    extractor = KeywordExtractor([])
+    records = [process_call(call, extractor) for call in calls]
+    service._calls_cache = CallSnapshot(records, SearchIndex(), source_version=service._source_version())
+
+
+def time_per_call(func: Callable, args: List, repeat: int = 3) -> float:
+    """Return the best-of-repeat mean time per call of func over args, in microseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for arg in args:
+            func(arg)
+        best = min(best, (time.perf_counter() - start) / len(args))
+    return best * 1e6
@@ -0,0 +1,67 @@
+"""
+Compare two benchmark suite result files.
+
+Every case present in both files is listed with its p50 before and after
+and the ratio between them. A case whose p50 grew by more than the
+threshold (10% by default) is marked as a regression, and the exit status
+is 1 if there is any, so the comparison can gate a CI job:
+
+    python -m benchmarks.compare before.json after.json [--threshold 0.1] [--stat p99_us]
+
+Timings from different corpora or machines are not comparable; a warning is
+printed when the files disagree on either.
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Tuple
+
+from .suite import RESULTS_FORMAT
+
+
+def load_results(path: str) -> Dict:
+    with open(path) as f:
+        document = json.load(f)
+    if document.get('format') != RESULTS_FORMAT:
+        raise ValueError(f"{path}: unsupported results format {document.get('format')!r}")
+    return document
+
+
+def compare(before: Dict, after: Dict, threshold: float = 0.1,
+            stat: str = 'p50_us') -> List[Tuple[str, float, float, float, bool]]:
+    """Return (case, before, after, ratio, regressed) for every case in both result documents."""
+    rows = []
+    for case, stats in before['results'].items():
+        if case not in after['results']:
+            continue
+        old, new = stats[stat], after['results'][case][stat]
+        ratio = new / old if old else float('inf')
+        rows.append((case, old, new, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark suite result files.')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression')
+    parser.add_argument('--stat', default='p50_us', help='statistic to compare, e.g. p50_us or p99_us')
+    args = parser.parse_args(argv)
+
+    before, after = load_results(args.before), load_results(args.after)
+    for key in ('corpus', 'machine'):
+        if before[key] != after[key]:
+            print(f'Warning: the results were produced with different {key} settings', file=sys.stderr)
+
+    rows = compare(before, after, args.threshold, args.stat)
+    print(f"{before['commit']} -> {after['commit']} ({args.stat})")
+    print(f"{'case':>17} {'before':>12} {'after':>12} {'ratio':>7}")
+    for case, old, new, ratio, regressed in rows:
+        print(f"{case:>17} {old:>12.1f} {new:>12.1f} {ratio:>7.2f}{'  REGRESSION' if regressed else ''}")
+    return 1 if any(row[4] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
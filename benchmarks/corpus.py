@@ -0,0 +1,218 @@
+"""
+Synthetic call corpora for benchmarks.
+
+generate_calls builds raw call records in the calls.json format from a
+seed; the same arguments always produce the same corpus. A corpus is
+described by:
+
+- ``count``: number of calls, with IDs call-0 .. call-<count - 1>
+- ``sentences``: transcript length in sentences, a number or a (min, max)
+  range each transcript draws from
+- ``companies``: number of distinct customer companies; how often each one
+  appears follows a Zipf-like curve, so a few accounts have most calls
+- ``start`` and ``days``: calls are spread over ``days`` days from ``start``,
+  busier on weekdays and during working hours
+
+Transcripts are dialogue between the call's participants, built from
+sentence templates that mention the default keyword terms (pricing,
+budget, next steps, ...) about as often as sales calls do, mixed with small
+talk that matches none of them.
+
+Records are generated lazily, so large corpora can be written to a file
+without holding them in memory:
+
+    python -m benchmarks.corpus calls.json --calls 1000000 --sentences 20-80 --companies 5000
+"""
+
+import argparse
+import bisect
+from datetime import datetime, timedelta, timezone
+import itertools
+import json
+import random
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+from app.services.call_stream import is_json_lines
+
+Sentences = Union[int, Tuple[int, int]]
+
+FIRST_NAMES = [
+    'Alex', 'Bianca', 'Chen', 'Dana', 'Elif', 'Farah', 'Gustavo', 'Hana', 'Ivan', 'Jamal',
+    'Keiko', 'Liam', 'Maya', 'Nikhil', 'Olga', 'Priya', 'Quinn', 'Rafael', 'Sara', 'Tomas'
+]
+SYLLABLES = ['ac', 'bel', 'cor', 'dyn', 'ex', 'fin', 'glo', 'hex', 'in', 'jet', 'kor', 'lum',
+             'max', 'nov', 'om', 'pra', 'quo', 'rex', 'sol', 'tek', 'ul', 'vex', 'wav', 'zen']
+PRODUCTS = ['starter', 'team', 'business', 'enterprise']
+TOPICS = ['reporting', 'the mobile app', 'single sign-on', 'the API', 'data exports', 'user permissions']
+
+# Templates that mention keyword terms, and small talk that mentions none
+BUSINESS_SENTENCES = [
+    'We discussed pricing for the {product} tier',
+    'Pricing for {seats} seats came to about {amount} dollars a year',
+    'The budget for next quarter is still under review',
+    'Their budget is capped at {amount} dollars',
+    'The implementation timeline depends on their IT team',
+    'They want the timeline to fit a go-live in {weeks} weeks',
+    'Integration with the CRM is a hard requirement',
+    'The integration with {topic} has to be ready first',
+    'Legal approval usually takes about {weeks} weeks',
+    'The final decision sits with their VP of sales',
+    'Their main concerns are security and uptime',
+    'The requirements include audit logs and {topic}',
+    'We agreed on next steps and a follow up call on {weekday}',
+    'I will send a recap as a follow up today',
+    'They asked for a demo of {topic}',
+    'A two week trial for {seats} users would work for them',
+    'The features they care about most are {topic} and alerts',
+    'They are comparing us with the competition on support'
+]
+SMALL_TALK = [
+    'Everyone joined a few minutes late',
+    'The weather in {city} came up briefly',
+    'Sorry, could you repeat that',
+    'That makes sense to me',
+    'Let me share my screen',
+    'I think we lost {name} for a second',
+    'Good question, let me check with the team',
+    'We covered most of this last time'
+]
+CITIES = ['Chicago', 'Berlin', 'Austin', 'Toronto', 'Lisbon', 'Singapore']
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+TITLES = ['Discovery call', 'Product demo', 'Pricing review', 'Technical deep dive', 'Quarterly check-in',
+          'Contract negotiation', 'Kickoff']
+
+# Share of transcript sentences that are business talk rather than small talk
+BUSINESS_SHARE = 0.6
+# Zipf exponent of company popularity; around 1 is typical of account activity
+COMPANY_SKEW = 1.0
+
+
+def company_names(count: int) -> List[str]:
+    """Return count distinct pronounceable company names, the same for every call."""
+    names = []
+    for length in itertools.count(2):
+        for parts in itertools.product(SYLLABLES, repeat=length):
+            names.append(''.join(parts))
+            if len(names) == count:
+                return names
+    return names
+
+
+def _sentence_range(sentences: Sentences) -> Tuple[int, int]:
+    if isinstance(sentences, int):
+        return sentences, sentences
+    return sentences
+
+
+def _fill(template: str, rng: random.Random, speakers: List[str]) -> str:
+    if '{' not in template:
+        return template
+    return template.format(
+        product=rng.choice(PRODUCTS), topic=rng.choice(TOPICS), seats=rng.randrange(5, 500, 5),
+        amount=f'{rng.randrange(10, 500) * 1000:,}', weeks=rng.randrange(2, 13), weekday=rng.choice(WEEKDAYS),
+        city=rng.choice(CITIES), name=rng.choice(speakers)
+    )
+
+
+def make_transcript(rng: random.Random, sentences: int, speakers: List[str]) -> str:
+    """Build a dialogue of the given number of sentences between speakers."""
+    lines = []
+    speaker = rng.choice(speakers)
+    for _ in range(sentences):
+        if rng.random() < 0.3:
+            speaker = rng.choice(speakers)
+        templates = BUSINESS_SENTENCES if rng.random() < BUSINESS_SHARE else SMALL_TALK
+        lines.append(f'{speaker}: {_fill(rng.choice(templates), rng, speakers)}.')
+    return ' '.join(lines)
+
+
+def _created_at(rng: random.Random, start: datetime, days: int) -> datetime:
+    day = rng.randrange(days)
+    # Weekend calls are rare; most weekend draws move to the following Monday
+    weekday = (start + timedelta(days=day)).weekday()
+    if weekday >= 5 and rng.random() < 0.8 and day + 7 - weekday < days:
+        day += 7 - weekday
+    minute = rng.randrange(8 * 60, 18 * 60) if rng.random() < 0.9 else rng.randrange(24 * 60)
+    return start + timedelta(days=day, minutes=minute)
+
+
+def generate_calls(count: int, seed: int = 42, sentences: Sentences = (20, 80), companies: int = 50,
+                   days: int = 365, start: str = '2023-01-01', max_participants: int = 5) -> Iterator[Dict]:
+    """Generate count raw call records; see the module docstring for the parameters."""
+    rng = random.Random(seed)
+    min_sentences, max_sentences = _sentence_range(sentences)
+    start_at = datetime.fromisoformat(start).replace(tzinfo=timezone.utc)
+    names = company_names(companies)
+    weights = list(itertools.accumulate(1 / (rank + 1) ** COMPANY_SKEW for rank in range(companies)))
+
+    for i in range(count):
+        company = names[bisect.bisect(weights, rng.random() * weights[-1])]
+        rep = rng.choice(FIRST_NAMES)
+        customers = rng.sample(FIRST_NAMES, rng.randrange(1, max(max_participants, 2)))
+        length = rng.randint(min_sentences, max_sentences)
+        created_at = _created_at(rng, start_at, days)
+        title = rng.choice(TITLES)
+        yield {
+            'id': f'call-{i}',
+            'created_at_utc': created_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'call_metadata': {
+                'title': f'{title} with {company.title()} #{i}',
+                # Roughly 12 seconds per sentence plus greetings, in seconds
+                'duration': 120 + length * rng.randrange(8, 16),
+                'parties': [{'email': f'{rep.lower()}@calpilot.com'}] + [
+                    {'email': f'{name.lower()}@{company}.com'} for name in customers
+                ]
+            },
+            'transcript': {'text': make_transcript(rng, length, [rep] + customers)},
+            'inference_results': {
+                'call_summary': f'{title} with {company.title()}: {_fill(rng.choice(BUSINESS_SENTENCES), rng, [rep])}.'
+            }
+        }
+
+
+def write_calls(path: str, calls: Iterable[Dict]) -> int:
+    """Write calls to path as a JSON array, or JSON lines for .jsonl/.ndjson; return how many were written."""
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        if is_json_lines(path):
+            for call in calls:
+                f.write(json.dumps(call))
+                f.write('\n')
+                written += 1
+            return written
+        f.write('[')
+        for call in calls:
+            f.write(',\n' if written else '\n')
+            f.write(json.dumps(call))
+            written += 1
+        f.write('\n]\n')
+    return written
+
+
+def parse_sentences(value: str) -> Sentences:
+    """Parse a sentence count ("40") or range ("20-80")."""
+    low, _, high = value.partition('-')
+    return (int(low), int(high)) if high else int(low)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic calls file.')
+    parser.add_argument('output', help='calls file to write; .jsonl or .ndjson writes JSON lines')
+    parser.add_argument('--calls', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sentences', type=parse_sentences, default=(20, 80),
+                        help='sentences per transcript, N or MIN-MAX')
+    parser.add_argument('--companies', type=int, default=50)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--start', default='2023-01-01', help='date of the first day calls are spread over')
+    args = parser.parse_args(argv)
+
+    written = write_calls(args.output, generate_calls(
+        args.calls, seed=args.seed, sentences=args.sentences, companies=args.companies,
+        days=args.days, start=args.start
+    ))
+    print(f'Wrote {written} calls to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
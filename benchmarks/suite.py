@@ -0,0 +1,270 @@
+"""
+Benchmark suite: the main CalPilot operations timed on one synthetic corpus.
+
+The corpus is generated by benchmarks.corpus and loaded into a single app,
+then each case times a number of individual operations:
+
+- ingest: cold CallService.load_calls of the calls file, in a fresh app
+- search, search_filtered: word queries, and company plus date range filters
+- lookup, summary: get_call_by_id and get_call_summary
+- extract_keywords: keyword context extraction from transcripts
+- call_json: GET /api/call/<id> serialized on every request
+- call_json_cached: the same from the response cache, gzip-compressed
+- dashboard: GET /dashboard
+- ask, ask_cached: POST /api/ask with new and repeated questions, answered
+  by a stub Claude client, so only CalPilot's own work is timed
+
+Everything runs offline. Results are printed as a table and, with
+--output, saved as JSON along with the corpus parameters, commit and
+machine, so runs can be compared with benchmarks.compare:
+
+    python -m benchmarks.suite --calls 100000 --output before.json
+    python -m benchmarks.suite --calls 100000 --output after.json
+    python -m benchmarks.compare before.json after.json
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app import create_app
+from app.services.response_cache import ResponseCache
+
+from .corpus import generate_calls, parse_sentences
+from .common import make_app
+
+RESULTS_FORMAT = 1
+
+QUERIES = ['pricing', 'budget', 'next steps', 'single sign-on', 'audit logs', 'weather', 'go-live', 'competition']
+QUESTIONS = ['What was the budget?', 'What are the next steps?', 'Which features do they care about?',
+             'What concerns did they raise?', 'When is the decision due?']
+
+
+class StubMessages:
+    """Stands in for the Claude client's messages API, answering instantly."""
+
+    def create(self, **kwargs):
+        prompt = kwargs['messages'][0]['content']
+        return SimpleNamespace(
+            content=[SimpleNamespace(text='The budget is about 200,000 dollars.')],
+            usage=SimpleNamespace(input_tokens=len(prompt) // 4)
+        )
+
+
+class Suite:
+    def __init__(self, app, ops: int, ingest_runs: int, seed: int):
+        self.app = app
+        self.service = app.call_service
+        self.client = app.test_client()
+        self.ops = ops
+        self.ingest_runs = ingest_runs
+        self.rng = random.Random(seed)
+        snapshot = self.service._get_snapshot()
+        self.calls = snapshot.calls
+        self.companies = sorted(snapshot.company_counts, key=lambda company: -snapshot.company_counts[company])
+
+    def sample_ids(self, count: int) -> List[str]:
+        return [self.rng.choice(self.calls).id for _ in range(count)]
+
+    def ingest(self) -> List[float]:
+        config = self.app.config
+        timings = []
+        for _ in range(self.ingest_runs):
+            app = create_app(type('IngestConfig', (object,), dict(config)))
+            app.logger.setLevel(logging.WARNING)
+            with app.app_context():
+                start = time.perf_counter()
+                app.call_service.load_calls()
+                timings.append(time.perf_counter() - start)
+            del app
+            gc.collect()
+        return timings
+
+    def search(self) -> List[float]:
+        return time_each(lambda query: self.service.search_calls(query=query),
+                         [self.rng.choice(QUERIES) for _ in range(self.ops)])
+
+    def search_filtered(self) -> List[float]:
+        newest = datetime.fromtimestamp(self.calls[0].created_at_ts, timezone.utc)
+        oldest = datetime.fromtimestamp(self.calls[-1].created_at_ts, timezone.utc)
+        span = max((newest - oldest).days, 1)
+        filters = []
+        for _ in range(self.ops):
+            start = oldest + timedelta(days=self.rng.randrange(span))
+            filters.append({
+                # Popular companies are searched more often
+                'company': self.companies[min(int(self.rng.expovariate(0.3)), len(self.companies) - 1)],
+                'date_from': start.date().isoformat(),
+                'date_to': (start + timedelta(days=30)).date().isoformat()
+            })
+        return time_each(lambda kwargs: self.service.search_calls(**kwargs), filters)
+
+    def lookup(self) -> List[float]:
+        return time_each(self.service.get_call_by_id, self.sample_ids(self.ops * 10))
+
+    def summary(self) -> List[float]:
+        return time_each(self.service.get_call_summary, self.sample_ids(self.ops))
+
+    def extract_keywords(self) -> List[float]:
+        texts = [self.service.get_call_by_id(call_id).transcript_text for call_id in self.sample_ids(self.ops)]
+        return time_each(self.service._extract_keywords, texts)
+
+    def call_json(self) -> List[float]:
+        # A cache without room for an entry serializes every request
+        self.app.response_cache = ResponseCache(max_entries=0)
+        return time_each(lambda call_id: self.get(f'/api/call/{call_id}'), self.sample_ids(self.ops))
+
+    def call_json_cached(self) -> List[float]:
+        self.app.response_cache = ResponseCache()
+        ids = self.sample_ids(20)
+        for call_id in ids:
+            self.get(f'/api/call/{call_id}', gzip=True)
+        return time_each(lambda call_id: self.get(f'/api/call/{call_id}', gzip=True),
+                         [self.rng.choice(ids) for _ in range(self.ops)])
+
+    def dashboard(self) -> List[float]:
+        return time_each(lambda _: self.get('/dashboard'), range(max(self.ops // 10, 5)))
+
+    def ask(self) -> List[float]:
+        if self.app.claude_service.answer_cache is not None:
+            self.app.claude_service.answer_cache.clear()
+        requests = [{'call_id': call_id, 'question': f'{self.rng.choice(QUESTIONS)} ({i})'}
+                    for i, call_id in enumerate(self.sample_ids(self.ops))]
+        return time_each(self.post_question, requests)
+
+    def ask_cached(self) -> List[float]:
+        requests = [{'call_id': call_id, 'question': QUESTIONS[0]} for call_id in self.sample_ids(20)]
+        for request in requests:
+            self.post_question(request)
+        return time_each(self.post_question, [self.rng.choice(requests) for _ in range(self.ops)])
+
+    def get(self, path: str, gzip: bool = False) -> None:
+        response = self.client.get(path, headers={'Accept-Encoding': 'gzip'} if gzip else {})
+        assert response.status_code == 200, f'GET {path}: {response.status_code}'
+
+    def post_question(self, request: Dict) -> None:
+        response = self.client.post('/api/ask', json=request)
+        assert response.status_code == 200, f'POST /api/ask: {response.status_code}'
+
+
+CASES = ['ingest', 'search', 'search_filtered', 'lookup', 'summary', 'extract_keywords', 'call_json',
+         'call_json_cached', 'dashboard', 'ask', 'ask_cached']
+
+
+def time_each(func: Callable, args: Iterable) -> List[float]:
+    """Time func on each of args separately, in seconds."""
+    timings = []
+    for arg in args:
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    """Summarize timings (seconds) in microseconds."""
+    ordered = sorted(timings)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1e6
+
+    return {
+        'ops': len(ordered),
+        'mean_us': sum(ordered) / len(ordered) * 1e6,
+        'min_us': ordered[0] * 1e6,
+        'p50_us': percentile(0.5),
+        'p90_us': percentile(0.9),
+        'p99_us': percentile(0.99),
+        'max_us': ordered[-1] * 1e6
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty', '--abbrev=12'],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(corpus: Dict, cases: List[str], ops: int = 200, ingest_runs: int = 3) -> Dict:
+    """Run the given cases on a corpus described by generate_calls arguments; return the results document."""
+    app = make_app(generate_calls(**corpus), TESTING=False, ANSWER_CACHE_DB=None)
+    app.logger.setLevel(logging.WARNING)
+    app.json.compact = True
+    app.claude_service.client = SimpleNamespace(messages=StubMessages())
+
+    results = {}
+    with app.app_context():
+        suite = Suite(app, ops, ingest_runs, corpus.get('seed', 42))
+        for case in cases:
+            results[case] = summarize(getattr(suite, case)())
+
+    return {
+        'format': RESULTS_FORMAT,
+        'created_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'commit': git_commit(),
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'corpus': corpus,
+        'results': results
+    }
+
+
+def print_results(document: Dict) -> None:
+    corpus = document['corpus']
+    print(f"{corpus['count']} calls, {corpus['sentences']} sentences, {corpus['companies']} companies, "
+          f"{corpus['days']} days; commit {document['commit']}")
+    print(f"{'case':>17} {'ops':>6} {'p50 (us)':>11} {'p90 (us)':>11} {'p99 (us)':>11} {'mean (us)':>11}")
+    for case, stats in document['results'].items():
+        print(f"{case:>17} {stats['ops']:>6} {stats['p50_us']:>11.1f} {stats['p90_us']:>11.1f} "
+              f"{stats['p99_us']:>11.1f} {stats['mean_us']:>11.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time CalPilot operations on a synthetic corpus.')
+    parser.add_argument('--calls', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sentences', type=parse_sentences, default=(20, 80),
+                        help='sentences per transcript, N or MIN-MAX')
+    parser.add_argument('--companies', type=int, default=50)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--ops', type=int, default=200, help='operations timed per case')
+    parser.add_argument('--ingest-runs', type=int, default=3)
+    parser.add_argument('--cases', default=','.join(CASES), help='comma-separated cases to run')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = sorted(set(cases) - set(CASES))
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    corpus = {'count': args.calls, 'seed': args.seed, 'sentences': args.sentences,
+              'companies': args.companies, 'days': args.days}
+    document = run(corpus, cases, ops=args.ops, ingest_runs=args.ingest_runs)
+    print_results(document)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+            f.write('\n')
+        print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
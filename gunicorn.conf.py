@@ -0,0 +1,45 @@
+"""
+Gunicorn configuration for CalPilot.
+
+The app, and with it the loaded calls, is created once in the master process
+(preload_app) and the workers are forked from it, so they share the calls
+copy-on-write instead of each holding its own copy. Freezing the garbage
+collector before forking keeps collections in the workers from writing to,
+and so copying, those shared pages. Transcripts in a TranscriptStore are
+shared through the page cache.
+
+With CALLS_BACKGROUND_REFRESH the master is the only process that reloads
+calls. After a reload it sends itself SIGHUP, which makes gunicorn fork fresh
+workers that share the new calls and gracefully stop the old ones. Without
+it, workers reload on their own and coordinate through CALLS_SNAPSHOT_FILE.
+"""
+
+import gc
+import multiprocessing
+import os
+import signal
+
+bind = f":{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+timeout = 0
+preload_app = True
+wsgi_app = os.environ.get('GUNICORN_APP', "app:create_app('production')")
+
+
+def _replace_workers(snapshot):
+    gc.freeze()
+    os.kill(os.getpid(), signal.SIGHUP)
+
+
+def on_starting(server):
+    app = server.app.wsgi()
+    app.call_service.load_calls()
+    if app.config.get('CALLS_BACKGROUND_REFRESH'):
+        app.call_service.add_reload_listener(_replace_workers)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    app = server.app.wsgi()
+    app.call_service.after_fork(parent_refreshes=bool(app.config.get('CALLS_BACKGROUND_REFRESH')))
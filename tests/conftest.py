@@ -1,3 +1,4 @@
+import json
 import pytest
 from app import create_app
 from app.config import TestingConfig
@@ -19,4 +20,41 @@ def client(app):
 @pytest.fixture
 def runner(app):
     """A test runner for the app's Click commands."""
-    return app.test_cli_runner() 
\ No newline at end of file
+    return app.test_cli_runner()
+
+@pytest.fixture
+def make_call():
+    """Build a raw call record in the calls.json format."""
+    def _make_call(call_id, title='Sales Call', text='', created_at='2023-12-20T10:00:00Z',
+                   duration=900, emails=('sales@company1.com', 'client@prospect.com')):
+        return {
+            'id': call_id,
+            'created_at_utc': created_at,
+            'call_metadata': {
+                'title': title,
+                'duration': duration,
+                'parties': [{'email': email} for email in emails]
+            },
+            'transcript': {'text': text},
+            'inference_results': {'call_summary': f'Summary of {call_id}'}
+        }
+    return _make_call
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Create an app instance backed by a temporary calls file."""
+    contexts = []
+
+    def _make_app(calls, **overrides):
+        calls_file = tmp_path / 'calls.json'
+        calls_file.write_text(json.dumps(calls))
+        config = type('Config', (TestingConfig,), {'CALLS_FILE': str(calls_file), **overrides})
+        app = create_app(config)
+        context = app.app_context()
+        context.push()
+        contexts.append(context)
+        return app
+
+    yield _make_app
+    for context in reversed(contexts):
+        context.pop()
@@ -1,5 +1,14 @@
 import pytest
+import gzip
 import json
+import os
+import time
+from datetime import datetime
+
+from app.json_provider import OrjsonProvider
+from app.services import call_service
+from app.services.call_record import CallRecord
+from app.services.response_cache import ResponseCache
 
 def test_get_call(client):
     """Test getting a specific call."""
@@ -51,4 +60,251 @@ def test_ask_question(client):
         'question': 'What was discussed?',
         'call_id': 'invalid-id'
     })
-    assert response.status_code == 404 
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_search_calls_invalid_match(client):
+    """Test that an unknown match mode is rejected."""
+    response = client.get('/api/calls/search?query=pricing&match=fuzzy')
+    assert response.status_code == 400
+
+def test_get_company_analytics(client):
+    """Test company call counts."""
+    response = client.get('/api/analytics/companies')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data == [
+        {'company': 'company1', 'call_count': 1},
+        {'company': 'prospect', 'call_count': 1}
+    ]
+
+def test_get_call_analytics(client):
+    """Test the volume, duration, keyword and participant aggregates."""
+    response = client.get('/api/analytics/volume?company=prospect')
+    assert response.status_code == 200
+    assert json.loads(response.data) == [{'week': '2023-12-18', 'company': 'prospect', 'calls': 1}]
+
+    data = json.loads(client.get('/api/analytics/durations').data)
+    assert data == {'calls': 1, 'duration': {'total': 900, 'average': 900}}
+    data = json.loads(client.get('/api/analytics/participants?date_to=2023-12-19').data)
+    assert data['calls'] == 0
+
+    assert client.get('/api/analytics/keywords?date_from=2023-13-01').status_code == 400
+
+def test_get_calls_status(client):
+    """Test the calls snapshot status endpoint."""
+    client.get('/api/calls/search')
+    response = client.get('/api/calls/status')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['calls'] == 1
+    assert data['snapshot_age_seconds'] >= 0
+    assert data['last_refresh_duration_seconds'] >= 0
+    assert data['background_refresh'] is False
+
+def test_search_calls_pagination_and_projection(make_app, make_call):
+    """Test paging, sorting and field projection of search results."""
+    app = make_app([
+        make_call(f'call-{i}', title=f'Call {i}', duration=60 * (i + 1),
+                  created_at=f'2023-12-{10 + i}T10:00:00Z')
+        for i in range(5)
+    ])
+    client = app.test_client()
+
+    response = client.get('/api/calls/search?limit=2&offset=1')
+    assert response.status_code == 200
+    assert response.headers['X-Total-Count'] == '5'
+    data = json.loads(response.data)
+    assert [c['id'] for c in data] == ['call-3', 'call-2']
+    assert data[0] == {
+        'id': 'call-3',
+        'title': 'Call 3',
+        'created_at_utc': '2023-12-13T10:00:00Z',
+        'formatted_date': 'December 13, 2023',
+        'duration_mins': '4m',
+        'participant_count': 2,
+        'companies': data[0]['companies']
+    }
+
+    data = json.loads(client.get('/api/calls/search?sort=shortest&limit=1').data)
+    assert [c['id'] for c in data] == ['call-0']
+
+    data = json.loads(client.get('/api/calls/search?sort=oldest&fields=id,duration_mins,inference_results').data)
+    assert data[0] == {
+        'id': 'call-0',
+        'duration_mins': '1m',
+        'inference_results': {'call_summary': 'Summary of call-0'}
+    }
+
+    data = json.loads(client.get('/api/calls/search?fields=full&limit=1').data)
+    assert data[0]['transcript'] == {'text': ''}
+
+    assert client.get('/api/calls/search?limit=0').status_code == 400
+    assert client.get('/api/calls/search?limit=abc').status_code == 400
+    assert client.get('/api/calls/search?offset=-1').status_code == 400
+    assert client.get('/api/calls/search?sort=random').status_code == 400
+
+def test_conditional_get(make_app, make_call, monkeypatch):
+    """Test ETags for call data, 304 answers and which changes invalidate them."""
+    app = make_app([make_call('call-1', text='pricing'), make_call('call-2', text='budget')])
+    client = app.test_client()
+
+    response = client.get('/api/call/call-1')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'public, max-age=60'
+    summary_etag = client.get('/api/call/call-1/summary').headers['ETag']
+    search_etag = client.get('/api/calls/search?query=pricing').headers['ETag']
+    companies_etag = client.get('/api/companies').headers['ETag']
+    assert 'ETag' not in client.get('/api/call/missing').headers
+
+    # A matching ETag is answered without serializing the call
+    monkeypatch.setattr(CallRecord, 'to_dict', lambda self: pytest.fail('call serialized'))
+    response = client.get('/api/call/call-1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    assert response.headers['Cache-Control'] == 'public, max-age=60'
+    assert client.get('/api/call/call-1/summary', headers={'If-None-Match': summary_etag}).status_code == 304
+    assert client.get('/api/companies', headers={'If-None-Match': companies_etag}).status_code == 304
+    response = client.get('/api/calls/search?query=pricing', headers={'If-None-Match': f'"other", {search_etag}'})
+    assert response.status_code == 304
+    monkeypatch.undo()
+
+    # Changing call-2 keeps call-1's ETag but changes the dataset generation
+    service = app.call_service
+    with open(service.calls_file, 'w') as f:
+        json.dump([make_call('call-1', text='pricing'), make_call('call-2', text='timeline')], f)
+    os.utime(service.calls_file, (time.time() + 10, time.time() + 10))
+
+    assert client.get('/api/call/call-1', headers={'If-None-Match': etag}).status_code == 304
+    response = client.get('/api/calls/search?query=pricing', headers={'If-None-Match': search_etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != search_etag
+
+    # The ETags also depend on how calls are processed and served
+    other = make_app([make_call('call-1', text='pricing')], KEYWORD_TERMS=['pricing'])
+    assert other.test_client().get('/api/call/call-1').headers['ETag'] != etag
+
+    def search_etag(**overrides):
+        other = make_app([make_call('call-1', text='pricing')], **overrides)
+        return other.test_client().get('/api/calls/search?query=pricing').headers['ETag']
+
+    baseline = search_etag()
+    assert search_etag() == baseline
+    assert search_etag(SEARCH_PAGE_SIZE=10) != baseline
+    assert search_etag(SEARCH_MAX_PAGE_SIZE=100) != baseline
+    monkeypatch.setattr(call_service, 'RESPONSE_FORMAT', call_service.RESPONSE_FORMAT + 1)
+    assert search_etag() != baseline
+
+def test_orjson_provider_matches_default_output(app):
+    """Test that the orjson provider serializes like Flask's default provider."""
+    pytest.importorskip('orjson')
+    assert isinstance(app.json, OrjsonProvider)
+    data = {'b': [1, 2.5, None], 'a': {'when': datetime(2023, 12, 20, 10, 0), 'name': 'Zoë'}, 3: True}
+    assert app.json.dumps(data) == '{"3":true,"a":{"name":"Zoë","when":"Wed, 20 Dec 2023 10:00:00 GMT"},"b":[1,2.5,null]}'
+    assert app.json.loads(app.json.dumps(data)) == json.loads(json.dumps(data, default=app.json.default))
+    # Integers orjson cannot represent fall back to the json module
+    assert app.json.dumps({'big': 2 ** 70}) == '{"big": 1180591620717411303424}'
+    app.json.compact = True
+    assert app.json.response({'a': 1}).get_data() == b'{"a":1}\n'
+    app.json.compact = False
+    assert app.json.response({'a': 1}).get_data() == b'{\n  "a": 1\n}\n'
+
+def test_call_response_is_cached_and_compressed(make_app, make_call, monkeypatch):
+    """Test that call bodies are serialized once per version and compressed per Accept-Encoding."""
+    app = make_app([make_call('call-1', text='pricing ' * 500), make_call('call-2', text='short')])
+    client = app.test_client()
+    serialized = []
+    to_dict = CallRecord.to_dict
+    monkeypatch.setattr(CallRecord, 'to_dict', lambda self: serialized.append(self.id) or to_dict(self))
+
+    plain = client.get('/api/call/call-1')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+    compressed = client.get('/api/call/call-1', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert len(compressed.data) < len(plain.data) / 5
+    assert compressed.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+    client.get('/api/call/call-1', headers={'Accept-Encoding': 'gzip'})
+    assert serialized == ['call-1']
+
+    # Each encoding's ETag is recognized
+    response = client.get('/api/call/call-1', headers={'If-None-Match': compressed.headers['ETag'],
+                                                       'Accept-Encoding': 'gzip'})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == compressed.headers['ETag']
+
+    # Small bodies are not worth compressing
+    response = client.get('/api/call/call-2', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert json.loads(response.data)['id'] == 'call-2'
+
+    # A reload clears the cache and serves the new record
+    service = app.call_service
+    with open(service.calls_file, 'w') as f:
+        json.dump([make_call('call-1', text='budget ' * 500)], f)
+    os.utime(service.calls_file, (time.time() + 10, time.time() + 10))
+    response = client.get('/api/call/call-1', headers={'Accept-Encoding': 'gzip'})
+    assert json.loads(gzip.decompress(response.data))['transcript']['text'].startswith('budget')
+    assert len(app.response_cache) == 1
+    assert serialized == ['call-1', 'call-2', 'call-1']
+
+def test_call_body_matches_its_etag_across_reloads(make_app, make_call, monkeypatch):
+    """Test that a reload in the middle of a request does not pair a body with another version's ETag."""
+    app = make_app([make_call('call-1', text='pricing ' * 500)])
+    client = app.test_client()
+    service = app.call_service
+    reloaded = []
+
+    def reload_once(method):
+        def wrapper(*args):
+            if not reloaded:
+                reloaded.append(True)
+                with open(service.calls_file, 'w') as f:
+                    json.dump([make_call('call-1', text='budget ' * 500)], f)
+                os.utime(service.calls_file, (time.time() + 10, time.time() + 10))
+                service.refresh_cache()
+            return method(*args)
+        return wrapper
+
+    # The reload lands after the ETag was looked up, before the body is built
+    for name in ('get_call_by_id', 'get_generation'):
+        monkeypatch.setattr(service, name, reload_once(getattr(service, name)))
+    old = client.get('/api/call/call-1')
+    assert json.loads(old.data)['transcript']['text'].startswith('pricing')
+
+    new = client.get('/api/call/call-1')
+    assert json.loads(new.data)['transcript']['text'].startswith('budget')
+    assert new.headers['ETag'] != old.headers['ETag']
+    assert client.get('/api/call/call-1', headers={'If-None-Match': old.headers['ETag']}).status_code == 200
+
+def test_response_cache_bounds():
+    """Test that the response cache evicts the least recently used bodies."""
+    cache = ResponseCache(max_entries=2, max_bytes=250, min_compress_size=0)
+    for etag in ('a', 'b', 'c'):
+        cache.body(etag, 'gen', 'identity', lambda: b'x' * 100)
+    assert len(cache) == 2
+    body, encoding = cache.body('b', 'gen', 'gzip', lambda: pytest.fail('serialized again'))
+    assert encoding == 'gzip' and gzip.decompress(body) == b'x' * 100
+    cache.body('d', 'gen', 'identity', lambda: b'y' * 100)
+    # c was least recently used, and b with its gzip body still fits
+    assert len(cache) == 2
+    cache.body('b', 'gen', 'identity', lambda: pytest.fail('serialized again'))
+    cache.body('b', 'other', 'identity', lambda: b'z')
+    assert len(cache) == 1
+
+def test_dashboard_renders_first_page(make_app, make_call):
+    """Test that the dashboard only renders the first page of call cards."""
+    app = make_app(
+        [make_call(f'call-{i}', title=f'Call number {i}', text='secret transcript text',
+                   created_at=f'2023-12-{10 + i}T10:00:00Z') for i in range(5)],
+        DASHBOARD_PAGE_SIZE=2
+    )
+    response = app.test_client().get('/dashboard')
+    assert response.status_code == 200
+    html = response.data.decode()
+    assert 'Call number 4' in html and 'Call number 3' in html
+    assert 'Call number 2' not in html
+    assert 'secret transcript text' not in html
+    assert 'data-offset="2" data-total="5"' in html
+
@@ -0,0 +1,52 @@
+import json
+import logging
+
+from benchmarks import compare, suite
+from benchmarks.corpus import company_names, generate_calls, parse_sentences, write_calls
+from app.services.call_stream import iter_json_array, iter_json_lines
+
+
+def test_corpus_is_deterministic_and_follows_parameters(tmp_path):
+    """Test that the synthetic corpus depends only on its parameters."""
+    calls = list(generate_calls(200, seed=7, sentences=(3, 6), companies=5, days=30, start='2024-03-01'))
+    assert calls == list(generate_calls(200, seed=7, sentences=(3, 6), companies=5, days=30, start='2024-03-01'))
+    assert calls != list(generate_calls(200, seed=8, sentences=(3, 6), companies=5, days=30, start='2024-03-01'))
+
+    assert [call['id'] for call in calls] == [f'call-{i}' for i in range(200)]
+    domains = {party['email'].split('@')[1] for call in calls for party in call['call_metadata']['parties']}
+    assert domains - {'calpilot.com'} <= {f'{name}.com' for name in company_names(5)}
+    assert all('2024-03-01' <= call['created_at_utc'][:10] <= '2024-03-30' for call in calls)
+    assert all(3 <= call['transcript']['text'].count(': ') <= 6 for call in calls)
+    assert parse_sentences('20-80') == (20, 80) and parse_sentences('40') == 40
+
+    for name, reader in (('calls.json', iter_json_array), ('calls.jsonl', iter_json_lines)):
+        path = tmp_path / name
+        assert write_calls(str(path), iter(calls)) == 200
+        with open(path) as f:
+            assert list(reader(f)) == calls
+
+
+def test_suite_results_can_be_compared(tmp_path, capsys):
+    """Test a small suite run end to end, including the regression check."""
+    corpus = {'count': 50, 'seed': 1, 'sentences': 5, 'companies': 3, 'days': 10}
+    # The suite quiets the app logger, which all apps share
+    logger = logging.getLogger('app')
+    level = logger.level
+    try:
+        document = suite.run(corpus, suite.CASES, ops=5, ingest_runs=1)
+    finally:
+        logger.setLevel(level)
+    assert set(document['results']) == set(suite.CASES)
+    assert document['results']['lookup']['ops'] == 50
+    assert all(stats['p50_us'] > 0 for stats in document['results'].values())
+
+    before = tmp_path / 'before.json'
+    after = tmp_path / 'after.json'
+    before.write_text(json.dumps(document))
+    slower = json.loads(json.dumps(document))
+    slower['results']['search']['p50_us'] *= 2
+    after.write_text(json.dumps(slower))
+
+    assert compare.main([str(before), str(before)]) == 0
+    assert compare.main([str(before), str(after)]) == 1
+    assert 'search' in [line.split()[0] for line in capsys.readouterr().out.splitlines() if 'REGRESSION' in line]
@@ -1,5 +1,21 @@
+import gc
+import io
+import json
+import os
+import threading
+import time
 import pytest
 from datetime import datetime
+from types import SimpleNamespace
+
+from google.api_core.exceptions import NotModified, PreconditionFailed
+
+from app import create_app
+from app.config import TestingConfig
+from app.services import gcs_source
+from app.services.call_analytics import ALL_CALLS, CallAnalytics
+from app.services.call_stream import iter_json_array
+from app.services.transcript_store import TranscriptStore
 
 def test_load_calls(app):
     """Test loading calls from file."""
@@ -15,6 +31,7 @@ def test_get_call_by_id(app):
         call = app.call_service.get_call_by_id('test-call-1')
         assert call is not None
         assert call['call_metadata']['title'] == 'Test Sales Call 1'
+        assert app.call_service.get_call_by_id('missing-call') is None
 
 def test_search_calls(app):
     """Test search functionality."""
@@ -44,4 +61,694 @@ def test_format_duration(app):
         assert app.call_service.format_duration(3600) == '1h'
         assert app.call_service.format_duration(3660) == '1h 1m'
         assert app.call_service.format_duration(60) == '1m'
-        assert app.call_service.format_duration(90) == '1m 30s' 
\ No newline at end of file
+        assert app.call_service.format_duration(90) == '1m 30s'
+
+def test_search_calls_uses_word_matching(make_app, make_call):
+    """Test that text search matches whole words and phrases."""
+    app = make_app([
+        make_call('call-1', title='Pricing review', text='We covered next steps. Then pricing.'),
+        make_call('call-2', text='Budget approval is pending, next week we discuss steps.'),
+        make_call('call-3', text='The demonstration went well.')
+    ])
+    service = app.call_service
+
+    assert [c['id'] for c in service.search_calls(query='PRICING')] == ['call-1']
+    assert [c['id'] for c in service.search_calls(query='next steps')] == ['call-1']
+    assert {c['id'] for c in service.search_calls(query='next')} == {'call-1', 'call-2'}
+    assert service.search_calls(query='demo') == []
+
+def test_search_calls_prefix_and_substring_modes(make_app, make_call):
+    """Test the prefix and substring match modes."""
+    app = make_app([
+        make_call('call-1', text='The demonstration went well.'),
+        make_call('call-2', text='Our pre-demo checklist is ready.')
+    ])
+    service = app.call_service
+
+    assert {c['id'] for c in service.search_calls(query='demo', match='prefix')} == {'call-1', 'call-2'}
+    assert [c['id'] for c in service.search_calls(query='went we', match='prefix')] == ['call-1']
+    assert [c['id'] for c in service.search_calls(query='monstration', match='substring')] == ['call-1']
+    assert [c['id'] for c in service.search_calls(query='tration went w', match='substring')] == ['call-1']
+
+    with pytest.raises(ValueError):
+        service.search_calls(query='demo', match='fuzzy')
+
+def test_refresh_cache_swaps_lookup_map(make_app, make_call):
+    """Test that the ID map is rebuilt together with the calls list."""
+    app = make_app([make_call('call-1'), make_call('call-2')])
+    service = app.call_service
+    assert service.get_call_by_id('call-2')['id'] == 'call-2'
+
+    with open(service.calls_file, 'w') as f:
+        json.dump([make_call('call-3')], f)
+    service.refresh_cache()
+
+    assert service.get_call_by_id('call-2') is None
+    assert service.get_call_by_id('call-3')['id'] == 'call-3'
+    assert [c['id'] for c in service.load_calls()] == ['call-3']
+
+def test_search_calls_date_range(make_app, make_call):
+    """Test date filtering, newest-first ordering and composition with other filters."""
+    app = make_app([
+        make_call('call-1', text='pricing', created_at='2023-12-01T09:00:00Z'),
+        make_call('call-2', text='pricing', created_at='2023-12-10T09:00:00Z',
+                  emails=('rep@company2.com',)),
+        make_call('call-3', text='timeline', created_at='2023-12-05T09:00:00Z'),
+        make_call('call-4', text='pricing', created_at='2023-12-20T09:00:00Z')
+    ])
+    service = app.call_service
+
+    assert [c['id'] for c in service.search_calls()] == ['call-4', 'call-2', 'call-3', 'call-1']
+    assert [c['id'] for c in service.search_calls(date_from='2023-12-05', date_to='2023-12-11')] == ['call-2', 'call-3']
+    # date_to includes the whole day, as in the analytics queries
+    assert [c['id'] for c in service.search_calls(date_to='2023-12-05')] == ['call-3', 'call-1']
+    assert service.get_call_analytics(date_to='2023-12-05')['calls'] == 2
+    assert [c['id'] for c in service.search_calls(date_to='2023-12-04T23:00:00')] == ['call-1']
+    assert [c['id'] for c in service.search_calls(query='pricing', date_from='2023-12-02')] == ['call-4', 'call-2']
+    assert [c['id'] for c in service.search_calls(company='company1', date_from='2023-12-02')] == ['call-4', 'call-3']
+    # Invalid dates are ignored rather than failing the search
+    assert len(service.search_calls(date_from='not-a-date')) == 4
+
+def test_company_index_follows_reloads(make_app, make_call):
+    """Test that company facets and the company filter are rebuilt on every reload."""
+    app = make_app([
+        make_call('call-1', emails=('rep@acme.com', 'buyer@globex.com')),
+        make_call('call-2', emails=('rep@acme.com',), created_at='2023-12-21T10:00:00Z')
+    ])
+    service = app.call_service
+    assert service.get_unique_companies() == ['acme', 'globex']
+    assert service.get_company_counts() == {'acme': 2, 'globex': 1}
+    assert [c['id'] for c in service.search_calls(company='acme')] == ['call-2', 'call-1']
+
+    # A changed calls file is picked up without an explicit refresh
+    with open(service.calls_file, 'w') as f:
+        json.dump([make_call('call-3', emails=('buyer@initech.com',))], f)
+    os.utime(service.calls_file, (time.time() + 10, time.time() + 10))
+
+    assert service.get_unique_companies() == ['initech']
+    assert service.get_company_counts() == {'initech': 1}
+    assert service.search_calls(company='acme') == []
+
+def test_analytics_filters(make_app, make_call):
+    """Test weekly volume and totals with company and inclusive date filters."""
+    app = make_app([
+        make_call('call-1', text='Pricing. Pricing again.', created_at='2023-12-04T09:00:00Z', duration=600,
+                  emails=('rep@acme.com', 'buyer@globex.com')),
+        make_call('call-2', text='The budget.', created_at='2023-12-10T23:00:00Z', duration=1200,
+                  emails=('rep@acme.com',)),
+        make_call('call-3', text='Pricing and budget.', created_at='2023-12-11T09:00:00Z', duration=300,
+                  emails=('rep@acme.com', 'a@globex.com', 'b@globex.com'))
+    ])
+    service = app.call_service
+
+    assert service.get_weekly_volume() == [
+        {'week': '2023-12-04', 'company': 'acme', 'calls': 2},
+        {'week': '2023-12-04', 'company': 'globex', 'calls': 1},
+        {'week': '2023-12-11', 'company': 'acme', 'calls': 1},
+        {'week': '2023-12-11', 'company': 'globex', 'calls': 1}
+    ]
+    assert service.get_weekly_volume(company='acme', date_from='2023-12-10') == [
+        {'week': '2023-12-04', 'company': 'acme', 'calls': 1},
+        {'week': '2023-12-11', 'company': 'acme', 'calls': 1}
+    ]
+
+    analytics = service.get_call_analytics()
+    assert analytics['calls'] == 3
+    assert analytics['duration'] == {'total': 2100, 'average': 700}
+    assert analytics['participants'] == {'total': 6, 'average': 2, 'calls_by_count': {'1': 1, '2': 1, '3': 1}}
+    assert analytics['keywords'] == [
+        {'term': 'pricing', 'mentions': 3, 'calls': 2},
+        {'term': 'budget', 'mentions': 2, 'calls': 2}
+    ]
+
+    analytics = service.get_call_analytics(company='globex', date_to='2023-12-10')
+    assert analytics['calls'] == 1
+    assert analytics['duration'] == {'total': 600, 'average': 600}
+    assert service.get_call_analytics(company='initech')['calls'] == 0
+
+    with pytest.raises(ValueError):
+        service.get_weekly_volume(date_from='not-a-date')
+
+def test_analytics_follow_incremental_reloads(make_app, make_call):
+    """Test that aggregates updated across reloads match aggregates built from scratch."""
+    app = make_app([
+        make_call('call-1', text='We talked about pricing.', emails=('rep@acme.com',)),
+        make_call('call-2', text='The budget is approved.', emails=('rep@acme.com', 'buyer@globex.com')),
+        make_call('call-3', text='Timeline is tight.', emails=('buyer@globex.com',))
+    ])
+    service = app.call_service
+    old_snapshot = service._get_snapshot()
+
+    with open(service.calls_file, 'w') as f:
+        json.dump([
+            make_call('call-1', text='We talked about pricing.', emails=('rep@acme.com',)),
+            make_call('call-2', text='The budget needs approval.', duration=60, emails=('rep@acme.com',)),
+            make_call('call-4', text='Pricing was discussed again.', created_at='2024-01-03T10:00:00Z',
+                      emails=('rep@initech.com',))
+        ], f)
+    os.utime(service.calls_file, (time.time() + 10, time.time() + 10))
+    service.load_calls()
+
+    snapshot = service._get_snapshot()
+    rebuilt = CallAnalytics.from_calls(snapshot.calls)
+    assert snapshot.analytics.companies == rebuilt.companies == ['acme', 'initech']
+    for company in [ALL_CALLS] + rebuilt.companies:
+        current, expected = snapshot.analytics.totals(company), rebuilt.totals(company)
+        assert current.__slots__ == expected.__slots__
+        for name in current.__slots__:
+            assert getattr(current, name) == getattr(expected, name)
+        assert snapshot.analytics.weekly_calls(company) == rebuilt.weekly_calls(company)
+    assert service.get_call_analytics()['duration']['total'] == 1860
+    assert service.get_weekly_volume(company='globex') == []
+
+    # The previous snapshot's aggregates are left untouched for in-flight readers
+    assert old_snapshot.analytics.companies == ['acme', 'globex']
+    assert old_snapshot.analytics.totals().calls == 3
+    assert old_snapshot.analytics.totals('globex').keyword_mentions == {'budget': 1, 'timeline': 1}
+
+def test_extract_keywords(app):
+    """Test keyword context extraction."""
+    with app.app_context():
+        text = ("Pricing came up early. We agreed on next steps and a demo. "
+                "The demonstration of pricing tiers. Trailing budget without a period")
+        assert app.call_service._extract_keywords(text) == {
+            'pricing': ['pricing came up early.', 'the demonstration of pricing tiers.'],
+            'next steps': ['we agreed on next steps and a demo.'],
+            'demo': ['we agreed on next steps and a demo.', 'the demonstration of pricing tiers.']
+        }
+        assert app.call_service._extract_keywords('') == {}
+
+def test_keyword_terms_are_configurable(make_app, make_call):
+    """Test that the keyword vocabulary comes from app config."""
+    app = make_app(
+        [make_call('call-1', text='Security review is pending. Pricing is fine.')],
+        KEYWORD_TERMS=['security', 'SOC 2']
+    )
+    call = app.call_service.get_call_by_id('call-1')
+    assert call['keywords'] == {'security': ['security review is pending.']}
+
+def test_call_record_serializes_to_processed_call_shape(make_app, make_call):
+    """Test that records keep keyword offsets but serialize like the processed dicts did."""
+    raw = make_call('call-1', text='Pricing came up. We scheduled a DEMO. Thanks',
+                    emails=('rep@acme.com', 'buyer@globex.com', 'other@acme.com'))
+    raw['transcript']['speakers'] = ['rep', 'buyer']
+    app = make_app([raw])
+    call = app.call_service.get_call_by_id('call-1')
+
+    assert not hasattr(call, '__dict__')
+    assert call.to_dict() == {
+        **raw,
+        'created_at_ts': datetime.fromisoformat('2023-12-20T10:00:00+00:00').timestamp(),
+        'formatted_date': 'December 20, 2023',
+        'duration_mins': '15m',
+        'companies': ['acme', 'globex'],
+        'keywords': {'pricing': ['pricing came up.'], 'demo': ['we scheduled a demo.']}
+    }
+    assert call['transcript'] == raw['transcript']
+
+def test_call_record_keywords_when_lowercasing_changes_length(make_app, make_call):
+    """Test keyword context for text whose lowercase form has a different length."""
+    app = make_app([make_call('call-1', text='İstanbul pricing is set. Budget is fine.')])
+    call = app.call_service.get_call_by_id('call-1')
+    assert call.keywords == {
+        'pricing': ['i̇stanbul pricing is set.'],
+        'budget': ['budget is fine.']
+    }
+
+def test_load_calls_from_json_lines(make_app, make_call, tmp_path):
+    """Test loading newline-delimited calls, skipping records that fail processing."""
+    calls_file = tmp_path / 'calls.jsonl'
+    calls_file.write_text('\n'.join([
+        json.dumps(make_call('call-1', created_at='2023-12-01T10:00:00Z')),
+        '',
+        json.dumps({'id': 'broken-call'}),
+        json.dumps(make_call('call-2', created_at='2023-12-02T10:00:00Z'))
+    ]) + '\n')
+    app = make_app([], CALLS_FILE=str(calls_file))
+
+    assert [c['id'] for c in app.call_service.load_calls()] == ['call-2', 'call-1']
+
+def test_iter_json_array_reads_incrementally(make_call):
+    """Test that array elements are yielded before the rest of the stream is read."""
+    calls = [make_call(f'call-{i}', text='pricing ' * 50) for i in range(20)]
+    stream = io.StringIO(json.dumps(calls))
+    records = iter_json_array(stream, chunk_size=256)
+
+    assert next(records)['id'] == 'call-0'
+    assert stream.tell() < 2048
+    assert [call['id'] for call in records] == [f'call-{i}' for i in range(1, 20)]
+
+def test_iter_json_array_rejects_trailing_data(make_call):
+    """Test that only whitespace may follow the calls array."""
+    calls = json.dumps([make_call('call-1'), make_call('call-2')])
+    assert len(list(iter_json_array(io.StringIO(calls + ' \n'), chunk_size=16))) == 2
+    assert list(iter_json_array(io.StringIO('[] \n'))) == []
+
+    for text in (calls + calls, calls + ',', '[]x', calls + '\n' + ' ' * 100 + '{"id": "call-3"}'):
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_array(io.StringIO(text), chunk_size=16))
+
+def test_load_calls_invalid_json(make_app, make_call):
+    """Test that a truncated calls file does not replace the cache with partial data."""
+    app = make_app([make_call('call-1')])
+    service = app.call_service
+    assert len(service.load_calls()) == 1
+
+    with open(service.calls_file, 'w') as f:
+        f.write(json.dumps([make_call('call-2'), make_call('call-3')])[:-20])
+    service.refresh_cache()
+
+    assert service.get_call_by_id('call-1') is not None
+    assert service.get_call_by_id('call-2') is None
+
+def test_parallel_ingest_matches_serial(make_app, make_call):
+    """Test that pooled processing keeps input order and skips invalid records."""
+    calls = [
+        make_call(f'call-{i}', text=f'Call {i} covered pricing. Next steps agreed.',
+                  created_at='2023-12-20T10:00:00Z')
+        for i in range(7)
+    ]
+    calls.insert(3, {'id': 'broken-call'})
+    serial = make_app(calls).call_service.load_calls()
+    parallel = make_app(calls, INGEST_WORKERS=2, INGEST_CHUNK_SIZE=2).call_service.load_calls()
+
+    assert [c['id'] for c in parallel] == [f'call-{i}' for i in range(7)]
+    assert parallel == serial
+
+def test_reload_only_reprocesses_changed_calls(make_app, make_call, caplog):
+    """Test that a reload reuses unchanged calls and updates the indexes for the rest."""
+    app = make_app([
+        make_call('call-1', text='We talked about pricing.'),
+        make_call('call-2', text='The budget is approved.'),
+        make_call('call-3', text='Timeline is tight.')
+    ])
+    service = app.call_service
+    old_snapshot = service._get_snapshot()
+    unchanged_call = service.get_call_by_id('call-1')
+
+    with open(service.calls_file, 'w') as f:
+        json.dump([
+            make_call('call-1', text='We talked about pricing.'),
+            make_call('call-2', text='The budget needs approval.'),
+            make_call('call-4', text='Pricing was discussed again.')
+        ], f)
+    os.utime(service.calls_file, (time.time() + 10, time.time() + 10))
+
+    with caplog.at_level('INFO'):
+        service.load_calls()
+    assert 'Calls reloaded: 1 added, 1 changed, 1 removed, 1 unchanged' in caplog.text
+
+    assert service.get_call_by_id('call-1') is unchanged_call
+    assert service.get_call_by_id('call-3') is None
+    assert {c['id'] for c in service.search_calls(query='pricing')} == {'call-1', 'call-4'}
+    assert [c['id'] for c in service.search_calls(query='approval')] == ['call-2']
+    assert service.search_calls(query='approved') == []
+    assert service.search_calls(query='timeline') == []
+
+    # The previous snapshot's index is left untouched for in-flight readers
+    assert old_snapshot.search_index.search('approved') == {'call-2'}
+    assert old_snapshot.search_index.search('timeline') == {'call-3'}
+
+def test_unchanged_source_is_not_read_again(make_app, make_call, monkeypatch):
+    """Test that the calls file is only re-read when its version changes."""
+    app = make_app([make_call('call-1')])
+    service = app.call_service
+    service.load_calls()
+
+    opened = []
+    open_calls_stream = service._open_calls_stream
+    monkeypatch.setattr(service, '_open_calls_stream', lambda version: opened.append(1) or open_calls_stream(version))
+
+    os.utime(service.calls_file, (time.time() + 10, time.time() + 10))
+    service.load_calls()
+    service.load_calls()
+    assert len(opened) == 1
+
+def test_concurrent_requests_share_one_reload(make_app, make_call, monkeypatch):
+    """Test single-flight reloads and serving the current snapshot during a reload."""
+    app = make_app([make_call('call-1')])
+    service = app.call_service
+    builds = []
+    build_snapshot = service._build_snapshot
+
+    def slow_build_snapshot(source_version):
+        builds.append(source_version)
+        time.sleep(0.2)
+        return build_snapshot(source_version)
+    monkeypatch.setattr(service, '_build_snapshot', slow_build_snapshot)
+
+    def load_in_threads():
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(service.load_calls())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    # Cold start: every request waits for the single load
+    results = load_in_threads()
+    assert len(builds) == 1
+    assert all([c['id'] for c in calls] == ['call-1'] for calls in results)
+
+    # Stale cache: one request reloads, the others get the current snapshot
+    with open(service.calls_file, 'w') as f:
+        json.dump([make_call('call-2')], f)
+    os.utime(service.calls_file, (time.time() + 10, time.time() + 10))
+    results = load_in_threads()
+    assert len(builds) == 2
+    assert sorted(calls[0]['id'] for calls in results).count('call-2') == 1
+    assert [c['id'] for c in service.load_calls()] == ['call-2']
+
+def test_background_refresh(make_app, make_call):
+    """Test that the background refresher reloads changed data without a request."""
+    app = make_app([make_call('call-1')], CALLS_REFRESH_INTERVAL=0.05)
+    service = app.call_service
+    service.start_background_refresh()
+    try:
+        deadline = time.time() + 5
+        while service._calls_cache is None and time.time() < deadline:
+            time.sleep(0.01)
+        assert service.get_cache_status()['calls'] == 1
+
+        with open(service.calls_file, 'w') as f:
+            json.dump([make_call('call-2'), make_call('call-3')], f)
+        os.utime(service.calls_file, (time.time() + 10, time.time() + 10))
+        while service.get_cache_status()['calls'] != 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        status = service.get_cache_status()
+        assert status['calls'] == 2
+        assert status['background_refresh'] is True
+        assert status['last_refresh_duration_seconds'] is not None
+        assert service.get_call_by_id('call-3') is not None
+    finally:
+        service.stop_background_refresh()
+
+def test_transcript_store_round_trip(tmp_path):
+    """Test that transcripts read back from a mapped segment, and failed writes leave no file."""
+    store = TranscriptStore(str(tmp_path))
+    texts = ['Pricing came up.', '', 'Über café — 10€ budget.']
+    with store.writer() as writer:
+        refs = [writer.add(text) for text in texts]
+    assert [ref.text() for ref in refs] == texts
+    assert bytes(refs[2].view()) == texts[2].encode('utf-8')
+    assert len(os.listdir(tmp_path)) == 1
+
+    with pytest.raises(RuntimeError):
+        with store.writer() as writer:
+            writer.add('Never finished.')
+            raise RuntimeError('reload failed')
+    assert len(os.listdir(tmp_path)) == 1
+
+    # The segment file is removed once nothing references its transcripts
+    del refs
+    gc.collect()
+    assert os.listdir(tmp_path) == []
+
+def test_transcripts_served_from_store(make_app, make_call, tmp_path):
+    """Test that stored transcripts are loaded on demand and survive reloads of other calls."""
+    store_dir = tmp_path / 'transcripts'
+    app = make_app([
+        make_call('call-1', text='We discussed pricing at length. ' * 20),
+        make_call('call-2', text='The budget is approved.')
+    ], TRANSCRIPT_STORE_DIR=str(store_dir))
+    service = app.call_service
+
+    old_call = service.get_call_by_id('call-1')
+    assert old_call.transcript_ref is not None
+    assert service.get_call_by_id('call-2').to_dict()['transcript'] == {'text': 'The budget is approved.'}
+    assert service.get_call_by_id('call-2').keywords == {'budget': ['the budget is approved.']}
+    assert [c.id for c in service.search_calls(query='approved')] == ['call-2']
+
+    with open(service.calls_file, 'w') as f:
+        json.dump([
+            make_call('call-1', text='Short follow up call.'),
+            make_call('call-2', text='The budget is approved.')
+        ], f)
+    os.utime(service.calls_file, (time.time() + 10, time.time() + 10))
+
+    assert service.get_call_by_id('call-1').transcript_text == 'Short follow up call.'
+    assert service.get_call_by_id('call-2').transcript_text == 'The budget is approved.'
+    # Records of the previous snapshot remain readable
+    assert old_call.transcript_text == 'We discussed pricing at length. ' * 20
+
+    # Most stored bytes belonged to the replaced call, so transcripts were compacted
+    del old_call
+    gc.collect()
+    assert len(os.listdir(store_dir)) == 1
+
+def test_snapshot_file_warm_start(make_app, make_call, tmp_path):
+    """Test that a snapshot built by the CLI is served at startup without reading the source."""
+    snapshot_file = tmp_path / 'snapshots' / 'calls.snapshot'
+    app = make_app([make_call('call-1', text='Pricing is fine.'), make_call('call-2')])
+    result = app.test_cli_runner().invoke(args=['build-snapshot', '--output', str(snapshot_file)])
+    assert result.exit_code == 0
+    assert 'Saved 2 calls' in result.output
+
+    config = type('Config', (TestingConfig,), {
+        'CALLS_FILE': app.call_service.calls_file, 'CALLS_SNAPSHOT_FILE': str(snapshot_file)
+    })
+    service = create_app(config).call_service
+    assert service.get_cache_status()['calls'] == 2
+    with service._reload_lock:
+        # Served without reloading, which would block on the lock
+        assert service.get_call_by_id('call-1').keywords == {'pricing': ['pricing is fine.']}
+        assert [c.id for c in service.search_calls(query='pricing')] == ['call-1']
+
+def test_snapshot_file_for_old_source_seeds_reload(make_app, make_call, tmp_path):
+    """Test that an outdated snapshot is not served but its unchanged calls are reused."""
+    snapshot_file = tmp_path / 'calls.snapshot'
+    app = make_app([make_call('call-1'), make_call('call-2', text='Old text.')],
+                   CALLS_SNAPSHOT_FILE=str(snapshot_file))
+    app.call_service.save_snapshot()
+
+    calls_file = app.call_service.calls_file
+    with open(calls_file, 'w') as f:
+        json.dump([make_call('call-1'), make_call('call-2', text='New text.')], f)
+    os.utime(calls_file, (time.time() + 10, time.time() + 10))
+
+    config = type('Config', (TestingConfig,), {'CALLS_FILE': calls_file, 'CALLS_SNAPSHOT_FILE': str(snapshot_file)})
+    service = create_app(config).call_service
+    assert service.get_cache_status()['calls'] == 0
+    seeded_call = service._seed_snapshot.get('call-1')
+    assert service.get_call_by_id('call-1') is seeded_call
+    assert service.get_call_by_id('call-2').transcript_text == 'New text.'
+
+    # A snapshot built with other keyword terms is ignored
+    config.KEYWORD_TERMS = ['security']
+    service = create_app(config).call_service
+    assert service._seed_snapshot is None and service._calls_cache is None
+
+def test_shared_snapshot_file_reload_is_built_once(make_app, make_call, tmp_path):
+    """Test that a process sharing the snapshot file loads a reload another process built."""
+    snapshot_file = str(tmp_path / 'calls.snapshot')
+    leader = make_app([make_call('call-1', title='Old title')], CALLS_SNAPSHOT_FILE=snapshot_file).call_service
+    leader.load_calls()
+    config = type('Config', (TestingConfig,), {'CALLS_FILE': leader.calls_file, 'CALLS_SNAPSHOT_FILE': snapshot_file})
+    follower = create_app(config).call_service
+    assert follower.get_call_by_id('call-1').title == 'Old title'
+
+    with open(leader.calls_file, 'w') as f:
+        json.dump([make_call('call-1', title='New title')], f)
+    os.utime(leader.calls_file, (time.time() + 10, time.time() + 10))
+    assert leader.get_call_by_id('call-1').title == 'New title'
+
+    def fail_processing(calls):
+        raise AssertionError('follower should load the saved snapshot')
+    follower._process_calls = fail_processing
+    assert follower.get_call_by_id('call-1').title == 'New title'
+
+def test_forked_worker_leaves_reloads_to_parent(make_app, make_call):
+    """Test reload listeners and that a worker whose parent refreshes never reloads itself."""
+    app = make_app([make_call('call-1', title='Old title')])
+    service = app.call_service
+    published = []
+    service.add_reload_listener(published.append)
+    service.load_calls()
+    assert [len(snapshot) for snapshot in published] == [1]
+
+    service.after_fork(parent_refreshes=True)
+    with open(service.calls_file, 'w') as f:
+        json.dump([make_call('call-1', title='New title')], f)
+    os.utime(service.calls_file, (time.time() + 10, time.time() + 10))
+    assert service.get_call_by_id('call-1').title == 'Old title'
+    assert len(published) == 1
+
+class FakeBucket:
+    """In-process stand-in for a GCS bucket, recording the requests made to it."""
+
+    def __init__(self):
+        self.blobs = {}
+        self.generation = 0
+        self.metadata_requests = []
+        self.opened = []
+        # Called with the blob name before every chunk read
+        self.on_read = None
+        self.active_downloads = 0
+        self.max_active_downloads = 0
+        self._lock = threading.Lock()
+
+    def upload(self, name, calls):
+        self.generation += 1
+        if name.endswith('.jsonl'):
+            data = '\n'.join(json.dumps(call) for call in calls)
+        else:
+            data = json.dumps(calls)
+        self.blobs[name] = FakeBlob(self, name, data.encode('utf-8'), self.generation)
+
+    def get_blob(self, name, if_generation_not_match=None):
+        self.metadata_requests.append(if_generation_not_match)
+        blob = self.blobs.get(name)
+        if blob is not None and blob.generation == if_generation_not_match:
+            raise NotModified('Not modified')
+        return blob
+
+    def blob(self, name):
+        return self.blobs[name]
+
+    def list_blobs(self, prefix=None):
+        return [blob for name, blob in self.blobs.items() if name.startswith(prefix or '')]
+
+
+class FakeBlob:
+    def __init__(self, bucket, name, data, generation):
+        self.bucket, self.name, self.data, self.generation = bucket, name, data, generation
+
+    def _check_generation(self, generation):
+        if generation is not None and self.bucket.blobs[self.name].generation != generation:
+            raise PreconditionFailed(f'{self.name} is no longer at generation {generation}')
+
+    def open(self, mode='r', chunk_size=None, encoding=None, if_generation_match=None):
+        self.bucket.opened.append((self.name, chunk_size))
+        return io.TextIOWrapper(FakeBlobReader(self, chunk_size, if_generation_match), encoding=encoding)
+
+    def download_as_bytes(self, if_generation_match=None):
+        self._check_generation(if_generation_match)
+        bucket = self.bucket
+        with bucket._lock:
+            bucket.active_downloads += 1
+            bucket.max_active_downloads = max(bucket.max_active_downloads, bucket.active_downloads)
+        time.sleep(0.05)
+        with bucket._lock:
+            bucket.active_downloads -= 1
+        return self.data
+
+
+class FakeBlobReader(io.RawIOBase):
+    """Reads a FakeBlob one chunk per request, checking the generation like BlobReader does."""
+
+    def __init__(self, blob, chunk_size, generation):
+        self.blob, self.chunk_size, self.generation = blob, chunk_size or 1024, generation
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.blob.bucket.on_read is not None:
+            self.blob.bucket.on_read(self.blob.name)
+        self.blob._check_generation(self.generation)
+        chunk = self.blob.data[self.position:self.position + min(len(buffer), self.chunk_size)]
+        buffer[:len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+
+@pytest.fixture
+def fake_gcs(monkeypatch):
+    """Replace the storage client with one serving a FakeBucket; records created clients."""
+    bucket = FakeBucket()
+    clients = []
+
+    def make_client():
+        clients.append(1)
+        return SimpleNamespace(bucket=lambda name: bucket)
+
+    monkeypatch.setattr(gcs_source, 'storage', SimpleNamespace(Client=make_client))
+    bucket.clients = clients
+    return bucket
+
+def test_gcs_client_is_reused_and_unchanged_blob_not_downloaded(make_app, make_call, fake_gcs):
+    """Test that one client serves every reload and an unchanged blob is only checked."""
+    fake_gcs.upload('calls.json', [make_call('call-1')])
+    app = make_app([], GCS_BUCKET='calpilot-test', CALLS_REFRESH_INTERVAL=0, GCS_CHUNK_SIZE=1024)
+    service = app.call_service
+    assert [c.id for c in service.load_calls()] == ['call-1']
+    assert fake_gcs.opened == [('calls.json', 1024)]
+
+    assert [c.id for c in service.load_calls()] == ['call-1']
+    assert fake_gcs.metadata_requests[-1] == 1
+    assert len(fake_gcs.opened) == 1
+
+    fake_gcs.upload('calls.json', [make_call('call-1'), make_call('call-2')])
+    assert [c.id for c in service.load_calls()] == ['call-1', 'call-2']
+    assert service.get_cache_status()['source_version'] == 'gcs:2'
+    assert len(fake_gcs.opened) == 2
+    assert len(fake_gcs.clients) == 1
+
+def test_gcs_sharded_calls(make_app, make_call, fake_gcs):
+    """Test that calls shards are downloaded concurrently and read in name order."""
+    fake_gcs.upload('calls/calls-000.json', [make_call('call-1'), make_call('call-2')])
+    fake_gcs.upload('calls/calls-001.jsonl', [make_call('call-3')])
+    fake_gcs.upload('calls/calls-002.json', [make_call('call-4')])
+    fake_gcs.upload('calls/calls-003.json', [make_call('call-5')])
+    fake_gcs.upload('calls/notes.json', [make_call('call-x')])
+    app = make_app([], GCS_BUCKET='calpilot-test', CALLS_PREFIX='calls/', CALLS_REFRESH_INTERVAL=0,
+                   GCS_DOWNLOAD_WORKERS=2)
+    service = app.call_service
+
+    calls = service.load_calls()
+    assert sorted(c.id for c in calls) == ['call-1', 'call-2', 'call-3', 'call-4', 'call-5']
+    assert fake_gcs.max_active_downloads == 2
+    version = service.get_cache_status()['source_version']
+    assert version.startswith('gcs-shards:4:')
+
+    fake_gcs.upload('calls/calls-001.jsonl', [make_call('call-3', title='Changed title')])
+    assert service.get_call_by_id('call-3').title == 'Changed title'
+    assert service.get_cache_status()['source_version'] != version
+
+
+def test_gcs_upload_during_reload_is_not_mixed_in(make_app, make_call, fake_gcs):
+    """Test that a reload starts over, rather than mixing generations, when the calls change mid-read."""
+    fake_gcs.upload('calls.json', [make_call(f'call-{i}', text='old ' * 50) for i in range(20)])
+    app = make_app([], GCS_BUCKET='calpilot-test', CALLS_REFRESH_INTERVAL=0, GCS_CHUNK_SIZE=256)
+    service = app.call_service
+    reads = []
+
+    def upload_once(name):
+        reads.append(name)
+        if len(reads) == 3:
+            fake_gcs.upload('calls.json', [make_call(f'call-{i}', text='new ' * 50) for i in range(20)])
+
+    fake_gcs.on_read = upload_once
+    calls = service.load_calls()
+    assert len(calls) == 20
+    assert {c.transcript_text for c in calls} == {'new ' * 50}
+    assert service.get_cache_status()['source_version'] == 'gcs:2'
+
+    # A source that keeps changing fails the reload and keeps serving the last complete snapshot
+    def upload_always(name):
+        fake_gcs.upload('calls.json', [make_call('call-x')])
+
+    fake_gcs.upload('calls.json', [make_call('call-y')])
+    fake_gcs.on_read = upload_always
+    assert len(service.load_calls()) == 20
+    assert service.get_cache_status()['source_version'] == 'gcs:2'
+
+def test_gcs_shard_change_during_reload_is_not_mixed_in(make_app, make_call, fake_gcs):
+    """Test that shards are downloaded at the generations their version was computed from."""
+    fake_gcs.upload('calls/calls-000.json', [make_call('call-1')])
+    fake_gcs.upload('calls/calls-001.json', [make_call('call-2')])
+    app = make_app([], GCS_BUCKET='calpilot-test', CALLS_PREFIX='calls/', CALLS_REFRESH_INTERVAL=0)
+    service = app.call_service
+    source = service.gcs
+
+    version = source.version()
+    fake_gcs.upload('calls/calls-001.json', [make_call('call-2', title='Changed title')])
+    with pytest.raises(PreconditionFailed):
+        list(source.iter_shard_calls(version))
+
+    service.load_calls()
+    assert service.get_call_by_id('call-2').title == 'Changed title'
+    assert service.get_cache_status()['source_version'] == source.version() != version
@@ -0,0 +1,396 @@
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from anthropic import APITimeoutError, RateLimitError
+
+from app.services import answer_cache, claude_service
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.services.answer_cache import AnswerCache, answer_cache_key, normalize_question
+from app.services.transcript_window import GAP_MARKER, estimate_tokens, window_transcript
+
+
+class StubMessages:
+    """Stands in for client.messages: answers after a delay, raising any queued errors first."""
+
+    def __init__(self, latency=0.05, errors=(), pieces=('The ', 'answer ', 'is ', 'pricing.')):
+        self.latency = latency
+        self.errors = list(errors)
+        self.pieces = pieces
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.pieces_sent = 0
+        self.closed_streams = 0
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.requests.append(kwargs)
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            error = self.errors.pop(0) if self.errors else None
+            number = self.calls
+        try:
+            time.sleep(self.latency)
+            if error is not None:
+                raise error
+            return SimpleNamespace(content=[SimpleNamespace(text=f'Answer {number}')])
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    @contextmanager
+    def stream(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+            error = self.errors.pop(0) if self.errors else None
+        if error is not None:
+            raise error
+
+        def text_stream():
+            for piece in self.pieces:
+                time.sleep(self.latency)
+                self.pieces_sent += 1
+                yield piece
+
+        try:
+            yield SimpleNamespace(text_stream=text_stream())
+        finally:
+            self.closed_streams += 1
+
+
+def rate_limit_error():
+    request = httpx.Request('POST', 'https://api.anthropic.com/v1/messages')
+    return RateLimitError('Rate limited', response=httpx.Response(429, request=request), body=None)
+
+
+def timeout_error():
+    return APITimeoutError(request=httpx.Request('POST', 'https://api.anthropic.com/v1/messages'))
+
+
+@pytest.fixture
+def stub_app(make_app, make_call):
+    """Create an app whose Claude client is a StubMessages."""
+    def _stub_app(messages, calls=None, **overrides):
+        if calls is None:
+            calls = [make_call(f'call-{i}', text=f'We discussed item {i}.') for i in range(1, 4)]
+        app = make_app(calls, TESTING=False, CLAUDE_RETRY_BASE_DELAY=0.01, **overrides)
+        app.claude_service.client = SimpleNamespace(messages=messages)
+        return app
+    return _stub_app
+
+
+def ask_concurrently(app, questions):
+    """Post all questions at once and return the responses in order."""
+    barrier = threading.Barrier(len(questions))
+    responses = [None] * len(questions)
+
+    def ask(i):
+        client = app.test_client()
+        barrier.wait()
+        responses[i] = client.post('/api/ask', json=questions[i])
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(len(questions))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def test_normalize_question():
+    """Test that questions differing only in case, spacing or final punctuation share a key."""
+    assert normalize_question('  What was  the BUDGET? ') == 'what was the budget'
+    params = {'max_tokens': 300, 'temperature': 0}
+    key = answer_cache_key('call-1', 'abc', 'What was the budget?', 'model', params)
+    assert key == answer_cache_key('call-1', 'abc', 'what was the budget', 'model', params)
+    assert key != answer_cache_key('call-1', 'abc', 'what was the budget', 'other-model', params)
+    assert key != answer_cache_key('call-1', 'abc', 'what was the budget', 'model', {**params, 'temperature': 1})
+    assert key != answer_cache_key('call-1', 'def', 'what was the budget', 'model', params)
+
+def test_answer_cache_lru_and_ttl():
+    """Test that the in-process layer evicts the least recently used and expired answers."""
+    cache = AnswerCache(max_entries=2, ttl=0.2)
+    cache.put('a', 'answer a', 'call-1', 'h1')
+    cache.put('b', 'answer b', 'call-1', 'h1')
+    assert cache.get('a') == ('answer a', 'memory')
+    cache.put('c', 'answer c', 'call-1', 'h1')
+    assert cache.get('b') is None
+    assert cache.get('a') == ('answer a', 'memory')
+
+    time.sleep(0.3)
+    assert cache.get('a') is None
+    assert cache.get('c') is None
+
+def test_answer_cache_sqlite_layer(tmp_path, monkeypatch):
+    """Test that answers are shared through SQLite and dropped when the transcript changes."""
+    db_path = str(tmp_path / 'cache' / 'answers.db')
+    writer = AnswerCache(db_path=db_path)
+    writer.put('a', 'answer a', 'call-1', 'h1')
+    writer.put('b', 'answer b', 'call-2', 'h1')
+
+    reader = AnswerCache(db_path=db_path)
+    assert reader.get('a') == ('answer a', 'sqlite')
+    assert reader.get('a') == ('answer a', 'memory')
+
+    # An answer about a new transcript of call-1 replaces those about the old one
+    writer.put('c', 'answer c', 'call-1', 'h2')
+    assert AnswerCache(db_path=db_path).get('a') is None
+    assert AnswerCache(db_path=db_path).get('b') == ('answer b', 'sqlite')
+
+    # The database keeps only the most recently used answers
+    monkeypatch.setattr(answer_cache, 'PRUNE_EVERY', 1)
+    small = AnswerCache(max_entries=0, db_path=db_path, max_db_entries=2)
+    small.put('d', 'answer d', 'call-3', 'h1')
+    assert small.get('c') is None
+    assert small.get('b') == ('answer b', 'sqlite')
+    assert small.get('d') == ('answer d', 'sqlite')
+
+def test_ask_reports_cache_hits(client):
+    """Test that repeated questions are answered from the cache."""
+    question = {'question': 'What was discussed?', 'call_id': 'test-call-1'}
+    data = json.loads(client.post('/api/ask', json=question).data)
+    assert data['cache'] == {'hit': False, 'layer': None}
+
+    data = json.loads(client.post('/api/ask', json={**question, 'question': 'what was discussed'}).data)
+    assert data['answer'] == 'This is a test response from Claude'
+    assert data['cache'] == {'hit': True, 'layer': 'memory'}
+
+def test_ask_cache_follows_transcript_changes(make_app, make_call, tmp_path, monkeypatch):
+    """Test that a changed transcript is not answered from the cache."""
+    app = make_app([make_call('call-1', text='We discussed pricing.')],
+                   ANSWER_CACHE_DB=str(tmp_path / 'answers.db'))
+    client = app.test_client()
+    question = {'question': 'What was discussed?', 'call_id': 'call-1'}
+    # Answers are keyed by the content hash of the loaded call, not by hashing its transcript again
+    monkeypatch.setattr(claude_service, 'transcript_hash', lambda text: pytest.fail('transcript hashed'))
+    assert json.loads(client.post('/api/ask', json=question).data)['cache']['hit'] is False
+    assert json.loads(client.post('/api/ask', json=question).data)['cache']['hit'] is True
+
+    # Another process with the same database answers from SQLite
+    other = make_app([make_call('call-1', text='We discussed pricing.')],
+                     ANSWER_CACHE_DB=str(tmp_path / 'answers.db'))
+    data = json.loads(other.test_client().post('/api/ask', json=question).data)
+    assert data['cache'] == {'hit': True, 'layer': 'sqlite'}
+
+    service = app.call_service
+    with open(service.calls_file, 'w') as f:
+        json.dump([make_call('call-1', text='We discussed the roadmap.')], f)
+    os.utime(service.calls_file, (time.time() + 10, time.time() + 10))
+    assert json.loads(client.post('/api/ask', json=question).data)['cache']['hit'] is False
+
+def test_identical_questions_share_one_request(stub_app):
+    """Test that concurrent identical questions are answered by one upstream request."""
+    messages = StubMessages(latency=0.3)
+    app = stub_app(messages)
+    responses = ask_concurrently(app, [{'question': 'What was discussed?', 'call_id': 'call-1'}] * 6)
+
+    assert messages.calls == 1
+    assert {r.get_json()['answer'] for r in responses} == {'Answer 1'}
+    layers = sorted(str(r.get_json()['cache']['layer']) for r in responses)
+    assert layers == ['None'] + ['in-flight'] * 5
+
+def test_admission_limits_concurrent_requests(stub_app):
+    """Test that no more than CLAUDE_MAX_CONCURRENT requests reach Claude at once."""
+    messages = StubMessages(latency=0.1)
+    app = stub_app(messages, CLAUDE_MAX_CONCURRENT=2)
+    questions = [{'question': f'Question {i}?', 'call_id': 'call-1'} for i in range(6)]
+    responses = ask_concurrently(app, questions)
+
+    assert [r.status_code for r in responses] == [200] * 6
+    assert messages.calls == 6
+    assert messages.max_active == 2
+
+def test_admission_rejects_when_queue_is_full(stub_app):
+    """Test that questions beyond the wait queue are rejected with 503."""
+    messages = StubMessages(latency=0.5)
+    app = stub_app(messages, CLAUDE_MAX_CONCURRENT=1, CLAUDE_MAX_QUEUE=1)
+    questions = [{'question': 'What was discussed?', 'call_id': f'call-{i}'} for i in range(1, 4)]
+    responses = ask_concurrently(app, questions)
+
+    assert sorted(r.status_code for r in responses) == [200, 200, 503]
+    rejected = next(r for r in responses if r.status_code == 503)
+    assert int(rejected.headers['Retry-After']) >= 1
+    assert messages.calls == 2
+
+def test_rate_limit_and_timeout_errors_are_retried(stub_app):
+    """Test that rate-limit and timeout errors are retried until the retries run out."""
+    messages = StubMessages(latency=0, errors=[rate_limit_error(), timeout_error()])
+    client = stub_app(messages).test_client()
+    response = client.post('/api/ask', json={'question': 'What was discussed?', 'call_id': 'call-1'})
+    assert response.status_code == 200
+    assert response.get_json()['answer'] == 'Answer 3'
+
+    messages = StubMessages(latency=0, errors=[rate_limit_error(), rate_limit_error()])
+    client = stub_app(messages, CLAUDE_MAX_RETRIES=1).test_client()
+    response = client.post('/api/ask', json={'question': 'What was discussed?', 'call_id': 'call-1'})
+    assert response.status_code == 500
+    assert messages.calls == 2
+
+def test_admission_rate_limit():
+    """Test that the token bucket spaces out requests and rejects those it cannot start in time."""
+    admission = AdmissionController(max_concurrent=10, rate=20, burst=1)
+    started = time.monotonic()
+    for _ in range(5):
+        with admission.admit():
+            pass
+    assert time.monotonic() - started >= 0.15
+
+    admission = AdmissionController(rate=1, burst=1, queue_timeout=0.1)
+    with admission.admit():
+        pass
+    with pytest.raises(AdmissionRejected):
+        with admission.admit():
+            pass
+
+def read_events(response):
+    """Parse a Server-Sent Events body into (event, data) pairs."""
+    events = []
+    for block in response.get_data(as_text=True).strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+def test_stream_answer(stub_app):
+    """Test that answers are streamed piece by piece and cached for later questions."""
+    messages = StubMessages(latency=0, errors=[rate_limit_error()])
+    client = stub_app(messages).test_client()
+    question = {'question': 'What was discussed?', 'call_id': 'call-1'}
+    response = client.post('/api/ask/stream', json=question)
+    assert response.mimetype == 'text/event-stream'
+
+    events = read_events(response)
+    assert events[0] == ('cache', {'hit': False, 'layer': None})
+    assert [data['text'] for event, data in events if event == 'token'] == list(messages.pieces)
+    assert events[-1][0] == 'done'
+    assert messages.calls == 2
+
+    data = client.post('/api/ask', json=question).get_json()
+    assert data['answer'] == 'The answer is pricing.'
+    assert data['cache'] == {'hit': True, 'layer': 'memory'}
+    events = read_events(client.post('/api/ask/stream', json=question))
+    assert events[:2] == [('cache', {'hit': True, 'layer': 'memory'}), ('token', {'text': 'The answer is pricing.'})]
+
+    assert client.post('/api/ask/stream', json={'call_id': 'call-1'}).status_code == 400
+    assert client.post('/api/ask/stream', json=['question', 'call_id']).status_code == 400
+    assert client.post('/api/ask/stream', json={**question, 'call_id': 'missing'}).status_code == 404
+
+def test_stream_error_event(stub_app):
+    """Test that a failed answer ends the stream with an error event."""
+    messages = StubMessages(latency=0, errors=[rate_limit_error(), rate_limit_error()])
+    client = stub_app(messages, CLAUDE_MAX_RETRIES=1).test_client()
+    events = read_events(client.post('/api/ask/stream', json={'question': 'Budget?', 'call_id': 'call-1'}))
+    assert events[-1] == ('error', {'error': 'Too many requests. Please try again later.'})
+
+def test_stream_cancelled_when_client_disconnects(stub_app):
+    """Test that disconnecting stops the upstream stream and leaves nothing in flight."""
+    messages = StubMessages(latency=0.02, pieces=[f'piece {i} ' for i in range(50)])
+    app = stub_app(messages)
+    client = app.test_client()
+    question = {'question': 'What was discussed?', 'call_id': 'call-1'}
+    response = client.post('/api/ask/stream', json=question, buffered=False)
+    body = iter(response.response)
+    assert next(body).startswith(b'event: cache')
+    assert next(body).startswith(b'event: token')
+    response.close()
+
+    assert messages.closed_streams == 1
+    assert messages.pieces_sent < 5
+
+    # The cancelled answer was neither cached nor left in flight
+    data = client.post('/api/ask', json=question).get_json()
+    assert data['cache'] == {'hit': False, 'layer': None}
+
+def read_results(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_batch_answers_questions_for_matching_calls(stub_app):
+    """Test that a batch answers each question for each matching call, reusing cached answers."""
+    messages = StubMessages(latency=0.05)
+    client = stub_app(messages, BATCH_WORKERS=2).test_client()
+    batch = {'questions': ['What was discussed?', 'Next steps?'], 'filter': {'query': 'item'}}
+    response = client.post('/api/ask/batch', json=batch)
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['X-Total-Count'] == '6'
+
+    results = read_results(response)
+    assert sorted((r['call_id'], r['question']) for r in results) == sorted(
+        (f'call-{i}', question) for i in range(1, 4) for question in batch['questions']
+    )
+    assert all(r['answer'].startswith('Answer') and r['cache']['hit'] is False for r in results)
+    assert messages.calls == 6
+    assert messages.max_active == 2
+
+    results = read_results(client.post('/api/ask/batch', json={**batch, 'filter': {'query': 'item 2'}}))
+    assert [r['cache'] for r in results] == [{'hit': True, 'layer': 'memory'}] * 2
+    assert messages.calls == 6
+
+def test_batch_reports_errors_per_item(stub_app):
+    """Test that a failed question is reported in its own result without ending the batch."""
+    messages = StubMessages(latency=0, errors=[rate_limit_error(), rate_limit_error()])
+    client = stub_app(messages, BATCH_WORKERS=1, CLAUDE_MAX_RETRIES=1).test_client()
+    results = read_results(client.post('/api/ask/batch', json={'questions': ['Budget?']}))
+    assert len(results) == 3
+    assert results[0] == {'call_id': results[0]['call_id'], 'question': 'Budget?',
+                          'error': 'Too many requests. Please try again later.'}
+    assert all('answer' in r for r in results[1:])
+
+def test_batch_validation(stub_app):
+    """Test that invalid or oversized batches are rejected."""
+    client = stub_app(StubMessages(), BATCH_MAX_CALLS=2, BATCH_MAX_QUESTIONS=2).test_client()
+    assert client.post('/api/ask/batch', json={}).status_code == 400
+    assert client.post('/api/ask/batch', json=['a']).get_json() == {'error': 'The request body must be a JSON object'}
+    assert client.post('/api/ask/batch', json={'questions': ['a', 'b', 'c']}).status_code == 400
+    assert client.post('/api/ask/batch', json={'questions': ['a']}).status_code == 400
+    assert client.post('/api/ask/batch', json={'questions': ['a'], 'filter': {'sort': 'oldest'}}).status_code == 400
+    assert client.post('/api/ask/batch', json={'questions': ['a'], 'filter': {'match': 'fuzzy'}}).status_code == 400
+    assert client.post('/api/ask/batch', json={'questions': ['a'], 'filter': {'company': None}}).status_code == 400
+    response = client.post('/api/ask/batch', json={'questions': ['a'], 'filter': {'query': 'item 1', 'date_from': '2099-13-01'}})
+    assert response.get_json() == {'error': 'Invalid date: 2099-13-01'}
+    response = client.post('/api/ask/batch', json={'questions': ['a'], 'filter': {'query': 'item 1'}})
+    assert response.status_code == 200
+    assert len(read_results(response)) == 1
+
+def long_transcript():
+    filler = [f'We talked about the weather in city {i} for a while.' for i in range(200)]
+    filler.insert(120, 'The budget for the project is fifty thousand dollars.')
+    return ' '.join(filler)
+
+def test_window_transcript():
+    """Test that only the chunks relevant to the question are kept, within the budget."""
+    text = long_transcript()
+    excerpts = window_transcript(text, 'What is the budget?', token_budget=100, chunk_tokens=40)
+    assert 'The budget for the project is fifty thousand dollars.' in excerpts
+    assert excerpts.startswith(GAP_MARKER) and excerpts.endswith(GAP_MARKER)
+    assert estimate_tokens(excerpts) < 120
+
+    # Short transcripts and questions sharing no words with the transcript use the whole text
+    assert window_transcript('The budget is small.', 'What is the budget?', token_budget=100) is None
+    assert window_transcript(text, 'Any objections?', token_budget=100) is None
+
+def test_questions_use_transcript_window(stub_app, make_call):
+    """Test that long transcripts are windowed and prompt sizes are reported per mode."""
+    messages = StubMessages(latency=0)
+    calls = [make_call('call-long', text=long_transcript()), make_call('call-short', text='The budget is small.')]
+    client = stub_app(messages, calls=calls, TRANSCRIPT_WINDOW_TOKENS=200).test_client()
+    client.post('/api/ask', json={'question': 'What is the budget?', 'call_id': 'call-long'})
+    client.post('/api/ask', json={'question': 'What is the budget?', 'call_id': 'call-short'})
+
+    long_prompt, short_prompt = [request['messages'][0]['content'] for request in messages.requests]
+    assert long_prompt.startswith('Given these excerpts from a sales call transcript')
+    assert 'fifty thousand dollars' in long_prompt
+    assert 'city 0 ' not in long_prompt
+    assert short_prompt.startswith('Given this sales call transcript:')
+
+    stats = client.get('/api/ask/status').get_json()['prompts']
+    assert stats['window']['requests'] == 1
+    assert stats['full']['requests'] == 1
+    assert stats['window']['avg_prompt_tokens'] < estimate_tokens(long_transcript())